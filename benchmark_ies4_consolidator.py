@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the IES4 Consolidator.
+
+Generates a deterministic synthetic IES4 data tree and times each phase of
+the consolidation pipeline (discovery, load, validation, merge, write and
+report) separately, plus an end-to-end consolidate_by_country run. Also
+includes micro-benchmarks of the duplicate-heavy merge path against the
+legacy behaviour of re-parsing both version strings on every comparison,
+and compares load and write times of the installed JSON backends.
+
+Results can be saved as JSON and compared against a baseline from another
+commit; the run fails when a phase regresses past the threshold.
+
+Usage:
+    python benchmark_ies4_consolidator.py [--folders N] [--files-per-folder F]
+        [--entities-per-file E] [--duplicate-ratio R] [--nesting-depth D]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+# Add current directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+import ies4_consolidator
+from ies4_consolidator import IES4Consolidator
+
+# Entity types the synthetic generator spreads entities across
+SYNTHETIC_ENTITY_TYPES = ["vehicles", "organizations", "facilities", "people"]
+
+
+def _legacy_compare_versions(version1: Any, version2: Any) -> int:
+    """
+    Version comparison as implemented before version keys were introduced.
+
+    Both strings are split and int-parsed on every call.
+    """
+    try:
+        v1_parts = [int(x) for x in version1.split(".")]
+        v2_parts = [int(x) for x in version2.split(".")]
+
+        max_len = max(len(v1_parts), len(v2_parts))
+        v1_parts.extend([0] * (max_len - len(v1_parts)))
+        v2_parts.extend([0] * (max_len - len(v2_parts)))
+
+        for v1, v2 in zip(v1_parts, v2_parts):
+            if v1 > v2:
+                return 1
+            elif v1 < v2:
+                return -1
+        return 0
+    except (ValueError, AttributeError):
+        return 1 if version1 > version2 else (-1 if version1 < version2 else 0)
+
+
+def _best_of(repeat: int, func: Callable[[], Any]) -> float:
+    """Return the fastest wall time of several runs of func."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_version_comparisons(count: int, repeat: int = 3) -> Dict[str, float]:
+    """
+    Time duplicate hits comparing a new version with an indexed one.
+
+    Args:
+        count: Number of comparisons
+        repeat: Number of timed runs (fastest is reported)
+
+    Returns:
+        Dict with legacy and keyed timings in seconds
+    """
+    pairs = [(f"{i % 7}.{i % 5}.{i % 3}", f"{i % 5}.{i % 7}") for i in range(count)]
+    keyed = [(new, ies4_consolidator._version_key(old), old) for new, old in pairs]
+
+    def legacy():
+        for new, old in pairs:
+            _legacy_compare_versions(new, old)
+
+    def with_keys():
+        # The existing version's key is stored in the merge index; only the
+        # incoming version is parsed
+        for new, old_key, old in keyed:
+            ies4_consolidator._compare_parsed_versions(
+                new, ies4_consolidator._version_key(new), old, old_key
+            )
+
+    return {
+        "legacySeconds": _best_of(repeat, legacy),
+        "keyedSeconds": _best_of(repeat, with_keys),
+    }
+
+
+def _write_revisions(data_path: Path, entities: int, revisions: int) -> List[Path]:
+    """Write one source file per revision of the same set of entities."""
+    folder = data_path / "bench"
+    folder.mkdir(parents=True)
+    files = []
+
+    for revision in range(1, revisions + 1):
+        data = {
+            "title": f"Benchmark revision {revision}",
+            "vehicles": [
+                {
+                    "id": f"veh-{i:07d}",
+                    "type": "Tank",
+                    "timestamp": "2024-12-01T10:00:00Z",
+                    "version": f"1.{revision}.{i % 3}",
+                }
+                for i in range(entities)
+            ],
+        }
+        file_path = folder / f"revision_{revision:03d}.json"
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        files.append(file_path)
+
+    return files
+
+
+def bench_duplicate_merge(
+    entities: int, revisions: int, repeat: int = 3
+) -> Dict[str, float]:
+    """
+    Time _merge_json_files over many revisions of the same entities.
+
+    Args:
+        entities: Entities per revision file
+        revisions: Number of revision files (all but the first are duplicates)
+        repeat: Number of timed runs (fastest is reported)
+
+    Returns:
+        Dict with legacy and keyed merge timings in seconds
+    """
+    base_path = Path(tempfile.mkdtemp())
+    try:
+        files = _write_revisions(base_path / "data", entities, revisions)
+        consolidator = IES4Consolidator(str(base_path))
+
+        keyed = _best_of(repeat, lambda: consolidator._merge_json_files(files))
+
+        with mock.patch.object(
+            ies4_consolidator,
+            "_compare_parsed_versions",
+            lambda v1, k1, v2, k2: _legacy_compare_versions(v1, v2),
+        ):
+            legacy = _best_of(repeat, lambda: consolidator._merge_json_files(files))
+    finally:
+        shutil.rmtree(base_path)
+
+    return {"legacySeconds": legacy, "keyedSeconds": keyed}
+
+
+_STARTUP_PROBE = """
+import json, sys, tempfile, time
+start = time.perf_counter()
+from ies4_consolidator import IES4Consolidator
+imported = time.perf_counter()
+with tempfile.TemporaryDirectory() as base_path:
+    IES4Consolidator(base_path)
+    constructed = time.perf_counter()
+import logging
+print(json.dumps({
+    "importSeconds": imported - start,
+    "constructSeconds": constructed - imported,
+    "jsonschemaImported": "jsonschema" in sys.modules,
+    "rootHandlers": len(logging.getLogger().handlers),
+}))
+"""
+
+
+def bench_startup(repeat: int = 3) -> Dict[str, Any]:
+    """
+    Time importing the module and constructing a consolidator.
+
+    Each sample runs in a fresh interpreter, so nothing is already imported
+    or cached; the fastest of repeat samples is kept. Also records whether
+    the import pulled in jsonschema or configured logging handlers, neither
+    of which should happen before a consolidator is actually run.
+    """
+    samples = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(json.loads(completed.stdout))
+    best = min(samples, key=lambda sample: sample["importSeconds"])
+    return {
+        "importSeconds": best["importSeconds"],
+        "constructSeconds": min(sample["constructSeconds"] for sample in samples),
+        "jsonschemaImported": best["jsonschemaImported"],
+        "rootHandlers": best["rootHandlers"],
+    }
+
+
+def generate_dataset(
+    data_path: Path,
+    folders: int = 10,
+    files_per_folder: int = 5,
+    entities_per_file: int = 1000,
+    duplicate_ratio: float = 0.2,
+    nesting_depth: int = 0,
+    seed: int = 4300,
+) -> Dict[str, int]:
+    """
+    Write a deterministic synthetic IES4 data tree.
+
+    Every folder gets files_per_folder source files. In all but the first
+    file, duplicate_ratio of the entities are newer revisions of entities
+    from earlier files, so the merge exercises duplicate detection and
+    version replacement. The same arguments always produce the same bytes.
+
+    Args:
+        data_path: Data directory to create
+        folders: Number of country folders
+        files_per_folder: Source files per folder
+        entities_per_file: Entities per source file
+        duplicate_ratio: Fraction of entities revising earlier entities
+        nesting_depth: Subfolder levels between the data directory's top
+            level and the folder holding the files (0 = direct)
+        seed: Random seed
+
+    Returns:
+        Dict with file, entity and byte counts of the generated tree
+    """
+    rng = random.Random(seed)
+    totals = {"files": 0, "entities": 0, "bytes": 0}
+
+    for folder_index in range(folders):
+        folder = data_path / f"country_{folder_index:03d}"
+        for level in range(nesting_depth):
+            folder = folder / f"level_{level + 1}"
+        folder.mkdir(parents=True, exist_ok=True)
+
+        next_id = 0
+        issued: List[str] = []
+        versions: Dict[str, int] = {}
+
+        for file_index in range(files_per_folder):
+            document: Dict[str, Any] = {
+                "title": f"Synthetic country {folder_index} file {file_index}",
+                "ies4Version": "4.3.0",
+            }
+            for entity_index in range(entities_per_file):
+                if issued and rng.random() < duplicate_ratio:
+                    entity_id = rng.choice(issued)
+                else:
+                    entity_id = f"c{folder_index:03d}-e{next_id:07d}"
+                    issued.append(entity_id)
+                    next_id += 1
+                versions[entity_id] = versions.get(entity_id, 0) + 1
+
+                entity_type = SYNTHETIC_ENTITY_TYPES[
+                    int(entity_id.rsplit("e", 1)[1]) % len(SYNTHETIC_ENTITY_TYPES)
+                ]
+                document.setdefault(entity_type, []).append(
+                    {
+                        "id": entity_id,
+                        "type": entity_type[:-1].capitalize(),
+                        "timestamp": f"2024-{1 + file_index % 12:02d}-01T10:00:00Z",
+                        "version": f"1.{versions[entity_id]}.{entity_index % 3}",
+                        "name": f"Synthetic {entity_type} {rng.randrange(10**6)}",
+                    }
+                )
+
+            file_path = folder / f"source_{file_index:03d}.json"
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(document, f, indent=2)
+            totals["files"] += 1
+            totals["entities"] += entities_per_file
+            totals["bytes"] += file_path.stat().st_size
+
+    return totals
+
+
+def bench_pipeline(
+    params: Dict[str, Any], repeat: int = 3, schema: Optional[Path] = None
+) -> Dict[str, Any]:
+    """
+    Time each consolidation phase over a synthetic data tree.
+
+    Phases are timed in isolation: the merge is fed the documents from the
+    load phase with entity validation stubbed out, and validation is timed
+    on its own over the same documents.
+
+    Args:
+        params: Keyword arguments for generate_dataset
+        repeat: Number of timed runs per phase (fastest is reported)
+        schema: Optional IES4 schema copied into the benchmark tree
+
+    Returns:
+        Dict with tool version, dataset totals, per-phase seconds and
+        end-to-end throughput
+    """
+    base_path = Path(tempfile.mkdtemp())
+    try:
+        dataset = generate_dataset(base_path / "data", **params)
+        if schema:
+            shutil.copy(schema, base_path / "ies4_json_schema.json")
+        # Repeated loads would otherwise be served by the parse cache
+        consolidator = IES4Consolidator(
+            str(base_path), stream_threshold=None, parse_cache=False
+        )
+
+        phases: Dict[str, float] = {}
+        phases["discovery"] = _best_of(repeat, consolidator.scan_source_folders)
+        source_folders = consolidator.scan_source_folders()
+        source_files = [
+            source.path for files in source_folders.values() for source in files
+        ]
+
+        loaded: Dict[Path, Any] = {}
+
+        def load():
+            for file_path in source_files:
+                loaded[file_path] = consolidator._load_json_file(file_path)
+
+        phases["load"] = _best_of(repeat, load)
+
+        def validate():
+            for file_path, data in loaded.items():
+                consolidator._validate_json_structure(data, [])
+                consolidator._validate_document_entities(
+                    data, str(file_path.relative_to(consolidator.data_path))
+                )
+
+        phases["validation"] = _best_of(repeat, validate)
+
+        merged: Dict[Path, Any] = {}
+
+        def merge():
+            for country_folder, files in source_folders.items():
+                merged[country_folder] = consolidator._merge_json_files(files)
+
+        # The merge stores references to the loaded entities and annotates
+        # them, so each run gets fresh copies made outside the timer. Plain
+        # functions stand in for the stubs to keep mock overhead out of it.
+        merge_timings = []
+        for _ in range(repeat):
+            documents = {
+                path: json.loads(json.dumps(data)) for path, data in loaded.items()
+            }
+            with mock.patch.object(
+                consolidator, "_load_json_file", documents.get
+            ), mock.patch.object(
+                consolidator, "_validate_entity", lambda entity_type, entity: []
+            ):
+                merge_timings.append(_best_of(1, merge))
+        phases["merge"] = min(merge_timings)
+
+        def write():
+            for country_folder, data in merged.items():
+                output_file = consolidator._output_file(
+                    consolidator._folder_key(country_folder)
+                )
+                consolidator._save_consolidated_file(data, output_file, [])
+
+        phases["write"] = _best_of(repeat, write)
+
+        results = consolidator.consolidate_by_country()
+        phases["endToEnd"] = _best_of(repeat, consolidator.consolidate_by_country)
+
+        def report():
+            with contextlib.redirect_stdout(io.StringIO()):
+                consolidator.generate_summary_report(results)
+
+        phases["report"] = _best_of(repeat, report)
+    finally:
+        shutil.rmtree(base_path)
+
+    return {
+        "toolVersion": consolidator.tool_version,
+        "dataset": dataset,
+        "phases": phases,
+        "throughput": {
+            "entitiesPerSecond": dataset["entities"] / phases["endToEnd"],
+            "bytesPerSecond": dataset["bytes"] / phases["endToEnd"],
+        },
+    }
+
+
+def bench_json_backends(
+    params: Dict[str, Any], repeat: int = 3
+) -> Dict[str, Dict[str, float]]:
+    """
+    Time loading and writing the synthetic tree with each JSON backend.
+
+    Backends that are not installed are left out.
+
+    Args:
+        params: Keyword arguments for generate_dataset
+        repeat: Number of timed runs per measurement (fastest is reported)
+
+    Returns:
+        Dict mapping backend names to load, pretty write and compact write
+        seconds
+    """
+    base_path = Path(tempfile.mkdtemp())
+    try:
+        generate_dataset(base_path / "data", **params)
+        results = {}
+        for backend in ies4_consolidator.JSON_BACKENDS:
+            if backend == "auto":
+                continue
+            try:
+                consolidator = IES4Consolidator(
+                    str(base_path),
+                    stream_threshold=None,
+                    json_backend=backend,
+                    parse_cache=False,
+                )
+            except ValueError:
+                continue
+            source_files = [
+                source.path
+                for files in consolidator.scan_source_folders().values()
+                for source in files
+            ]
+            loaded = {}
+
+            def load():
+                for file_path in source_files:
+                    loaded[file_path] = consolidator._load_json_file(file_path)
+
+            def write():
+                for index, data in enumerate(loaded.values()):
+                    output_file = consolidator.output_path / f"{index}.json"
+                    consolidator._save_consolidated_file(data, output_file, [])
+
+            timings = {"loadSeconds": _best_of(repeat, load)}
+            timings["writePrettySeconds"] = _best_of(repeat, write)
+            consolidator.output_format = "compact"
+            timings["writeCompactSeconds"] = _best_of(repeat, write)
+            results[backend] = timings
+    finally:
+        shutil.rmtree(base_path)
+
+    return results
+
+
+def check_regressions(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+    min_seconds: float = 0.01,
+) -> List[str]:
+    """
+    Compare phase timings with a baseline run.
+
+    Args:
+        results: Results of this run
+        baseline: Results of the baseline run (same JSON layout)
+        threshold: Allowed slowdown as a fraction (0.2 = 20% slower)
+        min_seconds: Slowdowns smaller than this many seconds are treated
+            as noise
+
+    Returns:
+        List of messages, one per regressed timing
+    """
+    regressions = []
+    if results.get("parameters") != baseline.get("parameters"):
+        regressions.append("Benchmark parameters differ from the baseline")
+        return regressions
+
+    timings = _flatten_timings(results)
+    for name, baseline_seconds in _flatten_timings(baseline).items():
+        seconds = timings.get(name)
+        if seconds is None:
+            continue
+        if (
+            seconds > baseline_seconds * (1 + threshold)
+            and seconds - baseline_seconds > min_seconds
+        ):
+            regressions.append(
+                f"{name}: {seconds:.3f}s vs baseline {baseline_seconds:.3f}s "
+                f"(+{(seconds / baseline_seconds - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def _flatten_timings(results: Dict[str, Any]) -> Dict[str, float]:
+    """Map "pipeline.merge"-style names to seconds."""
+    timings = {
+        f"pipeline.{phase}": seconds
+        for phase, seconds in results.get("pipeline", {}).get("phases", {}).items()
+    }
+    for name, bench in results.get("micro", {}).items():
+        for key, seconds in bench.items():
+            timings[f"micro.{name}.{key}"] = seconds
+    for backend, bench in results.get("jsonBackends", {}).items():
+        for key, seconds in bench.items():
+            timings[f"jsonBackends.{backend}.{key}"] = seconds
+    for key, value in results.get("startup", {}).items():
+        if key.endswith("Seconds"):
+            timings[f"startup.{key}"] = value
+    return timings
+
+
+def main():
+    """
+    Run the benchmark suite, print the results and check for regressions.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark suite for the IES4 consolidator"
+    )
+    parser.add_argument("--folders", type=int, default=10)
+    parser.add_argument("--files-per-folder", type=int, default=5)
+    parser.add_argument("--entities-per-file", type=int, default=2000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--nesting-depth", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=4300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--schema", type=Path, help="IES4 schema to validate against")
+    parser.add_argument("--entities", type=int, default=20000)
+    parser.add_argument("--revisions", type=int, default=5)
+    parser.add_argument("--comparisons", type=int, default=200000)
+    parser.add_argument(
+        "--skip-micro", action="store_true", help="Only run the pipeline phases"
+    )
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument(
+        "--baseline", type=Path, help="Results JSON of a previous run to compare"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown against the baseline (default: 0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    params = {
+        "folders": args.folders,
+        "files_per_folder": args.files_per_folder,
+        "entities_per_file": args.entities_per_file,
+        "duplicate_ratio": args.duplicate_ratio,
+        "nesting_depth": args.nesting_depth,
+        "seed": args.seed,
+    }
+    results: Dict[str, Any] = {
+        "parameters": {**params, "repeat": args.repeat},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "startup": bench_startup(args.repeat),
+        "pipeline": bench_pipeline(params, args.repeat, args.schema),
+        "jsonBackends": bench_json_backends(params, args.repeat),
+    }
+    if not args.skip_micro:
+        results["parameters"].update(
+            entities=args.entities,
+            revisions=args.revisions,
+            comparisons=args.comparisons,
+        )
+        results["micro"] = {
+            "versionComparisons": bench_version_comparisons(args.comparisons),
+            "duplicateMerge": bench_duplicate_merge(args.entities, args.revisions),
+        }
+
+    startup = results["startup"]
+    print(
+        f"Startup: import {startup['importSeconds'] * 1000:.1f}ms, "
+        f"construct {startup['constructSeconds'] * 1000:.2f}ms "
+        f"(jsonschema imported: {startup['jsonschemaImported']}, "
+        f"root handlers: {startup['rootHandlers']})"
+    )
+    dataset = results["pipeline"]["dataset"]
+    print(
+        f"Synthetic dataset: {dataset['files']} files, "
+        f"{dataset['entities']:,} entities, {dataset['bytes']:,} bytes"
+    )
+    for phase, seconds in results["pipeline"]["phases"].items():
+        print(f"  {phase:20s} {seconds:.3f}s")
+    throughput = results["pipeline"]["throughput"]
+    print(
+        f"  {'throughput':20s} {throughput['entitiesPerSecond']:,.0f} entities/s  "
+        f"{throughput['bytesPerSecond'] / 1024 / 1024:.1f} MiB/s"
+    )
+
+    for backend, timings in results["jsonBackends"].items():
+        print(
+            f"{'json ' + backend:20s} load {timings['loadSeconds']:.3f}s  "
+            f"write {timings['writePrettySeconds']:.3f}s pretty, "
+            f"{timings['writeCompactSeconds']:.3f}s compact"
+        )
+
+    for name, timings in results.get("micro", {}).items():
+        speedup = timings["legacySeconds"] / timings["keyedSeconds"]
+        print(
+            f"{name:20s} legacy {timings['legacySeconds']:.3f}s  "
+            f"keyed {timings['keyedSeconds']:.3f}s  ({speedup:.2f}x)"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = check_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
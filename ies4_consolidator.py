@@ -12,597 +12,4518 @@ Author: Military Database Analysis System
 Version: 2.0
 """
 
+import atexit
+import gzip
+import hashlib
+import io
 import json
 import logging
+import math
+import os
+import queue
+import re
+import sys
+import time
+import weakref
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from datetime import datetime
-import jsonschema
-from collections import defaultdict
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("ies4_consolidator.log"), logging.StreamHandler()],
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
 )
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+if TYPE_CHECKING:
+    import sqlite3
+
 logger = logging.getLogger(__name__)
 
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Queue handler and listener installed by configure_logging
+_log_pipeline: Optional[Tuple[QueueHandler, QueueListener]] = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+
+    The stock QueueHandler renders each message before enqueueing it so the
+    record can cross process boundaries; this queue stays in-process, so the
+    record is enqueued as is and %-style arguments are only merged when the
+    listener writes it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(
+    log_file: Optional[str] = "ies4_consolidator.log", level: int = logging.INFO
+) -> None:
+    """
+    Send log records through a queue to file and console handlers.
+
+    A QueueHandler on the root logger only enqueues records; a QueueListener
+    thread formats and writes them, so file and console I/O never block
+    consolidation. Calling it again replaces the previous pipeline.
+
+    Args:
+        log_file: Log file path (None = console only)
+        level: Root logger level
+    """
+    shutdown_logging()
+
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file, encoding="utf-8"))
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener.start()
+
+    global _log_pipeline
+    _log_pipeline = (queue_handler, listener)
+
+
+@atexit.register
+def shutdown_logging() -> None:
+    """
+    Flush and remove the pipeline installed by configure_logging, if any.
+    """
+    global _log_pipeline
+    if _log_pipeline is None:
+        return
+
+    queue_handler, listener = _log_pipeline
+    _log_pipeline = None
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def _open_lzma(*args: Any, **kwargs: Any) -> TextIO:
+    """Open an xz file, importing lzma only when the format is used."""
+    import lzma
+
+    return lzma.open(*args, **kwargs)
+
+
+def _open_bz2(*args: Any, **kwargs: Any) -> TextIO:
+    """Open a bzip2 file, importing bz2 only when the format is used."""
+    import bz2
+
+    return bz2.open(*args, **kwargs)
+
+
+# Output formats: file suffix, compact encoding and text-mode opener
+OUTPUT_FORMATS: Dict[str, Tuple[str, bool, Callable[..., TextIO]]] = {
+    "pretty": (".json", False, open),
+    "compact": (".json", True, open),
+    "gzip": (".json.gz", True, gzip.open),
+    "lzma": (".json.xz", True, _open_lzma),
+    "bz2": (".json.bz2", True, _open_bz2),
+}
+
+# JSON backends: "auto" uses orjson when it is installed, "json" always uses
+# the standard library
+JSON_BACKENDS = ("auto", "orjson", "json")
+
+# SQLite output modes: one database per folder, or additionally a combined
+# database holding every folder
+SQLITE_OUTPUT_MODES = ("folder", "combined")
+
+# Delta output modes: a delta file next to the full consolidated file, or a
+# delta file carrying the changed entities instead of the full file
+DELTA_OUTPUT_MODES = ("alongside", "only")
+
+# SQLite output tables; indexes are created after the bulk load. Entity IDs
+# are unique per folder and entity type by construction, so no primary key
+# is maintained during inserts.
+_SQLITE_SCHEMA = (
+    "CREATE TABLE entities ("
+    "folder TEXT NOT NULL, entity_type TEXT NOT NULL, id TEXT NOT NULL, "
+    "type TEXT, version TEXT, timestamp TEXT, source_file TEXT, "
+    "body TEXT NOT NULL)",
+    "CREATE TABLE consolidation_metadata ("
+    "folder TEXT PRIMARY KEY, output_file TEXT, metadata TEXT NOT NULL)",
+    "CREATE TABLE consolidated_files ("
+    "folder TEXT NOT NULL, path TEXT NOT NULL, size INTEGER, processed_at TEXT)",
+)
+_SQLITE_INDEXES = (
+    "CREATE INDEX entities_id ON entities (id)",
+    "CREATE INDEX entities_entity_type ON entities (entity_type)",
+    "CREATE INDEX entities_type ON entities (type)",
+    "CREATE INDEX entities_version ON entities (version)",
+    "CREATE INDEX entities_source_file ON entities (source_file)",
+    "CREATE INDEX consolidated_files_path ON consolidated_files (path)",
+)
+_SQLITE_TABLES = ("entities", "consolidation_metadata", "consolidated_files")
+# Values stored in SQLite columns as they are; anything else is stored as JSON
+_SQLITE_SCALARS = (str, int, float, type(None))
+
+# Merge index entry: slot in the consolidated entity list, raw version,
+# parsed version key and validation errors of the stored entity
+IndexEntry = Tuple[int, Any, Optional[Tuple[int, ...]], Tuple[str, ...]]
+
+# Partial cross-folder index of one folder: entity type -> (IDs, versions)
+# of the consolidated entities, as parallel lists
+FolderEntityIndex = Dict[str, Tuple[List[Any], List[Any]]]
+
+# Entity fingerprints of a folder's previous consolidation: entity type ->
+# entity ID -> (version, fingerprint)
+EntityFingerprints = Dict[str, Dict[Any, Tuple[Any, str]]]
+
+# Compiled schema validators shared by every consolidator in this process,
+# keyed by schema content hash
+_SCHEMA_VALIDATORS: Dict[str, Any] = {}
+
+# Array keywords applied to each entity, which ingestion already validated
+_ITEM_SCHEMA_KEYWORDS = frozenset(
+    ("items", "additionalItems", "prefixItems", "unevaluatedItems")
+)
+
+
+class SourceFile(NamedTuple):
+    """
+    A source JSON file with the size and mtime captured during discovery.
+    """
+
+    path: Path
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_path(cls, path: Path) -> "SourceFile":
+        """Stat a path that was not produced by discovery."""
+        stat = path.stat()
+        return cls(path, stat.st_size, stat.st_mtime_ns)
+
+
+def _as_source_file(source: Union[Path, SourceFile]) -> SourceFile:
+    """Return source as a SourceFile, statting plain paths."""
+    return source if isinstance(source, SourceFile) else SourceFile.from_path(source)
+
+
+def _version_key(version: Any) -> Optional[Tuple[int, ...]]:
+    """
+    Parse a dotted version string into a comparable key.
+
+    Args:
+        version: Version value from an entity
+
+    Returns:
+        Tuple of integer parts, or None if the version is not purely numeric
+        (such versions are compared as strings)
+    """
+    try:
+        return tuple(int(part) for part in version.split("."))
+    except (ValueError, AttributeError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _compare_version_strings(version1: Any, version2: Any) -> int:
+    """Compare non-numeric versions as strings (memoised)."""
+    return 1 if version1 > version2 else (-1 if version1 < version2 else 0)
+
+
+def _compare_parsed_versions(
+    version1: Any,
+    key1: Optional[Tuple[int, ...]],
+    version2: Any,
+    key2: Optional[Tuple[int, ...]],
+) -> int:
+    """
+    Compare two versions using keys from _version_key.
+
+    Numeric keys are compared part by part with the shorter one padded with
+    zeros; if either version is not numeric the raw values are compared as
+    strings.
+
+    Returns:
+        int: 1 if version1 > version2, -1 if version1 < version2, 0 if equal
+    """
+    if key1 is None or key2 is None:
+        try:
+            return _compare_version_strings(version1, version2)
+        except TypeError:
+            # Unhashable values cannot be memoised
+            return _compare_version_strings.__wrapped__(version1, version2)
+
+    if len(key1) != len(key2):
+        # Pad with zeros to make equal length
+        length = max(len(key1), len(key2))
+        key1 = key1 + (0,) * (length - len(key1))
+        key2 = key2 + (0,) * (length - len(key2))
+
+    return 1 if key1 > key2 else (-1 if key1 < key2 else 0)
+
+
+class _StreamingJSONReader:
+    """
+    Incremental JSON reader built on the standard library decoder.
+
+    Text is read in chunks and individual values are decoded with
+    JSONDecoder.raw_decode, so only the value currently being decoded has to
+    be held in memory.
+    """
+
+    _WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, file_obj: TextIO, chunk_size: int = 1024 * 1024):
+        self._file = file_obj
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._consumed = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Read more text, growing reads geometrically for large values."""
+        if self._eof:
+            return False
+
+        pending = len(self._buffer) - self._pos
+        chunk = self._file.read(max(self._chunk_size, pending))
+        if not chunk:
+            self._eof = True
+            return False
+
+        self._consumed += self._pos
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    @property
+    def position(self) -> int:
+        """Number of characters consumed from the file so far."""
+        return self._consumed + self._pos
+
+    def error(self, message: str) -> ValueError:
+        """Build a decode error pointing at the current file offset."""
+        return ValueError(f"{message}: char {self.position}")
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ("" at end)."""
+        while True:
+            self._pos = self._WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                break
+        return self._buffer[self._pos : self._pos + 1]
+
+    def expect(self, char: str) -> None:
+        """Consume a structural character."""
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self._pos += 1
+
+    def expect_end(self) -> None:
+        """Ensure nothing but whitespace follows the document."""
+        if self.peek():
+            raise self.error("Extra data")
+
+    def decode_value(self) -> Any:
+        """Decode the next complete JSON value."""
+        while True:
+            self.peek()
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise self.error(e.msg) from None
+
+            # A value ending exactly at the buffer edge (e.g. a number) may
+            # continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def iter_array(self) -> Iterator[Any]:
+        """Yield the elements of the array starting at the next character."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            yield self.decode_value()
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+class _StdlibJSONCodec:
+    """
+    JSON codec backed by the standard library json module.
+    """
+
+    name = "json"
+    _PRETTY_ENCODER = json.JSONEncoder(indent=2, ensure_ascii=False)
+    _COMPACT_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    _CANONICAL_ENCODER = json.JSONEncoder(
+        separators=(",", ":"), ensure_ascii=False, sort_keys=True
+    )
+    _PRETTY_SORTED_ENCODER = json.JSONEncoder(
+        indent=2, ensure_ascii=False, sort_keys=True
+    )
+    # Encoders by (indent, sort_keys)
+    _ENCODERS = {
+        (True, False): _PRETTY_ENCODER,
+        (False, False): _COMPACT_ENCODER,
+        (True, True): _PRETTY_SORTED_ENCODER,
+        (False, True): _CANONICAL_ENCODER,
+    }
+
+    def load(self, file_path: Path) -> Any:
+        """
+        Parse a JSON file.
+
+        Raises:
+            OSError: If the file cannot be read
+            json.JSONDecodeError: If the file is not valid JSON
+        """
+        with open(file_path, "rb") as f:
+            return self.loads(f.read())
+
+    def loads(self, content: bytes) -> Any:
+        """
+        Parse a UTF-8 encoded JSON document.
+
+        Raises:
+            UnicodeDecodeError: If the content is not valid UTF-8
+            json.JSONDecodeError: If the content is not valid JSON
+        """
+        return json.loads(content.decode("utf-8"))
+
+    def dumps(self, value: Any, indent: bool = False, sort_keys: bool = False) -> str:
+        """
+        Serialise a value like json.dumps(ensure_ascii=False) with indent=2
+        or compact separators, optionally with sorted keys.
+
+        Raises:
+            TypeError: If the value is not JSON serialisable
+        """
+        return self._ENCODERS[bool(indent), bool(sort_keys)].encode(value)
+
+    def fingerprint(self, value: Any) -> str:
+        """
+        Digest of a value's compact serialisation with sorted keys, so equal
+        values get equal fingerprints whatever their key order.
+
+        Raises:
+            TypeError: If the value is not JSON serialisable
+        """
+        return hashlib.blake2b(
+            self._CANONICAL_ENCODER.encode(value).encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+
+class _OrjsonCodec(_StdlibJSONCodec):
+    """
+    JSON codec backed by orjson.
+
+    orjson rejects some input the standard library accepts (NaN and
+    Infinity literals, integers beyond 64 bits), refuses to serialise
+    integers beyond 64 bits and writes null for NaN and infinite floats;
+    those values go through the standard library instead, so parsed values
+    and output are the same with either backend, though floats may be spelt
+    differently (1e16 instead of 1e+16).
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._compact_option = orjson.OPT_NON_STR_KEYS
+        self._pretty_option = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+        self._canonical_option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+        # Options by (indent, sort_keys)
+        self._options = {
+            (True, False): self._pretty_option,
+            (False, False): self._compact_option,
+            (True, True): self._pretty_option | orjson.OPT_SORT_KEYS,
+            (False, True): self._canonical_option,
+        }
+
+    def loads(self, content: bytes) -> Any:
+        try:
+            return self._orjson.loads(content)
+        except self._orjson.JSONDecodeError:
+            return super().loads(content)
+
+    def dumps(self, value: Any, indent: bool = False, sort_keys: bool = False) -> str:
+        content = self._encode(value, self._options[bool(indent), bool(sort_keys)])
+        if content is None:
+            return super().dumps(value, indent, sort_keys)
+        return content.decode("utf-8")
+
+    def fingerprint(self, value: Any) -> str:
+        content = self._encode(value, self._canonical_option)
+        if content is None:
+            return super().fingerprint(value)
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def _encode(self, value: Any, option: int) -> Optional[bytes]:
+        """
+        Serialise a value with orjson, or return None when the standard
+        library must: orjson cannot encode it, or wrote null for a NaN or
+        infinite float (only looked for when the output contains null).
+        """
+        try:
+            content = self._orjson.dumps(value, option=option)
+        except self._orjson.JSONEncodeError:
+            return None
+        if b"null" in content and _has_non_finite_float(value):
+            return None
+        return content
+
+
+def _has_non_finite_float(value: Any) -> bool:
+    """
+    Check whether a JSON value holds a NaN or infinite float at any depth.
+
+    Args:
+        value: Parsed JSON value
+
+    Returns:
+        True if a float in the value is NaN or infinite
+    """
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite_float(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite_float(item) for item in value)
+    return False
+
+
+@lru_cache(maxsize=None)
+def _json_codec(backend: str = "auto") -> _StdlibJSONCodec:
+    """
+    Return the codec of a JSON backend, importing it on first use.
+
+    Args:
+        backend: One of JSON_BACKENDS; "auto" picks orjson when it is
+            installed and the standard library otherwise
+
+    Returns:
+        Shared codec instance
+
+    Raises:
+        ImportError: If backend is "orjson" and orjson is not installed
+    """
+    if backend in ("auto", "orjson"):
+        try:
+            return _OrjsonCodec()
+        except ImportError:
+            if backend == "orjson":
+                raise
+    return _StdlibJSONCodec()
+
+
+class _StreamingJSONWriter:
+    """
+    Incremental writer for a top-level JSON object.
+
+    Members and array elements are serialised one at a time by the codec.
+    With the standard library codec, pretty output is the same text as
+    json.dump(indent=2, ensure_ascii=False) on the complete document and
+    compact output matches separators=(",", ":"). Output goes to a temporary
+    file next to the target, which is atomically renamed over it when the
+    writer is closed without error. With skip_unchanged, a temporary file
+    with the same content as the target is discarded instead, leaving the
+    target and its mtime untouched.
+    """
+
+    _INDENT = "  "
+    _BATCH_SIZE = 1000
+
+    def __init__(
+        self,
+        output_file: Path,
+        compact: bool = False,
+        opener: Callable[..., TextIO] = open,
+        codec: Optional[_StdlibJSONCodec] = None,
+        sort_keys: bool = False,
+        skip_unchanged: bool = False,
+    ):
+        self.output_file = output_file
+        self.temp_path = output_file.with_name(output_file.name + ".tmp")
+        self.compact = compact
+        self.sort_keys = sort_keys
+        self.skip_unchanged = skip_unchanged
+        # Whether the target was left in place because nothing changed
+        self.unchanged = False
+        self._opener = opener
+        self._codec = codec or _json_codec("json")
+        self._file: Optional[TextIO] = None
+        self._members = 0
+        self._elements = 0
+        self._pending: List[Any] = []
+
+    def __enter__(self) -> "_StreamingJSONWriter":
+        self._file = self._opener(self.temp_path, "wt", encoding="utf-8")
+        self._file.write("{")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self._file.write("\n}" if self._members and not self.compact else "}")
+            self._file.close()
+            if self.skip_unchanged and _same_file_content(
+                self.temp_path, self.output_file
+            ):
+                self.temp_path.unlink()
+                self.unchanged = True
+            else:
+                os.replace(self.temp_path, self.output_file)
+        else:
+            self._file.close()
+            self.temp_path.unlink(missing_ok=True)
+
+    def _encode(self, value: Any) -> str:
+        text = self._codec.dumps(
+            value, indent=not self.compact, sort_keys=self.sort_keys
+        )
+        if self.compact:
+            return text
+        return text.replace("\n", "\n" + self._INDENT)
+
+    def _begin_member(self, key: str) -> None:
+        if self._members:
+            self._file.write(",")
+        if self.compact:
+            self._file.write(f"{self._codec.dumps(key)}:")
+        else:
+            self._file.write(f"\n{self._INDENT}{self._codec.dumps(key)}: ")
+        self._members += 1
+
+    def write_member(self, key: str, value: Any) -> None:
+        """Write a complete top-level member."""
+        self._begin_member(key)
+        self._file.write(self._encode(value))
+
+    def begin_array(self, key: str) -> None:
+        """Start a top-level array member whose elements follow."""
+        self._begin_member(key)
+        self._file.write("[")
+        self._elements = 0
+
+    def write_element(self, value: Any) -> None:
+        """Write one element of the current array."""
+        self._pending.append(value)
+        if len(self._pending) >= self._BATCH_SIZE:
+            self._flush_elements()
+
+    def _flush_elements(self) -> None:
+        # Encoding elements in batches amortises the per-call setup of the
+        # encoder, notably the pure-Python indenting one of the stdlib codec
+        if not self._pending:
+            return
+        text = self._encode(self._pending)
+        if self.compact:
+            self._file.write(("," if self._elements else "") + text[1:-1])
+        else:
+            self._file.write(",\n" if self._elements else "\n")
+            self._file.write(text[2 : -len(self._INDENT) - 2])
+        self._elements += len(self._pending)
+        self._pending = []
+
+    def end_array(self) -> None:
+        """Close the current array member."""
+        self._flush_elements()
+        if self._elements and not self.compact:
+            self._file.write(f"\n{self._INDENT}]")
+        else:
+            self._file.write("]")
+
+
+def _same_file_content(path: Path, other: Path) -> bool:
+    """
+    Compare two files by size and SHA-256 of their content.
+
+    Args:
+        path: File to compare
+        other: File to compare with; may not exist
+
+    Returns:
+        True if both exist and hold the same bytes
+    """
+    try:
+        if path.stat().st_size != other.stat().st_size:
+            return False
+    except FileNotFoundError:
+        return False
+
+    def digest(file_path: Path) -> bytes:
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.digest()
+
+    return digest(path) == digest(other)
+
+
+def _open_gzip_reproducible(
+    path: Path, mode: str = "wt", encoding: Optional[str] = None
+) -> TextIO:
+    """
+    Open a gzip file for text writing with a zero header mtime, so the same
+    content always compresses to the same bytes.
+    """
+    return io.TextIOWrapper(
+        gzip.GzipFile(path, mode.replace("t", ""), mtime=0), encoding=encoding
+    )
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate the memory held by a decoded JSON value, in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + _estimate_size(item)
+    elif isinstance(value, list):
+        for item in value:
+            size += _estimate_size(item)
+    return size
+
+
+def _jsonschema() -> Any:
+    """
+    Import jsonschema on first use.
+
+    jsonschema costs more to import than the rest of this module together,
+    and runs that never validate (dry runs, unchanged incremental runs,
+    tooling that only inspects outputs) should not pay for it.
+
+    Returns:
+        The jsonschema module, with jsonschema.validators loaded
+    """
+    import jsonschema
+    import jsonschema.validators
+
+    return jsonschema
+
+
+def _peak_rss_bytes(children: bool = False) -> Optional[int]:
+    """
+    Return the peak resident set size of this process or its children.
+
+    Args:
+        children: Report the largest terminated child process instead
+
+    Returns:
+        Peak RSS in bytes, or None where the resource module is unavailable
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _close_spill_store(connection: "sqlite3.Connection", path: Path) -> None:
+    """Close and delete a spill store database."""
+    connection.close()
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+class _EntitySpillStore:
+    """
+    On-disk overflow for merged entities in a temporary SQLite database.
+
+    Entity lists created by the store account for the approximate memory of
+    the entities they hold. Once the total exceeds the budget, every list
+    moves its in-memory entities to the database, keyed by entity type and
+    slot, and starts accumulating again.
+    """
+
+    _FETCH_SIZE = 1000
+
+    def __init__(self, budget: int, directory: Optional[Path] = None):
+        """
+        Create the store database.
+
+        Args:
+            budget: In-memory entity bytes allowed before spilling
+            directory: Directory for the database (None = system temp dir)
+        """
+        import sqlite3
+        import tempfile
+
+        fd, path = tempfile.mkstemp(
+            prefix="ies4_spill_", suffix=".sqlite", dir=directory
+        )
+        os.close(fd)
+        self.path = Path(path)
+        self.budget = budget
+        self.memory_bytes = 0
+        self.spilled = 0
+        self._lists: List["_SpillableEntityList"] = []
+
+        self.connection = sqlite3.connect(path)
+        # Scratch data: no journal or fsync needed
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute(
+            "CREATE TABLE entities (entity_type TEXT NOT NULL, "
+            "slot INTEGER NOT NULL, body BLOB NOT NULL, "
+            "PRIMARY KEY (entity_type, slot)) WITHOUT ROWID"
+        )
+        self._finalizer = weakref.finalize(
+            self, _close_spill_store, self.connection, self.path
+        )
+
+    def entity_list(self, entity_type: str) -> "_SpillableEntityList":
+        """Create the merged entity list of an entity type."""
+        entities = _SpillableEntityList(self, entity_type)
+        self._lists.append(entities)
+        return entities
+
+    def charge(self, size: int) -> None:
+        """Account for entity memory, spilling once over budget."""
+        self.memory_bytes += size
+        if self.memory_bytes > self.budget:
+            if not self.spilled:
+                logger.info(
+                    "Merged entities exceed the memory budget of %d bytes, "
+                    "spilling to %s",
+                    self.budget,
+                    self.path,
+                )
+            for entities in self._lists:
+                entities._spill()
+            self.connection.commit()
+            self.memory_bytes = 0
+
+    def close(self) -> None:
+        """Close and delete the database."""
+        self._finalizer()
+
+
+class _SpillableEntityList:
+    """
+    List-like merged entity array whose leading slots may live on disk.
+
+    Supports what the merge and the writers need: len, append, pop, item
+    assignment and access by slot, and iteration in slot order. Slots below
+    the spilled count are stored in the spill store; the rest are in memory.
+    """
+
+    def __init__(self, store: _EntitySpillStore, entity_type: str):
+        self.store = store
+        self.entity_type = entity_type
+        self._spilled = 0
+        self._tail: List[Dict[str, Any]] = []
+        self._tail_sizes: List[int] = []
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._tail)
+
+    def append(self, entity: Dict[str, Any]) -> None:
+        size = _estimate_size(entity)
+        self._tail.append(entity)
+        self._tail_sizes.append(size)
+        self.store.charge(size)
+
+    def pop(self) -> Dict[str, Any]:
+        if self._tail:
+            self.store.charge(-self._tail_sizes.pop())
+            return self._tail.pop()
+        if not self._spilled:
+            raise IndexError("pop from empty list")
+        entity = self[self._spilled - 1]
+        self.store.connection.execute(
+            "DELETE FROM entities WHERE entity_type = ? AND slot = ?",
+            (self.entity_type, self._spilled - 1),
+        )
+        self.store.spilled -= 1
+        self._spilled -= 1
+        return entity
+
+    def __setitem__(self, slot: int, entity: Dict[str, Any]) -> None:
+        import pickle
+
+        if slot >= self._spilled:
+            index = slot - self._spilled
+            size = _estimate_size(entity)
+            delta = size - self._tail_sizes[index]
+            self._tail[index] = entity
+            self._tail_sizes[index] = size
+            # Charged last: going over the budget spills and empties the tail
+            self.store.charge(delta)
+        else:
+            self.store.connection.execute(
+                "UPDATE entities SET body = ? WHERE entity_type = ? AND slot = ?",
+                (
+                    pickle.dumps(entity, pickle.HIGHEST_PROTOCOL),
+                    self.entity_type,
+                    slot,
+                ),
+            )
+
+    def __getitem__(self, slot: int) -> Dict[str, Any]:
+        import pickle
+
+        if slot < 0:
+            slot += len(self)
+        if slot >= self._spilled:
+            return self._tail[slot - self._spilled]
+        row = self.store.connection.execute(
+            "SELECT body FROM entities WHERE entity_type = ? AND slot = ?",
+            (self.entity_type, slot),
+        ).fetchone()
+        if row is None:
+            raise IndexError(slot)
+        return pickle.loads(row[0])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        import pickle
+
+        if self._spilled:
+            cursor = self.store.connection.execute(
+                "SELECT body FROM entities WHERE entity_type = ? ORDER BY slot",
+                (self.entity_type,),
+            )
+            while True:
+                rows = cursor.fetchmany(self.store._FETCH_SIZE)
+                if not rows:
+                    break
+                for (body,) in rows:
+                    yield pickle.loads(body)
+        yield from self._tail
+
+    def _spill(self) -> None:
+        """Move the in-memory entities to the store."""
+        import pickle
+
+        if not self._tail:
+            return
+        self.store.connection.executemany(
+            "INSERT INTO entities (entity_type, slot, body) VALUES (?, ?, ?)",
+            (
+                (
+                    self.entity_type,
+                    self._spilled + index,
+                    pickle.dumps(entity, pickle.HIGHEST_PROTOCOL),
+                )
+                for index, entity in enumerate(self._tail)
+            ),
+        )
+        self.store.spilled += len(self._tail)
+        self._spilled += len(self._tail)
+        self._tail = []
+        self._tail_sizes = []
+
+
+class _MergeJournal:
+    """
+    Undo log of the merges of one source file.
+
+    Additions are counted per entity type: they are the last slots of their
+    merged lists. Each replacement keeps its entity type and ID, the entity
+    and index entry it overwrote, and whether that entity's timestamp was
+    defaulted.
+    """
+
+    def __init__(self):
+        self.added: Counter = Counter()
+        self.replaced: List[Tuple[str, Any, Dict[str, Any], IndexEntry, bool]] = []
+
+    def __len__(self) -> int:
+        return sum(self.added.values()) + len(self.replaced)
+
+
+# Types holding an entity-type array of a document
+_ENTITY_ARRAY_TYPES = (list, _SpillableEntityList)
+
+
+class _PhaseTimer:
+    """
+    Accumulates wall time, entity counts and byte counts per pipeline phase.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+
+    def add(
+        self, phase: str, seconds: float, entities: int = 0, byte_count: int = 0
+    ) -> None:
+        """Add a measurement to a phase."""
+        totals = self.phases.setdefault(
+            phase, {"seconds": 0.0, "entities": 0, "bytes": 0}
+        )
+        totals["seconds"] += seconds
+        totals["entities"] += entities
+        totals["bytes"] += byte_count
+
+    def seconds(self, phase: str) -> float:
+        """Return the time accumulated by a phase so far."""
+        return self.phases.get(phase, {}).get("seconds", 0.0)
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarise the phases with their throughput.
+
+        Returns:
+            Dict mapping phase names to seconds, entities, bytes and, where
+            counted, entitiesPerSecond and bytesPerSecond
+        """
+        summary = {}
+        for phase, totals in self.phases.items():
+            seconds = totals["seconds"]
+            entry: Dict[str, float] = {"seconds": round(seconds, 6)}
+            for count_key, rate_key in (
+                ("entities", "entitiesPerSecond"),
+                ("bytes", "bytesPerSecond"),
+            ):
+                if totals[count_key]:
+                    entry[count_key] = totals[count_key]
+                    if seconds > 0:
+                        entry[rate_key] = round(totals[count_key] / seconds, 1)
+            summary[phase] = entry
+        return summary
+
+
+# Validation errors of a cached document's entities, keyed by entity type,
+# index in the entity-type array and whether merge defaults were applied
+EntityErrorMemo = Dict[Tuple[str, int, bool], Tuple[str, ...]]
+
+
+class _ParsedSource:
+    """
+    A parsed source document held by the parse cache.
+
+    The document is kept pickled: the cached copy is immutable bytes, and
+    every lookup unpickles a private copy its folder may modify freely.
+    Entity validation errors are memoised per validation configuration as
+    the entities are validated.
+    """
+
+    __slots__ = ("blob", "source_bytes", "errors", "saved_errors")
+
+    def __init__(
+        self,
+        blob: bytes,
+        source_bytes: int,
+        errors: Optional[Dict[str, EntityErrorMemo]] = None,
+    ):
+        self.blob = blob
+        self.source_bytes = source_bytes
+        self.errors: Dict[str, EntityErrorMemo] = errors or {}
+        # Memoised errors when last read from or saved to disk (-1 = never)
+        self.saved_errors = -1
+
+    def document(self) -> Any:
+        """Return a private copy of the document."""
+        import pickle
+
+        return pickle.loads(self.blob)
+
+    def error_count(self) -> int:
+        """Number of memoised entity validations."""
+        return sum(len(memo) for memo in self.errors.values())
+
+
+class _ParseCache:
+    """
+    Parsed source documents keyed by the SHA-256 of their content.
+
+    Shared by every consolidator in the process, like the schema validator
+    cache, so folders processed by the same worker process reuse each
+    other's results. Least recently used documents are evicted once the
+    pickled documents exceed max_bytes. Documents put for a source file
+    replace the one put for an earlier version of the same file, so a
+    long-lived process does not hold on to stale versions.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _ParsedSource]" = OrderedDict()
+        self._bytes = 0
+        # Key of the latest document put for each source file, and back
+        self._source_keys: Dict[str, str] = {}
+        self._key_sources: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[_ParsedSource]:
+        """Return a cached document and mark it most recently used."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: _ParsedSource, source: Optional[str] = None) -> None:
+        """
+        Add a document, evicting the least recently used beyond max_bytes.
+
+        Args:
+            key: Cache key
+            entry: Parsed document
+            source: Source file the document was parsed from, if the key
+                is specific to one version of that file
+        """
+        if source is not None:
+            stale = self._source_keys.get(source)
+            if stale is not None and stale != key:
+                self._remove(stale)
+            self._source_keys[source] = key
+            self._key_sources[key] = source
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous.blob)
+        self._entries[key] = entry
+        self._bytes += len(entry.blob)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        """Drop a cached document."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.blob)
+        source = self._key_sources.pop(key, None)
+        if source is not None and self._source_keys.get(source) == key:
+            del self._source_keys[source]
+
+    def clear(self) -> None:
+        """Drop every cached document."""
+        self._entries.clear()
+        self._source_keys.clear()
+        self._key_sources.clear()
+        self._bytes = 0
+
+
+_PARSE_CACHE = _ParseCache(max_bytes=256 * 1024 * 1024)
+
+
+class IES4Consolidator:
+    """
+    Main class for consolidating IES4-compliant JSON files by country/region.
+    """
+
+    # Sidecar holding the non-entity members of a JSON Lines export
+    NDJSON_METADATA_FILE = "consolidationMetadata.json"
+    # Entity rows per executemany call of the SQLite export
+    SQLITE_BATCH_SIZE = 10000
+    # Runs kept in the throughput history used to estimate plan runtimes
+    THROUGHPUT_HISTORY_LIMIT = 20
+    # Characters decoded per folder when sampling it for a plan
+    PLAN_SAMPLE_CHARS = 1024 * 1024
+
+    def __init__(
+        self,
+        base_path: str = "C:\\ies4-military-database-analysis",
+        workers: int = 1,
+        incremental: bool = False,
+        stream_threshold: Optional[int] = 64 * 1024 * 1024,
+        output_format: str = "pretty",
+        ndjson_export: bool = False,
+        performance_metadata: bool = False,
+        memory_budget: Optional[int] = None,
+        sqlite_output: Optional[str] = None,
+        cross_folder_index: bool = True,
+        json_backend: str = "auto",
+        parse_cache: bool = True,
+        parse_cache_dir: Optional[str] = None,
+        parse_cache_max_bytes: int = 1024 * 1024 * 1024,
+        delta_output: Optional[str] = None,
+        deterministic: bool = False,
+        run_epoch: Optional[float] = None,
+    ):
+        """
+        Initialize the consolidator with base path.
+
+        Args:
+            base_path (str): Base directory path for the analysis
+            workers (int): Number of worker processes used to consolidate
+                folders in parallel (1 = serial, 0 = one per CPU)
+            incremental (bool): Skip folders whose source files and
+                configuration are unchanged since the last run
+            stream_threshold (int): Source files larger than this many bytes
+                are parsed incrementally instead of loaded whole
+                (None = never stream)
+            output_format (str): One of OUTPUT_FORMATS: "pretty" (indented
+                JSON), "compact" (minified JSON) or "gzip", "lzma", "bz2"
+                (compressed compact JSON)
+            ndjson_export (bool): Also export each folder as one JSON Lines
+                file per entity type under output/consolidated/ndjson/
+            performance_metadata (bool): Record per-phase timings in each
+                consolidated file's consolidationMetadata.performance
+            memory_budget (int): Approximate bytes of merged entities kept in
+                memory per folder before they spill to a temporary on-disk
+                store (None = no limit)
+            sqlite_output (str): One of SQLITE_OUTPUT_MODES: "folder" writes
+                a SQLite database per folder under output/consolidated/sqlite/,
+                "combined" also merges them into ies4_consolidated.sqlite
+                (None = no SQLite output)
+            cross_folder_index (bool): Index entity IDs across all folders
+                and report IDs consolidated in more than one folder
+            json_backend (str): One of JSON_BACKENDS: "auto" parses and
+                serialises with orjson when it is installed and the
+                standard library json module otherwise
+            parse_cache (bool): Keep parsed and entity-validated source
+                files so that later runs skip unchanged files, and parse
+                byte-identical files once per process
+            parse_cache_dir (str): Directory of the persisted parse cache
+                (None = output/consolidated/parse_cache)
+            parse_cache_max_bytes (int): Size of the persisted parse cache
+                beyond which least recently used entries are evicted (0 =
+                persist nothing, only byte-identical files are shared)
+            delta_output (str): One of DELTA_OUTPUT_MODES: "alongside"
+                also writes the entities added, updated and removed since
+                the previous run to output/consolidated/delta/, "only"
+                writes that delta with the changed entities instead of the
+                full consolidated file (None = no delta output)
+            deterministic (bool): Make outputs a function of the sources
+                only: timestamps come from source file mtimes (UTC), keys
+                are written sorted, gzip headers carry no time, and outputs
+                whose content is unchanged are not rewritten
+            run_epoch (float): Pin every timestamp to this Unix time instead
+                of source mtimes; implies deterministic
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Unknown output format '{output_format}', expected one of "
+                f"{', '.join(OUTPUT_FORMATS)}"
+            )
+        if sqlite_output is not None and sqlite_output not in SQLITE_OUTPUT_MODES:
+            raise ValueError(
+                f"Unknown SQLite output mode '{sqlite_output}', expected one of "
+                f"{', '.join(SQLITE_OUTPUT_MODES)}"
+            )
+
+        if delta_output is not None and delta_output not in DELTA_OUTPUT_MODES:
+            raise ValueError(
+                f"Unknown delta output mode '{delta_output}', expected one of "
+                f"{', '.join(DELTA_OUTPUT_MODES)}"
+            )
+
+        deterministic = deterministic or run_epoch is not None
+        if deterministic and performance_metadata:
+            raise ValueError(
+                "Performance metadata records timings and cannot be written "
+                "by a deterministic run"
+            )
+
+        if json_backend not in JSON_BACKENDS:
+            raise ValueError(
+                f"Unknown JSON backend '{json_backend}', expected one of "
+                f"{', '.join(JSON_BACKENDS)}"
+            )
+        if json_backend == "orjson":
+            try:
+                _json_codec(json_backend)
+            except ImportError:
+                raise ValueError("JSON backend 'orjson' is not installed") from None
+
+        self.base_path = Path(base_path)
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.incremental = incremental
+        self.stream_threshold = stream_threshold
+        self.output_format = output_format
+        self.ndjson_export = ndjson_export
+        self.performance_metadata = performance_metadata
+        self.memory_budget = memory_budget
+        self.sqlite_output = sqlite_output
+        self.cross_folder_index = cross_folder_index
+        self.json_backend = json_backend
+        self.delta_output = delta_output
+        self.deterministic = deterministic
+        self.run_epoch = run_epoch
+        self.parse_cache = parse_cache
+        self.parse_cache_max_bytes = parse_cache_max_bytes
+        # Directory for spill stores (None = system temp directory)
+        self.spill_path: Optional[Path] = None
+        self.data_path = self.base_path / "data"
+        self.schema_path = self.base_path / "ies4_json_schema.json"
+        self.output_path = self.base_path / "output" / "consolidated"
+        self.manifest_path = self.output_path / "consolidation_manifest.json"
+        self.combined_sqlite_path = self.output_path / "ies4_consolidated.sqlite"
+        self.duplicate_report_path = self.output_path / "cross_folder_duplicates.json"
+        self.throughput_history_path = self.output_path / "throughput_history.json"
+        self.parse_cache_path = (
+            Path(parse_cache_dir)
+            if parse_cache_dir
+            else self.output_path / "parse_cache"
+        )
+
+        # Per-folder status of the last run: "rebuilt", "skipped" or "failed"
+        self.folder_status: Dict[str, str] = {}
+        # Per-folder output details of the last run (file name, bytes written)
+        self.folder_details: Dict[str, Dict[str, Any]] = {}
+        # Run-level timings of the last run (discovery, total)
+        self.run_performance: Dict[str, Dict[str, float]] = {}
+        # Peak RSS of the last run across this process and worker processes
+        self.peak_rss_bytes: Optional[int] = None
+        # Size of the combined SQLite database built by the last run
+        self.combined_sqlite_bytes: Optional[int] = None
+        # Partial entity indexes of the folders of the last run, and the
+        # cross-folder duplicate report reduced from them
+        self.folder_indexes: Dict[str, FolderEntityIndex] = {}
+        self.duplicate_report: Optional[Dict[str, Any]] = None
+        # Phase timings of the folder being consolidated
+        self._phase_timer = _PhaseTimer()
+        # Parse cache lookups of the folder being consolidated, sizes shared
+        # by more than one source file of the run (None = not known, every
+        # file is looked up) and cached documents touched by the folder
+        self._parse_cache_stats = self._new_parse_cache_stats()
+        self._duplicate_sizes: Optional[set] = None
+        self._parse_cache_touched: Dict[str, _ParsedSource] = {}
+        # Outputs of the folder being consolidated left in place because a
+        # deterministic run produced the same content
+        self._unchanged_outputs: List[str] = []
+        # Newest source mtime of the last scan, for deterministic timestamps
+        self._newest_source_mtime_ns = 0
+        # Validation error memo of the source file loaded last, if cached
+        self._entity_error_memo: Optional[EntityErrorMemo] = None
+
+        # Upper bound on schema errors collected per validated document
+        self.max_schema_errors = 50
+        # "Updated" messages logged at INFO per entity type and folder; the
+        # rest go to DEBUG and are summarised once the folder is merged
+        self.max_update_messages = 20
+        self._update_counts: Dict[str, int] = {}
+        # IDs per entity type of the merged entities whose timestamp was
+        # filled in with the consolidation timestamp, left out of fingerprints
+        self._defaulted_timestamps: Dict[str, set] = {}
+        self.last_schema_errors: List[Dict[str, str]] = []
+        self._schema_key: Optional[str] = None
+
+        # The output directory is created and the IES4 schema loaded on
+        # first use, so constructing a consolidator stays cheap
+        self._schema: Optional[Dict[str, Any]] = None
+        self._schema_loaded = False
+
+        # IES4 r4.3.0 entity types that can be consolidated
+        self.entity_types = [
+            "countries",
+            "areas",
+            "vehicles",
+            "vehicleTypes",
+            "peopleTypes",
+            "people",
+            "representations",
+            "organizations",  # Added for r4.3.0
+            "events",  # Added for r4.3.0
+            "activities",  # Added for r4.3.0
+            "facilities",  # Added for r4.3.0
+            "items",  # Added for r4.3.0
+            "locations",  # Enhanced for r4.3.0
+            "relationships",  # Added for r4.3.0
+        ]
+
+        # IES4 r4.3.0 required metadata fields
+        self.required_ies4_fields = ["id", "type", "timestamp", "version"]
+
+        # Configuration for IES4 version support
+        self.ies4_version = "4.3.0"
+        self.ies4_spec_date = "2024-12-16"
+        self.tool_version = "2.0"
+
+    @property
+    def schema(self) -> Optional[Dict[str, Any]]:
+        """IES4 JSON schema, loaded from schema_path on first access."""
+        if not self._schema_loaded:
+            self._schema = self._load_schema()
+            self._schema_loaded = True
+        return self._schema
+
+    @schema.setter
+    def schema(self, schema: Optional[Dict[str, Any]]) -> None:
+        self._schema = schema
+        self._schema_loaded = True
+        self._schema_key = None
+
+    @property
+    def codec(self) -> _StdlibJSONCodec:
+        """JSON codec of the configured backend, used for all document I/O."""
+        return _json_codec(self.json_backend)
+
+    def _ensure_output_path(self) -> None:
+        """Create the output directory the first time something is written."""
+        self.output_path.mkdir(parents=True, exist_ok=True)
+
+    def _load_schema(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the IES4 JSON schema for validation.
+
+        Returns:
+            Dict containing the schema or None if loading fails
+        """
+        try:
+            if self.schema_path.exists():
+                schema = self.codec.load(self.schema_path)
+                logger.info("Loaded IES4 schema from %s", self.schema_path)
+                return schema
+            else:
+                logger.warning("Schema file not found at %s", self.schema_path)
+                return None
+        except Exception as e:
+            logger.error("Error loading schema: %s", e)
+            return None
+
+    def _validate_json_structure(
+        self, data: Dict[str, Any], entity_errors: Optional[List[str]] = None
+    ) -> bool:
+        """
+        Enhanced validation of JSON data against IES4 r4.3.0 schema with
+        comprehensive compliance checking.
+
+        When the entities were already validated as they were ingested, pass
+        their errors as entity_errors: only document-level invariants are
+        then checked here, and the schema's items of each entity-type array
+        are not applied again.
+
+        Args:
+            data (Dict): JSON data to validate
+            entity_errors (List): Errors of the document's entities from
+                ingestion-time validation, or None to validate every entity
+
+        Returns:
+            bool: True if valid, False otherwise
+        """
+        validation_errors = []
+        entities_validated = entity_errors is not None
+
+        # Basic schema validation if available
+        if self.schema:
+            try:
+                if entities_validated:
+                    self.last_schema_errors = self._collect_document_schema_errors(data)
+                else:
+                    self.last_schema_errors = self._collect_schema_errors(data)
+            except Exception as e:
+                self.last_schema_errors = []
+                validation_errors.append(f"Schema error: {e}")
+
+            for error in self.last_schema_errors:
+                validation_errors.append(
+                    f"Schema validation at {error['path']}: {error['message']}"
+                )
+            if len(self.last_schema_errors) >= self.max_schema_errors:
+                validation_errors.append(
+                    f"Schema validation: stopped after {self.max_schema_errors} errors"
+                )
+        else:
+            logger.warning("No schema available for validation")
+
+        # IES4 r4.3.0 specific validation
+        if entities_validated:
+            self._ensure_ies4_metadata(data)
+            validation_errors.extend(entity_errors)
+        else:
+            validation_errors.extend(self._validate_ies4_compliance(data))
+
+        if validation_errors:
+            for error in validation_errors:
+                logger.error("Validation error: %s", error)
+            return False
+
+        return True
+
+    def _get_schema_key(self) -> str:
+        """
+        Hash the schema contents, keying the validator and parse caches.
+
+        Returns:
+            Hex SHA-256 of the canonical schema JSON
+        """
+        if self._schema_key is None:
+            self._schema_key = hashlib.sha256(
+                json.dumps(self.schema, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+        return self._schema_key
+
+    def _get_schema_validator(self) -> Any:
+        """
+        Return the compiled validator for the loaded schema.
+
+        The validator class matching the schema's draft is checked and
+        instantiated once per process and cached at module level, keyed by
+        the schema contents, so every consolidator (including those pickled
+        into worker processes) reuses it.
+
+        Returns:
+            jsonschema validator instance
+
+        Raises:
+            jsonschema.SchemaError: If the schema itself is invalid
+        """
+        cached = _SCHEMA_VALIDATORS.get(self._get_schema_key())
+        if cached is None:
+            jsonschema = _jsonschema()
+            try:
+                validator_class = jsonschema.validators.validator_for(self.schema)
+                validator_class.check_schema(self.schema)
+                cached = validator_class(self.schema)
+            except jsonschema.SchemaError as e:
+                cached = e
+            _SCHEMA_VALIDATORS[self._schema_key] = cached
+
+        if isinstance(cached, Exception):
+            raise cached
+        return cached
+
+    def _collect_schema_errors(self, data: Any) -> List[Dict[str, str]]:
+        """
+        Validate data against the schema and collect every error.
+
+        Args:
+            data: JSON data to validate
+
+        Returns:
+            Up to max_schema_errors errors, each with the JSON pointer
+            "path" of the failing value, the schema "validator" keyword and
+            the error "message"
+        """
+        validator = self._get_schema_validator()
+        errors = []
+
+        for error in islice(validator.iter_errors(data), self.max_schema_errors):
+            errors.append(
+                {
+                    "path": "/" + "/".join(str(part) for part in error.absolute_path),
+                    "validator": str(error.validator),
+                    "message": error.message,
+                }
+            )
+
+        return errors
+
+    def _collect_document_schema_errors(
+        self, data: Dict[str, Any]
+    ) -> List[Dict[str, str]]:
+        """
+        Validate a document whose entities were validated at ingestion.
+
+        Entity-type arrays whose items the schema describes are left empty
+        for the document pass. Their array-level keywords (type, size,
+        uniqueness) are then checked against the real arrays. Other spilled
+        arrays are read back into lists, so the schema sees the same
+        document as without a memory budget.
+
+        Args:
+            data: JSON data to validate
+
+        Returns:
+            Up to max_schema_errors errors, as _collect_schema_errors
+        """
+        validated = [
+            key
+            for key, value in data.items()
+            if key in self.entity_types
+            and isinstance(value, _ENTITY_ARRAY_TYPES)
+            and self._get_entity_validator(key) is not None
+        ]
+        document = {}
+        for key, value in data.items():
+            if key in validated:
+                value = []
+            elif isinstance(value, _SpillableEntityList):
+                value = list(value)
+            document[key] = value
+        errors = [
+            error
+            for error in self._collect_schema_errors(document)
+            if error["path"].split("/")[1] not in validated
+        ]
+
+        for entity_type in validated:
+            validator, reads_items = self._get_array_validator(entity_type)
+            if validator is None:
+                continue
+            entities = data[entity_type]
+            if not isinstance(entities, list):
+                # Spilled arrays are only read back when their items matter
+                entities = list(entities) if reads_items else [None] * len(entities)
+            for error in validator.iter_errors(entities):
+                errors.append(
+                    {
+                        "path": "/".join(
+                            ["", entity_type]
+                            + [str(part) for part in error.absolute_path]
+                        ),
+                        "validator": str(error.validator),
+                        "message": error.message,
+                    }
+                )
+
+        return errors[: self.max_schema_errors]
+
+    def _validate_ies4_compliance(self, data: Dict[str, Any]) -> List[str]:
+        """
+        Validate IES4 r4.3.0 specific compliance requirements.
+
+        Args:
+            data: JSON data to validate
+
+        Returns:
+            List of validation error messages
+        """
+        errors = []
+
+        # Check for required IES4 metadata
+        self._ensure_ies4_metadata(data)
+
+        # Validate entity structures
+        for entity_type in self.entity_types:
+            if entity_type in data and isinstance(
+                data[entity_type], _ENTITY_ARRAY_TYPES
+            ):
+                for i, entity in enumerate(data[entity_type]):
+                    errors.extend(
+                        f"{entity_type}[{i}]: {error}"
+                        for error in self._check_entity_fields(entity)
+                    )
+
+        return errors
+
+    def _ensure_ies4_metadata(self, data: Dict[str, Any]) -> None:
+        """
+        Fill in document-level IES4 metadata missing from data.
+
+        Args:
+            data: Document to complete in place
+        """
+        if "ies4Version" not in data:
+            data["ies4Version"] = self.ies4_version
+
+        if "specificationDate" not in data:
+            data["specificationDate"] = self.ies4_spec_date
+
+    def _check_entity_fields(self, entity: Any) -> List[str]:
+        """
+        Check the IES4 r4.3.0 field requirements of a single entity.
+
+        Args:
+            entity: Entity to check
+
+        Returns:
+            List of error messages, without location prefix
+        """
+        if not isinstance(entity, dict):
+            return ["Entity must be an object"]
+
+        errors = []
+
+        # Check required fields
+        for field in self.required_ies4_fields:
+            if field not in entity:
+                errors.append(f"Missing required field '{field}'")
+
+        # Validate ID format
+        if "id" in entity:
+            if not isinstance(entity["id"], str) or not entity["id"].strip():
+                errors.append("Invalid ID format")
+
+        # Validate timestamp format
+        if "timestamp" in entity:
+            if not self._validate_timestamp(entity["timestamp"]):
+                errors.append("Invalid timestamp format")
+
+        return errors
+
+    def _validate_entity(self, entity_type: str, entity: Any) -> List[str]:
+        """
+        Validate a single source entity as it is ingested.
+
+        Applies the IES4 field checks and, when the schema defines items for
+        the entity type's array, the schema for a single entity.
+
+        Args:
+            entity_type: IES4 entity type name
+            entity: Entity to validate
+
+        Returns:
+            List of error messages, without location prefix
+        """
+        start = time.perf_counter()
+        errors = self._check_entity_fields(entity)
+
+        if self.schema:
+            try:
+                validator = self._get_entity_validator(entity_type)
+            except _jsonschema().SchemaError:
+                # Reported once for the whole document when it is saved
+                validator = None
+            if validator is not None:
+                for error in islice(
+                    validator.iter_errors(entity), self.max_schema_errors
+                ):
+                    path = "/".join(str(part) for part in error.absolute_path)
+                    errors.append(f"Schema validation at /{path}: {error.message}")
+
+        self._phase_timer.add("validation", time.perf_counter() - start, 1)
+        return errors
+
+    def _validate_document_entities(
+        self,
+        data: Dict[str, Any],
+        relative_path: str,
+        error_memo: Optional[EntityErrorMemo] = None,
+    ) -> List[str]:
+        """
+        Validate every entity of a source document once, at ingestion.
+
+        Args:
+            data: Parsed source document
+            relative_path: Relative path of the source file, used in messages
+            error_memo: Validation error memo of the document when it came
+                from the parse cache
+
+        Returns:
+            List of error messages naming the source file and entity index
+        """
+        errors = []
+        for entity_type, index, entity in self._iter_document_entities(data):
+            errors.extend(
+                f"{relative_path} {entity_type}[{index}]: {error}"
+                for error in self._validate_cached_entity(
+                    entity_type, entity, error_memo, (entity_type, index, False)
+                )
+            )
+        return errors
+
+    def _get_entity_validator(self, entity_type: str) -> Any:
+        """
+        Return the cached validator for one entity of the given type.
+
+        Args:
+            entity_type: IES4 entity type name
+
+        Returns:
+            Validator for the schema's items of the entity-type array, or
+            None when the schema does not describe them
+        """
+        root_validator = self._get_schema_validator()
+        cache_key = f"{self._schema_key}:{entity_type}"
+
+        if cache_key not in _SCHEMA_VALIDATORS:
+            items_schema = (
+                self.schema.get("properties", {}).get(entity_type, {}).get("items")
+            )
+            _SCHEMA_VALIDATORS[cache_key] = (
+                root_validator.evolve(schema=items_schema)
+                if isinstance(items_schema, (dict, bool))
+                else None
+            )
+
+        return _SCHEMA_VALIDATORS[cache_key]
+
+    def _get_array_validator(self, entity_type: str) -> Tuple[Any, bool]:
+        """
+        Return the cached validator for an entity-type array without its items.
+
+        Args:
+            entity_type: IES4 entity type name
+
+        Returns:
+            Tuple of the validator for the array-level keywords of the
+            entity-type array (None when there are none) and whether those
+            keywords read the array's items
+        """
+        root_validator = self._get_schema_validator()
+        cache_key = f"{self._schema_key}:{entity_type}:array"
+
+        if cache_key not in _SCHEMA_VALIDATORS:
+            array_schema = {
+                keyword: value
+                for keyword, value in self.schema.get("properties", {})
+                .get(entity_type, {})
+                .items()
+                if keyword not in _ITEM_SCHEMA_KEYWORDS
+            }
+            _SCHEMA_VALIDATORS[cache_key] = (
+                root_validator.evolve(schema=array_schema) if array_schema else None,
+                bool({"uniqueItems", "contains"} & array_schema.keys()),
+            )
+
+        return _SCHEMA_VALIDATORS[cache_key]
+
+    def _validate_timestamp(self, timestamp: Any) -> bool:
+        """
+        Validate timestamp format according to IES4 r4.3.0 specification.
+
+        Args:
+            timestamp: Timestamp value to validate
+
+        Returns:
+            bool: True if valid timestamp format
+        """
+        if not isinstance(timestamp, str):
+            return False
+
+        try:
+            # Try parsing ISO 8601 format
+            datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            return True
+        except (ValueError, AttributeError):
+            return False
+
+    def _load_json_file(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """
+        Load and parse a JSON file.
+
+        With the parse cache enabled the file goes through
+        _load_cached_source, which leaves the document's validation error
+        memo in _entity_error_memo.
+
+        Args:
+            file_path (Path): Path to the JSON file
+
+        Returns:
+            Dict containing the parsed JSON or None if loading fails
+        """
+        self._entity_error_memo = None
+        try:
+            if self.parse_cache:
+                data = self._load_cached_source(file_path)
+            else:
+                with open(file_path, "rb") as f:
+                    data = self.codec.loads(f.read())
+            logger.debug("Loaded JSON file: %s", file_path)
+            return data
+        except json.JSONDecodeError as e:
+            logger.error("JSON decode error in %s: %s", file_path, e)
+            return None
+        except Exception as e:
+            logger.error("Error loading %s: %s", file_path, e)
+            return None
+
+    @staticmethod
+    def _new_parse_cache_stats() -> Dict[str, int]:
+        """Return zeroed parse cache counters for a folder."""
+        return {"lookups": 0, "hits": 0, "bytesAvoided": 0, "validationsReused": 0}
+
+    def _source_cache_key(self, file_path: Path, stat: os.stat_result) -> str:
+        """
+        Key of a source file in the persisted parse cache.
+
+        Args:
+            file_path: Source file
+            stat: Result of stat() on the source file
+
+        Returns:
+            SHA-256 of the resolved path, size, mtime and tool version
+        """
+        identity = (
+            f"{file_path.resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}"
+            f"\0{self.tool_version}"
+        )
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _load_cached_source(self, file_path: Path) -> Any:
+        """
+        Parse a source file through the parse cache.
+
+        Files are first looked up by path, size, mtime and tool version, in
+        memory and then in the persisted cache, which saves reading them at
+        all. Otherwise files whose size is shared by another source file of
+        the run are looked up by the SHA-256 of their content, so that
+        byte-identical files are parsed once per process. Parsed documents
+        are pickled for the cache; with nothing persisted
+        (parse_cache_max_bytes 0), files of a unique size are not, so they
+        cost no more than without the cache.
+
+        Args:
+            file_path: Source file
+
+        Returns:
+            A private copy of the parsed document
+
+        Raises:
+            OSError, UnicodeDecodeError, json.JSONDecodeError: If the file is
+                new and cannot be read or parsed; failures are not cached
+        """
+        import pickle
+
+        stats = self._parse_cache_stats
+        persist = self.parse_cache_max_bytes > 0
+        source_key = self._source_cache_key(file_path, file_path.stat())
+        entry = _PARSE_CACHE.get(source_key)
+        if entry is None and persist:
+            entry = self._read_parse_cache_file(source_key, str(file_path))
+        stats["lookups"] += 1
+        if entry is None:
+            with open(file_path, "rb") as f:
+                content = f.read()
+            if self._duplicate_sizes is None or len(content) in self._duplicate_sizes:
+                content_key = hashlib.sha256(content).hexdigest()
+                entry = _PARSE_CACHE.get(content_key)
+            else:
+                content_key = None
+            if entry is None and content_key is None and not persist:
+                # Nothing else can reuse the document: no pickled copy
+                self._entity_error_memo = None
+                return self.codec.loads(content)
+            if entry is None:
+                data = self.codec.loads(content)
+                # Pickled before the folder sees the document, so the cached
+                # copy is never affected by what the folder does with its own
+                entry = _ParsedSource(
+                    pickle.dumps(data, pickle.HIGHEST_PROTOCOL), len(content)
+                )
+                if content_key is not None:
+                    _PARSE_CACHE.put(content_key, entry)
+            else:
+                stats["hits"] += 1
+                stats["bytesAvoided"] += entry.source_bytes
+                data = entry.document()
+                # Same document and error memo, persisted under this file's key
+                entry = _ParsedSource(entry.blob, entry.source_bytes, entry.errors)
+            _PARSE_CACHE.put(source_key, entry, str(file_path))
+        else:
+            stats["hits"] += 1
+            stats["bytesAvoided"] += entry.source_bytes
+            data = entry.document()
+
+        self._parse_cache_touched[source_key] = entry
+        validation_key = (
+            f"{self.tool_version}:{self._get_schema_key()}:{self.max_schema_errors}"
+        )
+        self._entity_error_memo = entry.errors.setdefault(validation_key, {})
+        return data
+
+    def _parse_cache_file(self, key: str) -> Path:
+        """
+        Path of a persisted parse cache entry.
+
+        Args:
+            key: Source key from _source_cache_key
+
+        Returns:
+            Path of <parse_cache_path>/<key>.pickle
+        """
+        return self.parse_cache_path / f"{key}.pickle"
+
+    def _read_parse_cache_file(
+        self, key: str, source: Optional[str] = None
+    ) -> Optional[_ParsedSource]:
+        """
+        Load a parse cache entry persisted by an earlier run.
+
+        Reading an entry marks it most recently used for _prune_parse_cache.
+
+        Args:
+            key: Source key from _source_cache_key
+            source: Source file of the entry
+
+        Returns:
+            The entry, now also cached in memory, or None when there is no
+            entry or the entry is unreadable
+        """
+        import pickle
+
+        cache_file = self._parse_cache_file(key)
+        try:
+            with open(cache_file, "rb") as f:
+                blob, source_bytes, errors = pickle.load(f)
+            os.utime(cache_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(
+                "Ignoring unreadable parse cache entry %s: %s", cache_file, e
+            )
+            return None
+
+        entry = _ParsedSource(blob, source_bytes, errors)
+        entry.saved_errors = entry.error_count()
+        _PARSE_CACHE.put(key, entry, source)
+        return entry
+
+    def _save_parse_cache(self) -> None:
+        """
+        Persist the parse cache entries the current folder added or extended.
+        """
+        touched, self._parse_cache_touched = self._parse_cache_touched, {}
+        if self.parse_cache_max_bytes <= 0:
+            return
+        import pickle
+
+        for key, entry in touched.items():
+            error_count = entry.error_count()
+            if error_count == entry.saved_errors:
+                continue
+            cache_file = self._parse_cache_file(key)
+            # Worker processes may save the same entry concurrently
+            temp_path = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+            try:
+                self.parse_cache_path.mkdir(parents=True, exist_ok=True)
+                with open(temp_path, "wb") as f:
+                    pickle.dump(
+                        (entry.blob, entry.source_bytes, entry.errors),
+                        f,
+                        pickle.HIGHEST_PROTOCOL,
+                    )
+                os.replace(temp_path, cache_file)
+                entry.saved_errors = error_count
+            except Exception as e:
+                logger.warning("Could not save parse cache entry %s: %s", cache_file, e)
+
+    def _prune_parse_cache(self) -> int:
+        """
+        Evict the least recently used persisted parse cache entries until
+        the cache fits in parse_cache_max_bytes.
+
+        Returns:
+            Number of entries evicted
+        """
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.parse_cache_path)
+                if entry.name.endswith(".pickle") and entry.is_file()
+            ]
+        except FileNotFoundError:
+            return 0
+
+        stats = {}
+        for entry in entries:
+            try:
+                stats[entry.path] = entry.stat()
+            except FileNotFoundError:
+                continue
+        total = sum(stat.st_size for stat in stats.values())
+        evicted = 0
+        for path, stat in sorted(stats.items(), key=lambda item: item[1].st_mtime):
+            if total <= self.parse_cache_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+            evicted += 1
+        if evicted:
+            logger.info(
+                "Evicted %d parse cache entries to stay within %d bytes",
+                evicted,
+                self.parse_cache_max_bytes,
+            )
+        return evicted
+
+    def clear_parse_cache(self) -> int:
+        """
+        Remove every persisted parse cache entry and empty the in-memory
+        parse cache of this process.
+
+        Returns:
+            Number of persisted entries removed
+        """
+        _PARSE_CACHE.clear()
+        removed = 0
+        try:
+            for entry in os.scandir(self.parse_cache_path):
+                if entry.name.endswith((".pickle", ".tmp")) and entry.is_file():
+                    os.remove(entry.path)
+                    removed += entry.name.endswith(".pickle")
+        except FileNotFoundError:
+            pass
+        logger.info("Cleared %d parse cache entries", removed)
+        return removed
+
+    def _validate_cached_entity(
+        self,
+        entity_type: str,
+        entity: Any,
+        error_memo: Optional[EntityErrorMemo],
+        memo_key: Tuple[str, int, bool],
+    ) -> Sequence[str]:
+        """
+        Validate a source entity, reusing the errors recorded for the same
+        entity of a byte-identical source file.
+
+        Args:
+            entity_type: IES4 entity type name
+            entity: Entity to validate
+            error_memo: Validation error memo of the entity's source
+                document (None = not cached, always validate)
+            memo_key: Entity type, index in the entity-type array and
+                whether merge defaults were applied to the entity
+
+        Returns:
+            Error messages, without location prefix
+        """
+        if error_memo is None:
+            return self._validate_entity(entity_type, entity)
+
+        errors = error_memo.get(memo_key)
+        if errors is None:
+            errors = error_memo[memo_key] = tuple(
+                self._validate_entity(entity_type, entity)
+            )
+        else:
+            self._parse_cache_stats["validationsReused"] += 1
+        return errors
+
+    def _count_entities(self, data: Dict[str, Any]) -> int:
+        """
+        Count the entities of a document across all entity types.
+
+        Args:
+            data: IES4 document
+
+        Returns:
+            Number of entities
+        """
+        return sum(
+            len(data[entity_type])
+            for entity_type in self.entity_types
+            if isinstance(data.get(entity_type), _ENTITY_ARRAY_TYPES)
+        )
+
+    def _should_stream(self, file_size: int) -> bool:
+        """
+        Decide whether a source file is too large to load in one piece.
+
+        Args:
+            file_size: Size of the source file in bytes
+
+        Returns:
+            bool: True if the file should go through the streaming parser
+        """
+        return self.stream_threshold is not None and file_size > self.stream_threshold
+
+    def _iter_document_entities(
+        self, data: Dict[str, Any]
+    ) -> Iterator[Tuple[str, int, Any]]:
+        """
+        Yield the entities of an already loaded document.
+
+        Args:
+            data: Parsed source document
+
+        Yields:
+            Tuples of entity type, index in the entity-type array and entity
+        """
+        for entity_type in self.entity_types:
+            if entity_type in data and isinstance(data[entity_type], list):
+                for index, entity in enumerate(data[entity_type]):
+                    yield entity_type, index, entity
+
+    def _stream_json_entities(
+        self,
+        file_path: Path,
+        metadata: Dict[str, Any],
+        chunk_size: int = 1024 * 1024,
+    ) -> Iterator[Tuple[str, int, Any]]:
+        """
+        Stream the entities of a source file one at a time.
+
+        Elements of the entity-type arrays are decoded and yielded one by one,
+        so memory use does not depend on the size of the file. All other
+        top-level members (title, ies4Version, ...) are decoded whole and
+        stored in metadata as they are encountered; it is complete once the
+        iterator is exhausted.
+
+        Args:
+            file_path: Path to the JSON file
+            metadata: Dict receiving the non-entity top-level members
+            chunk_size: Number of characters read from the file at a time
+
+        Yields:
+            Tuples of entity type, index in the entity-type array and
+            entity, in file order
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is not a valid JSON object
+        """
+        for key, streamed, value in self._stream_json_members(file_path, chunk_size):
+            if streamed:
+                for index, entity in enumerate(value):
+                    yield key, index, entity
+            else:
+                metadata[key] = value
+
+    def _stream_json_members(
+        self, file_path: Path, chunk_size: int = 1024 * 1024
+    ) -> Iterator[Tuple[str, bool, Any]]:
+        """
+        Stream the top-level members of a source file in file order.
+
+        Args:
+            file_path: Path to the JSON file
+            chunk_size: Number of characters read from the file at a time
+
+        Yields:
+            Tuples of member name, whether the value is streamed, and either
+            an iterator over the elements of an entity-type array (elements
+            left unconsumed are skipped) or the decoded value of any other
+            member
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is not a valid JSON object
+        """
+        logger.debug("Streaming JSON file: %s", file_path)
+        with open(file_path, "r", encoding="utf-8") as f:
+            reader = _StreamingJSONReader(f, chunk_size)
+            reader.expect("{")
+            if reader.peek() == "}":
+                reader.expect("}")
+                reader.expect_end()
+                return
+
+            stream_keys = set(self.entity_types)
+            while True:
+                key = reader.decode_value()
+                if not isinstance(key, str):
+                    raise reader.error("Expecting property name")
+                reader.expect(":")
+
+                if key in stream_keys and reader.peek() == "[":
+                    elements = reader.iter_array()
+                    yield key, True, elements
+                    for _ in elements:
+                        pass
+                else:
+                    yield key, False, reader.decode_value()
+
+                if reader.peek() == ",":
+                    reader.expect(",")
+                    continue
+                reader.expect("}")
+                break
+
+            reader.expect_end()
+
+    def _stream_single_file(
+        self, file_path: Path, entity_errors: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Stream a folder's only source file into a document.
+
+        The document has the same members in the same order as when the file
+        is loaded whole, but the file's text is never held in memory and,
+        under a memory budget, the entity arrays may spill to disk. Entities
+        are validated as they are read.
+
+        Args:
+            file_path: Path to the JSON file
+            entity_errors: Receives the validation errors of the entities,
+                naming source file and entity index
+
+        Returns:
+            The source document
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is not a valid JSON object
+        """
+        relative_path = str(file_path.relative_to(self.data_path))
+        spill_store = None
+        if self.memory_budget is not None:
+            spill_store = _EntitySpillStore(self.memory_budget, self.spill_path)
+
+        data: Dict[str, Any] = {}
+        for key, streamed, value in self._stream_json_members(file_path):
+            if not streamed:
+                data[key] = value
+                continue
+            # A repeated member replaces the earlier one, as with json.loads;
+            # the spill slots of its entity type are taken, so it stays in
+            # memory
+            entities: Any = []
+            if spill_store is not None and key not in data:
+                entities = spill_store.entity_list(key)
+            data[key] = entities
+            for index, entity in enumerate(value):
+                entity_errors.extend(
+                    f"{relative_path} {key}[{index}]: {error}"
+                    for error in self._validate_entity(key, entity)
+                )
+                entities.append(entity)
+        return data
+
+    def _merge_json_files(
+        self,
+        json_files: Sequence[Union[Path, SourceFile]],
+        entity_errors: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Enhanced merge of multiple JSON files into a single IES4 r4.3.0 compliant
+        structure with comprehensive metadata preservation and audit trail.
+
+        Every entity that enters the merge index is validated once as it
+        arrives, and its errors are kept alongside its index entry, so
+        entities later replaced by newer versions do not report errors.
+
+        Args:
+            json_files (List[Path]): List of JSON file paths to merge; sizes of
+                SourceFile entries are reused instead of statting again
+            entity_errors (List): Receives the validation errors of the merged
+                entities, naming source file and entity index
+
+        Returns:
+            Dict containing the merged data with enhanced metadata
+        """
+        if self.deterministic:
+            timestamp = self._deterministic_timestamp(
+                max(_as_source_file(source).mtime_ns for source in json_files)
+            )
+        else:
+            timestamp = datetime.now().isoformat()
+
+        merged_data = {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "title": "Consolidated IES4 Military Database",
+            "description": f"Consolidated database created on {timestamp}",
+            "ies4Version": self.ies4_version,
+            "specificationDate": self.ies4_spec_date,
+            "consolidationMetadata": {
+                "timestamp": timestamp,
+                "consolidatedFiles": [],
+                "sourceFileCount": len(json_files),
+                "consolidationTool": "IES4Consolidator",
+                "toolVersion": self.tool_version,
+            },
+        }
+
+        # Initialize all entity type arrays; under a memory budget they spill
+        # to an on-disk store once the merged entities outgrow it
+        spill_store = None
+        if self.memory_budget is not None:
+            spill_store = _EntitySpillStore(self.memory_budget, self.spill_path)
+        for entity_type in self.entity_types:
+            merged_data[entity_type] = (
+                spill_store.entity_list(entity_type) if spill_store else []
+            )
+
+        # Per-entity-type index of entity ID -> (slot in merged list, version,
+        # parsed version key, validation errors). Replaces separate
+        # tracker/version/source structures so duplicate checks and version
+        # replacement are O(1), and versions are parsed once on ingestion.
+        entity_index: Dict[str, Dict[str, IndexEntry]] = {
+            entity_type: {} for entity_type in self.entity_types
+        }
+        self._update_counts = {}
+        self._defaulted_timestamps = {}
+
+        for source in json_files:
+            file_path, file_size, file_mtime = _as_source_file(source)
+            logger.info("Processing file: %s", file_path)
+
+            journal: Optional[_MergeJournal] = None
+            if self._should_stream(file_size):
+                # Metadata is filled in as the stream is consumed; parsing is
+                # interleaved with merging and timed as part of the merge.
+                # Merges are journalled so a file that fails part way through
+                # can be taken out again.
+                error_memo = None
+                source_metadata: Dict[str, Any] = {}
+                entities = self._stream_json_entities(file_path, source_metadata)
+                journal = _MergeJournal()
+            else:
+                start = time.perf_counter()
+                data = self._load_json_file(file_path)
+                error_memo, self._entity_error_memo = self._entity_error_memo, None
+                self._phase_timer.add(
+                    "load",
+                    time.perf_counter() - start,
+                    self._count_entities(data) if data else 0,
+                    file_size,
+                )
+                if not data:
+                    continue
+                source_metadata = data
+                entities = self._iter_document_entities(data)
+
+            # Add to source file tracking
+            relative_path = str(file_path.relative_to(self.data_path))
+            merged_data["consolidationMetadata"]["consolidatedFiles"].append(
+                {
+                    "path": relative_path,
+                    "size": file_size,
+                    "processedAt": (
+                        self._deterministic_timestamp(file_mtime)
+                        if self.deterministic
+                        else timestamp
+                    ),
+                }
+            )
+
+            # Merge each entity with enhanced tracking; entity validation is
+            # timed separately and left out of the merge time
+            start = time.perf_counter()
+            validation_start = self._phase_timer.seconds("validation")
+            merged_count = 0
+            try:
+                for entity_type, source_index, entity in entities:
+                    if isinstance(entity, dict) and "id" in entity:
+                        self._merge_entity(
+                            merged_data[entity_type],
+                            entity_index[entity_type],
+                            entity_type,
+                            entity,
+                            f"{relative_path} {entity_type}[{source_index}]",
+                            relative_path,
+                            timestamp,
+                            error_memo,
+                            source_index,
+                            journal,
+                        )
+                        merged_count += 1
+            except (OSError, ValueError) as e:
+                # Skipped like a file that fails to load
+                logger.error("Error streaming %s: %s", file_path, e)
+                if journal is not None:
+                    self._rollback_merge(merged_data, entity_index, journal)
+                merged_data["consolidationMetadata"]["consolidatedFiles"].pop()
+                if journal:
+                    logger.info(
+                        "Removed %d merges streamed from %s before the error",
+                        len(journal),
+                        file_path,
+                    )
+                continue
+            finally:
+                self._phase_timer.add(
+                    "merge",
+                    time.perf_counter()
+                    - start
+                    - (self._phase_timer.seconds("validation") - validation_start),
+                    merged_count,
+                    file_size if self._should_stream(file_size) else 0,
+                )
+
+            # Preserve metadata from source files
+            self._preserve_source_metadata(merged_data, source_metadata, relative_path)
+
+        # Summarise version updates beyond the individually logged ones
+        for entity_type, updates in self._update_counts.items():
+            if updates > self.max_update_messages:
+                logger.info(
+                    "Updated %d %s to newer versions (%d not logged individually)",
+                    updates,
+                    entity_type,
+                    updates - self.max_update_messages,
+                )
+
+        # Add consolidation summary
+        merged_data["consolidationMetadata"]["entityCounts"] = {}
+        for entity_type in self.entity_types:
+            count = len(merged_data[entity_type])
+            if count > 0:
+                merged_data["consolidationMetadata"]["entityCounts"][
+                    entity_type
+                ] = count
+                logger.info("Consolidated %d %s", count, entity_type)
+
+        if entity_errors is not None:
+            for entity_type in self.entity_types:
+                for _, _, _, errors in entity_index[entity_type].values():
+                    entity_errors.extend(errors)
+
+        return merged_data
+
+    def _merge_entity(
+        self,
+        entities: List[Dict[str, Any]],
+        index: Dict[str, IndexEntry],
+        entity_type: str,
+        entity: Dict[str, Any],
+        location: str,
+        relative_path: str,
+        timestamp: str,
+        error_memo: Optional[EntityErrorMemo] = None,
+        source_index: int = 0,
+        journal: Optional[_MergeJournal] = None,
+    ) -> None:
+        """
+        Merge a single source entity into the consolidated entity list.
+
+        Args:
+            entities: Consolidated entity list for the entity type
+            index: Entity ID -> (slot, version, version key, errors) index
+                for the entity type
+            entity_type: IES4 entity type name
+            entity: Source entity to merge
+            location: Source file and entity index, used in error messages
+            relative_path: Relative path of the source file
+            timestamp: Consolidation timestamp
+            error_memo: Validation error memo of the source document when it
+                came from the parse cache
+            source_index: Index of the entity in its source entity-type array
+            journal: Records the merge so _rollback_merge can undo it
+        """
+        entity_id = entity["id"]
+        indexed = index.get(entity_id)
+
+        # Enhanced duplicate handling with versioning
+        if indexed is None:
+            # Add source tracking to entity
+            entity_with_metadata = entity.copy()
+            entity_with_metadata["_sourceFiles"] = [relative_path]
+            entity_with_metadata["_consolidatedAt"] = timestamp
+
+            # Ensure required IES4 fields
+            defaults = {}
+            if "timestamp" not in entity_with_metadata:
+                defaults["timestamp"] = timestamp
+                self._defaulted_timestamps.setdefault(entity_type, set()).add(entity_id)
+            if "version" not in entity_with_metadata:
+                defaults["version"] = "1.0"
+            entity_with_metadata.update(defaults)
+
+            errors = self._validate_cached_entity(
+                entity_type,
+                {**entity, **defaults} if defaults else entity,
+                error_memo,
+                (entity_type, source_index, bool(defaults)),
+            )
+            version = entity.get("version", "1.0")
+            index[entity_id] = (
+                len(entities),
+                version,
+                _version_key(version),
+                tuple(f"{location}: {error}" for error in errors),
+            )
+            entities.append(entity_with_metadata)
+            if journal is not None:
+                journal.added[entity_type] += 1
+
+            logger.debug("Added %s: %s", entity_type, entity_id)
+            return
+
+        # Handle version conflicts
+        slot, existing_version, existing_key, _ = indexed
+        new_version = entity.get("version", "1.0")
+        new_key = _version_key(new_version)
+
+        if (
+            _compare_parsed_versions(
+                new_version, new_key, existing_version, existing_key
+            )
+            > 0
+        ):
+            # Update with newer version in place
+            entity_with_metadata = entity.copy()
+            entity_with_metadata["_sourceFiles"] = [relative_path]
+            entity_with_metadata["_consolidatedAt"] = timestamp
+            entity_with_metadata["_replacedVersion"] = existing_version
+            defaulted = self._defaulted_timestamps.get(entity_type, set())
+            if journal is not None:
+                journal.replaced.append(
+                    (
+                        entity_type,
+                        entity_id,
+                        entities[slot],
+                        indexed,
+                        entity_id in defaulted,
+                    )
+                )
+            defaulted.discard(entity_id)
+
+            errors = self._validate_cached_entity(
+                entity_type, entity, error_memo, (entity_type, source_index, False)
+            )
+            entities[slot] = entity_with_metadata
+            index[entity_id] = (
+                slot,
+                new_version,
+                new_key,
+                tuple(f"{location}: {error}" for error in errors),
+            )
+            updates = self._update_counts.get(entity_type, 0) + 1
+            self._update_counts[entity_type] = updates
+            logger.log(
+                logging.INFO if updates <= self.max_update_messages else logging.DEBUG,
+                "Updated %s: %s from v%s to v%s",
+                entity_type,
+                entity_id,
+                existing_version,
+                new_version,
+            )
+        else:
+            logger.debug(
+                "Skipped %s: %s (older/same version: %s <= %s)",
+                entity_type,
+                entity_id,
+                new_version,
+                existing_version,
+            )
+
+    def _rollback_merge(
+        self,
+        merged_data: Dict[str, Any],
+        entity_index: Dict[str, Dict[str, IndexEntry]],
+        journal: _MergeJournal,
+    ) -> None:
+        """
+        Undo the merges of a source file recorded by _merge_entity.
+
+        Replacements are undone first, most recent first, then the added
+        entities are removed from the end of their merged lists.
+
+        Args:
+            merged_data: Merged data structure the entities went into
+            entity_index: Per-entity-type merge index
+            journal: Undo log of the source file's merges
+        """
+        for entity_type, entity_id, old_entity, old_entry, was_defaulted in reversed(
+            journal.replaced
+        ):
+            merged_data[entity_type][old_entry[0]] = old_entity
+            entity_index[entity_type][entity_id] = old_entry
+            if was_defaulted:
+                self._defaulted_timestamps[entity_type].add(entity_id)
+            self._update_counts[entity_type] -= 1
+
+        for entity_type, count in journal.added.items():
+            defaulted = self._defaulted_timestamps.get(entity_type, set())
+            for _ in range(count):
+                entity_id = merged_data[entity_type].pop()["id"]
+                del entity_index[entity_type][entity_id]
+                defaulted.discard(entity_id)
+
+    def _preserve_source_metadata(
+        self, merged_data: Dict[str, Any], source_data: Dict[str, Any], source_path: str
+    ) -> None:
+        """
+        Preserve important metadata from source files.
+
+        Args:
+            merged_data: Target merged data structure
+            source_data: Source file data
+            source_path: Relative path of source file
+        """
+        # Copy metadata from first file if not already set
+        if (
+            "title" not in merged_data
+            or merged_data["title"] == "Consolidated IES4 Military Database"
+        ):
+            if "title" in source_data:
+                merged_data["title"] = (
+                    f"Consolidated {source_data.get('title', 'IES4 Database')}"
+                )
+            if "description" in source_data:
+                merged_data["description"] = source_data["description"]
+
+        # Preserve source IES4 metadata
+        if (
+            "ies4Version" in source_data
+            and source_data["ies4Version"] != self.ies4_version
+        ):
+            if "sourceVersions" not in merged_data["consolidationMetadata"]:
+                merged_data["consolidationMetadata"]["sourceVersions"] = {}
+            merged_data["consolidationMetadata"]["sourceVersions"][source_path] = (
+                source_data["ies4Version"]
+            )
+
+    def _compare_versions(self, version1: str, version2: str) -> int:
+        """
+        Compare two version strings.
+
+        Args:
+            version1: First version string
+            version2: Second version string
+
+        Returns:
+            int: 1 if version1 > version2, -1 if version1 < version2, 0 if equal
+        """
+        return _compare_parsed_versions(
+            version1, _version_key(version1), version2, _version_key(version2)
+        )
+
+    def _save_consolidated_file(
+        self,
+        data: Dict[str, Any],
+        output_file: Path,
+        entity_errors: Optional[List[str]] = None,
+    ) -> bool:
+        """
+        Save consolidated data to output file.
+
+        The document is written member by member and entity by entity to a
+        temporary file that atomically replaces the output file once
+        complete, so readers never see a partially written file.
+
+        Args:
+            data (Dict): Data to save
+            output_file (Path): Output file path
+            entity_errors (List): Errors from ingestion-time entity
+                validation; when given, only document-level invariants are
+                validated here
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            # Validate before saving
+            if not self._validate_consolidated(data, output_file, entity_errors):
+                return False
+
+            start = time.perf_counter()
+            _, compact, opener = OUTPUT_FORMATS[self.output_format]
+            if self.deterministic and self.output_format == "gzip":
+                opener = _open_gzip_reproducible
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            with _StreamingJSONWriter(
+                output_file,
+                compact,
+                opener,
+                self.codec,
+                sort_keys=self.deterministic,
+                skip_unchanged=self.deterministic,
+            ) as writer:
+                items = sorted(data.items()) if self.deterministic else data.items()
+                for key, value in items:
+                    if key in self.entity_types and isinstance(
+                        value, _ENTITY_ARRAY_TYPES
+                    ):
+                        writer.begin_array(key)
+                        for entity in value:
+                            writer.write_element(entity)
+                        writer.end_array()
+                    else:
+                        writer.write_member(key, value)
+            self._phase_timer.add(
+                "write",
+                time.perf_counter() - start,
+                self._count_entities(data),
+                output_file.stat().st_size,
+            )
+
+            if writer.unchanged:
+                self._unchanged_outputs.append(output_file.name)
+                logger.info("Consolidated file unchanged, kept: %s", output_file)
+            else:
+                logger.info("Saved consolidated file: %s", output_file)
+            return True
+
+        except Exception as e:
+            logger.error("Error saving %s: %s", output_file, e)
+            return False
+
+    def _validate_consolidated(
+        self,
+        data: Dict[str, Any],
+        output_file: Path,
+        entity_errors: Optional[List[str]] = None,
+    ) -> bool:
+        """
+        Validate consolidated data before it is published.
+
+        Args:
+            data (Dict): Consolidated data
+            output_file (Path): File the data is published as, for logging
+            entity_errors (List): Errors from ingestion-time entity
+                validation, see _save_consolidated_file
+
+        Returns:
+            bool: True if valid
+        """
+        start = time.perf_counter()
+        valid = self._validate_json_structure(data, entity_errors)
+        self._phase_timer.add("validation", time.perf_counter() - start)
+        if not valid:
+            logger.error("Data validation failed for %s", output_file)
+        return valid
+
+    def _ndjson_path(self, folder_key: str) -> Path:
+        """
+        Directory holding the JSON Lines export of a folder.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Path of output/consolidated/ndjson/<folder_key>
+        """
+        return self.output_path / "ndjson" / folder_key
+
+    def _export_ndjson(self, folder_key: str, data: Dict[str, Any]) -> int:
+        """
+        Export consolidated entities as JSON Lines, one file per entity type.
+
+        Entities are written straight from the consolidated entity arrays,
+        one compact JSON object per line, with _sourceFiles/_consolidatedAt
+        provenance filled in where the source (single-file folders) lacks it.
+        Lines cannot be written during the merge, as a later file may still
+        replace an entity with a newer version. Under a memory budget, the
+        arrays are read back from the spill store in batches, so the export
+        needs no more memory than the merge.
+        The remaining top-level members, including consolidationMetadata, go
+        into a small sidecar file. Files are replaced atomically and exports
+        of entity types that are now empty are removed.
+
+        Args:
+            folder_key: Folder key from _folder_key
+            data: Consolidated document
+
+        Returns:
+            int: Total bytes written
+        """
+        export_path = self._ndjson_path(folder_key)
+        export_path.mkdir(parents=True, exist_ok=True)
+        codec = self.codec
+
+        metadata = data.get("consolidationMetadata", {})
+        consolidated_files = metadata.get("consolidatedFiles", [])
+        provenance = {
+            "_sourceFiles": [info["path"] for info in consolidated_files[:1]],
+            "_consolidatedAt": metadata.get("timestamp"),
+        }
+
+        written_files = set()
+        bytes_written = 0
+
+        for entity_type in self.entity_types:
+            entities = data.get(entity_type)
+            if not isinstance(entities, _ENTITY_ARRAY_TYPES) or not entities:
+                continue
+
+            jsonl_file = export_path / f"{entity_type}.jsonl"
+            temp_path = jsonl_file.with_name(jsonl_file.name + ".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for entity in entities:
+                    if isinstance(entity, dict) and "_sourceFiles" not in entity:
+                        entity = {**entity, **provenance}
+                    f.write(codec.dumps(entity, sort_keys=self.deterministic))
+                    f.write("\n")
+            if self.deterministic and _same_file_content(temp_path, jsonl_file):
+                temp_path.unlink()
+                self._unchanged_outputs.append(
+                    jsonl_file.relative_to(self.output_path).as_posix()
+                )
+            else:
+                os.replace(temp_path, jsonl_file)
+
+            written_files.add(jsonl_file.name)
+            bytes_written += jsonl_file.stat().st_size
+
+        sidecar = {
+            key: value
+            for key, value in data.items()
+            if key not in self.entity_types
+            or not isinstance(value, _ENTITY_ARRAY_TYPES)
+        }
+        sidecar_file = export_path / self.NDJSON_METADATA_FILE
+        with _StreamingJSONWriter(
+            sidecar_file,
+            sort_keys=self.deterministic,
+            skip_unchanged=self.deterministic,
+        ) as writer:
+            for key, value in sidecar.items():
+                writer.write_member(key, value)
+        bytes_written += sidecar_file.stat().st_size
+
+        for stale_file in export_path.glob("*.jsonl"):
+            if stale_file.name not in written_files:
+                stale_file.unlink()
+
+        logger.info("Exported JSON Lines for %s: %s", folder_key, export_path)
+        return bytes_written
+
+    def _entity_index_path(self, folder_key: str) -> Path:
+        """
+        File holding the partial entity index of a folder, kept so that
+        incremental runs can index folders they skip.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Path of output/consolidated/entity_index/<folder_key>.json
+        """
+        return self.output_path / "entity_index" / f"{folder_key}.json"
+
+    def _save_entity_index(
+        self, folder_key: str, data: Dict[str, Any]
+    ) -> FolderEntityIndex:
+        """
+        Build and save the partial entity index of a consolidated folder.
+
+        Args:
+            folder_key: Folder key from _folder_key
+            data: Consolidated document
+
+        Returns:
+            Entity type -> (IDs, versions) of the consolidated entities
+        """
+        entity_index: FolderEntityIndex = {}
+        for entity_type in self.entity_types:
+            entities = data.get(entity_type)
+            if not isinstance(entities, _ENTITY_ARRAY_TYPES) or not entities:
+                continue
+            ids: List[Any] = []
+            versions: List[Any] = []
+            for entity in entities:
+                if isinstance(entity, dict) and "id" in entity:
+                    ids.append(entity["id"])
+                    versions.append(entity.get("version"))
+            entity_index[entity_type] = (ids, versions)
+
+        index_file = self._entity_index_path(folder_key)
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        with _StreamingJSONWriter(
+            index_file, True, codec=self.codec, skip_unchanged=self.deterministic
+        ) as writer:
+            for entity_type, (ids, versions) in entity_index.items():
+                writer.write_member(entity_type, [ids, versions])
+
+        return entity_index
+
+    def _load_entity_index(self, folder_key: str) -> FolderEntityIndex:
+        """
+        Load the partial entity index saved by a previous run.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Entity type -> (IDs, versions), empty if unreadable
+        """
+        try:
+            saved = self.codec.load(self._entity_index_path(folder_key))
+            return {
+                entity_type: (ids, versions)
+                for entity_type, (ids, versions) in saved.items()
+            }
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("Could not load entity index for %s: %s", folder_key, e)
+            return {}
+
+    def _delta_path(self, folder_key: str) -> Path:
+        """
+        Delta file listing the entities of a folder changed by this run.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Path of output/consolidated/delta/ies4_<folder_key>_delta.json
+        """
+        return self.output_path / "delta" / f"ies4_{folder_key}_delta.json"
+
+    def _fingerprints_path(self, folder_key: str) -> Path:
+        """
+        File holding the entity fingerprints of a folder's last consolidation.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Path of output/consolidated/delta/<folder_key>.fingerprints.json
+        """
+        return self.output_path / "delta" / f"{folder_key}.fingerprints.json"
+
+    def _primary_output(self, folder_key: str) -> Path:
+        """
+        The file a folder's consolidation is published as: the delta file
+        with delta_output "only", the consolidated file otherwise.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Output path
+        """
+        if self.delta_output == "only":
+            return self._delta_path(folder_key)
+        return self._output_file(folder_key)
+
+    def _load_fingerprints(
+        self, folder_key: str
+    ) -> Tuple[Optional[str], EntityFingerprints]:
+        """
+        Load the entity fingerprints saved by the previous consolidation.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Tuple of the previous consolidation timestamp and its
+            fingerprints; (None, {}) if there is none or it is unreadable
+        """
+        fingerprints_file = self._fingerprints_path(folder_key)
+        if not fingerprints_file.is_file():
+            return None, {}
+
+        try:
+            saved = self.codec.load(fingerprints_file)
+            if saved.get("jsonBackend") != self.codec.name:
+                logger.info(
+                    "Entity fingerprints of %s were computed by the %s backend; "
+                    "entities may be reported as updated",
+                    folder_key,
+                    saved.get("jsonBackend"),
+                )
+            return saved.get("consolidatedAt"), {
+                entity_type: dict(zip(ids, zip(versions, fingerprints)))
+                for entity_type, (ids, versions, fingerprints) in saved[
+                    "entityTypes"
+                ].items()
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(
+                "Could not load entity fingerprints for %s: %s", folder_key, e
+            )
+            return None, {}
+
+    def _write_delta(
+        self, folder_key: str, data: Dict[str, Any]
+    ) -> Tuple[int, Dict[str, int]]:
+        """
+        Write the delta of a consolidated folder against its previous
+        consolidation, then save the folder's entity fingerprints.
+
+        Entities are compared by a fingerprint of their content without
+        _consolidatedAt or a timestamp defaulted to it, against the
+        fingerprints saved by the previous run, so the previous document is
+        never read. With delta_output "only" the changed entities are
+        streamed into the delta file in a second pass over the entity arrays.
+
+        Args:
+            folder_key: Folder key from _folder_key
+            data: Consolidated document
+
+        Returns:
+            Tuple of bytes written to the delta file and the numbers of
+            added, updated and removed entities
+        """
+        since, previous = self._load_fingerprints(folder_key)
+        fingerprints: Dict[str, Tuple[List[Any], List[Any], List[str]]] = {}
+        changes: Dict[str, Dict[str, List[Any]]] = {}
+        changed_slots: Dict[str, set] = {}
+        totals = {"added": 0, "updated": 0, "removed": 0}
+
+        for entity_type in self.entity_types:
+            entities = data.get(entity_type)
+            if not isinstance(entities, _ENTITY_ARRAY_TYPES):
+                entities = []
+            known = previous.get(entity_type, {})
+            defaulted = self._defaulted_timestamps.get(entity_type, ())
+            ids: List[Any] = []
+            versions: List[Any] = []
+            digests: List[str] = []
+            added: List[Any] = []
+            updated: List[Dict[str, Any]] = []
+            slots = set()
+            for slot, entity in enumerate(entities):
+                if not isinstance(entity, dict) or "id" not in entity:
+                    continue
+                entity_id = entity["id"]
+                version = entity.get("version")
+                digest = self.codec.fingerprint(
+                    {
+                        k: v
+                        for k, v in entity.items()
+                        if k != "_consolidatedAt"
+                        and not (k == "timestamp" and entity_id in defaulted)
+                    }
+                )
+                ids.append(entity_id)
+                versions.append(version)
+                digests.append(digest)
+
+                old = known.pop(entity_id, None)
+                if old is None:
+                    added.append(entity_id)
+                elif old[1] != digest:
+                    updated.append(
+                        {"id": entity_id, "oldVersion": old[0], "newVersion": version}
+                    )
+                else:
+                    continue
+                slots.add(slot)
+
+            # Whatever was not seen again has been removed
+            removed = list(known)
+            if ids:
+                fingerprints[entity_type] = (ids, versions, digests)
+            if added or updated or removed:
+                changes[entity_type] = {
+                    "added": added,
+                    "updated": updated,
+                    "removed": removed,
+                }
+                changed_slots[entity_type] = slots
+                totals["added"] += len(added)
+                totals["updated"] += len(updated)
+                totals["removed"] += len(removed)
+
+        metadata = data.get("consolidationMetadata")
+        consolidated_at = (
+            metadata.get("timestamp") if isinstance(metadata, dict) else None
+        )
+        delta_file = self._delta_path(folder_key)
+        delta_file.parent.mkdir(parents=True, exist_ok=True)
+        _, compact, _ = OUTPUT_FORMATS[self.output_format]
+        with _StreamingJSONWriter(
+            delta_file,
+            compact,
+            codec=self.codec,
+            sort_keys=self.deterministic,
+            skip_unchanged=self.deterministic,
+        ) as writer:
+            writer.write_member("folder", folder_key)
+            writer.write_member("since", since)
+            writer.write_member("consolidatedAt", consolidated_at)
+            writer.write_member("totals", totals)
+            writer.write_member("changes", changes)
+            if self.delta_output == "only":
+                for entity_type, slots in changed_slots.items():
+                    if not slots:
+                        continue
+                    writer.begin_array(entity_type)
+                    for slot, entity in enumerate(data[entity_type]):
+                        if slot in slots:
+                            writer.write_element(entity)
+                    writer.end_array()
+        if writer.unchanged:
+            self._unchanged_outputs.append(
+                delta_file.relative_to(self.output_path).as_posix()
+            )
+
+        # Saved last, so a failed delta leaves the previous baseline in place
+        with _StreamingJSONWriter(
+            self._fingerprints_path(folder_key),
+            True,
+            codec=self.codec,
+            skip_unchanged=self.deterministic,
+        ) as writer:
+            writer.write_member("consolidatedAt", consolidated_at)
+            writer.write_member("jsonBackend", self.codec.name)
+            writer.write_member("entityTypes", fingerprints)
+
+        logger.info(
+            "Delta for %s: %d added, %d updated, %d removed",
+            folder_key,
+            totals["added"],
+            totals["updated"],
+            totals["removed"],
+        )
+        return delta_file.stat().st_size, totals
+
+    def _write_unchanged_delta(self, folder_key: str) -> None:
+        """
+        Replace the delta of a folder skipped as unchanged with an empty
+        delta, so the previous run's changes are not delivered twice.
+
+        Args:
+            folder_key: Folder key from _folder_key
+        """
+        since, _ = self._load_fingerprints(folder_key)
+        with _StreamingJSONWriter(
+            self._delta_path(folder_key),
+            OUTPUT_FORMATS[self.output_format][1],
+            codec=self.codec,
+            skip_unchanged=self.deterministic,
+        ) as writer:
+            writer.write_member("folder", folder_key)
+            writer.write_member("since", since)
+            writer.write_member("consolidatedAt", since)
+            writer.write_member("totals", {"added": 0, "updated": 0, "removed": 0})
+            writer.write_member("changes", {})
+
+    def _reduce_entity_indexes(
+        self, folder_indexes: Dict[str, FolderEntityIndex]
+    ) -> Dict[str, Any]:
+        """
+        Reduce per-folder entity indexes into the cross-folder duplicate report.
+
+        The global index is sharded per entity type and keeps the first
+        (folder, version) seen for each ID in a dict; only IDs seen again
+        get a list of occurrences, so the reduction is O(total entities).
+
+        Args:
+            folder_indexes: Partial entity index per folder key, in folder order
+
+        Returns:
+            Report listing, per entity type, every ID consolidated in more
+            than one folder with its version in each folder
+        """
+        duplicates: Dict[str, List[Dict[str, Any]]] = {}
+        indexed_entities = 0
+
+        for entity_type in self.entity_types:
+            first_seen: Dict[Any, Tuple[str, Any]] = {}
+            occurrences: Dict[Any, List[Tuple[str, Any]]] = {}
+
+            for folder_key, entity_index in folder_indexes.items():
+                ids, versions = entity_index.get(entity_type, ((), ()))
+                indexed_entities += len(ids)
+                for entity_id, version in zip(ids, versions):
+                    if not isinstance(entity_id, (str, int, float)):
+                        continue
+                    first = first_seen.setdefault(entity_id, (folder_key, version))
+                    if first[0] != folder_key:
+                        occurrences.setdefault(entity_id, [first]).append(
+                            (folder_key, version)
+                        )
+
+            if occurrences:
+                duplicates[entity_type] = [
+                    {
+                        "id": entity_id,
+                        "conflict": len({repr(v) for _, v in found}) > 1,
+                        "folders": [
+                            {"folder": folder_key, "version": version}
+                            for folder_key, version in found
+                        ],
+                    }
+                    for entity_id, found in occurrences.items()
+                ]
+
+        entries = [entry for found in duplicates.values() for entry in found]
+        return {
+            "generatedAt": self._record_timestamp(),
+            "folders": list(folder_indexes),
+            "indexedEntities": indexed_entities,
+            "duplicateCount": len(entries),
+            "conflictCount": sum(1 for entry in entries if entry["conflict"]),
+            "duplicates": duplicates,
+        }
+
+    def _save_duplicate_report(self, report: Dict[str, Any]) -> None:
+        """
+        Save the cross-folder duplicate report and log its totals.
+
+        Args:
+            report: Report from _reduce_entity_indexes
+        """
+        if report["duplicateCount"]:
+            logger.warning(
+                "%d entity IDs appear in more than one folder "
+                "(%d with conflicting versions)",
+                report["duplicateCount"],
+                report["conflictCount"],
+            )
+        try:
+            with _StreamingJSONWriter(
+                self.duplicate_report_path, skip_unchanged=self.deterministic
+            ) as writer:
+                for key, value in report.items():
+                    writer.write_member(key, value)
+            logger.info(
+                "Cross-folder duplicate report saved: %s", self.duplicate_report_path
+            )
+        except OSError as e:
+            logger.error("Error saving duplicate report: %s", e)
+
+    def _sqlite_path(self, folder_key: str) -> Path:
+        """
+        SQLite database holding the consolidation of a folder.
+
+        Args:
+            folder_key: Folder key from _folder_key
+
+        Returns:
+            Path of output/consolidated/sqlite/ies4_<folder_key>.sqlite
+        """
+        return self.output_path / "sqlite" / f"ies4_{folder_key}.sqlite"
+
+    def _connect_sqlite_output(self, database_file: Path) -> "sqlite3.Connection":
+        """
+        Create a fresh output database with the entity and metadata tables.
+
+        The database is built in a temporary file that the caller renames
+        over the target, so no rollback journal or fsync is needed.
+
+        Args:
+            database_file: Temporary database path (replaced if present)
+
+        Returns:
+            Open connection
+        """
+        import sqlite3
+
+        if database_file.exists():
+            database_file.unlink()
+        connection = sqlite3.connect(database_file)
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        for statement in _SQLITE_SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def _finish_sqlite_output(
+        self, connection: "sqlite3.Connection", temp_file: Path, database_file: Path
+    ) -> int:
+        """
+        Index, close and atomically move a database built by
+        _connect_sqlite_output into place.
+
+        Returns:
+            int: Size of the database in bytes
+        """
+        for statement in _SQLITE_INDEXES:
+            connection.execute(statement)
+        connection.commit()
+        connection.close()
+        if self.deterministic and _same_file_content(temp_file, database_file):
+            temp_file.unlink()
+            self._unchanged_outputs.append(
+                database_file.relative_to(self.output_path).as_posix()
+            )
+        else:
+            os.replace(temp_file, database_file)
+        return database_file.stat().st_size
+
+    def _export_sqlite(
+        self, folder_key: str, data: Dict[str, Any], output_file: Optional[str]
+    ) -> int:
+        """
+        Write a folder's consolidated entities and metadata to SQLite.
+
+        Every entity becomes a row of the entities table with its id, type,
+        version, timestamp and source file as indexed columns and the full
+        entity as compact JSON. Rows are inserted in batches within a single
+        transaction; indexes are built once the rows are loaded.
+
+        Args:
+            folder_key: Folder key from _folder_key
+            data: Consolidated document
+            output_file: Name of the folder's consolidated JSON file, or None
+                when it is not written
+
+        Returns:
+            int: Size of the database in bytes
+        """
+        database_file = self._sqlite_path(folder_key)
+        database_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = database_file.with_name(database_file.name + ".tmp")
+        encode = self.codec.dumps
+
+        def column(value: Any) -> Any:
+            return value if isinstance(value, _SQLITE_SCALARS) else encode(value)
+
+        metadata = data.get("consolidationMetadata", {})
+        consolidated_files = metadata.get("consolidatedFiles", [])
+        # Single-file folders carry no _sourceFiles provenance
+        default_source = consolidated_files[0]["path"] if consolidated_files else None
+
+        def rows() -> Iterator[Tuple[Any, ...]]:
+            for entity_type in self.entity_types:
+                entities = data.get(entity_type)
+                if not isinstance(entities, _ENTITY_ARRAY_TYPES):
+                    continue
+                for entity in entities:
+                    if not isinstance(entity, dict) or "id" not in entity:
+                        continue
+                    source_files = entity.get("_sourceFiles") or [default_source]
+                    yield (
+                        folder_key,
+                        entity_type,
+                        column(entity["id"]),
+                        column(entity.get("type")),
+                        column(entity.get("version")),
+                        column(entity.get("timestamp")),
+                        column(source_files[0]),
+                        encode(entity),
+                    )
+
+        connection = self._connect_sqlite_output(temp_file)
+        try:
+            pending = rows()
+            while True:
+                batch = list(islice(pending, self.SQLITE_BATCH_SIZE))
+                if not batch:
+                    break
+                connection.executemany(
+                    "INSERT INTO entities VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch
+                )
+            connection.execute(
+                "INSERT INTO consolidation_metadata VALUES (?, ?, ?)",
+                (folder_key, output_file, encode(metadata)),
+            )
+            connection.executemany(
+                "INSERT INTO consolidated_files VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        folder_key,
+                        info.get("path"),
+                        info.get("size"),
+                        info.get("processedAt"),
+                    )
+                    for info in consolidated_files
+                ),
+            )
+            bytes_written = self._finish_sqlite_output(
+                connection, temp_file, database_file
+            )
+        except BaseException:
+            connection.close()
+            temp_file.unlink(missing_ok=True)
+            raise
+
+        logger.info("Exported SQLite database for %s: %s", folder_key, database_file)
+        return bytes_written
+
+    def _build_combined_sqlite(self, folder_keys: List[str]) -> Optional[int]:
+        """
+        Merge the per-folder SQLite databases into the combined database.
+
+        Folders skipped by an incremental run contribute their existing
+        database, so the combined database always covers every folder.
+
+        Args:
+            folder_keys: Keys of the folders to include
+
+        Returns:
+            Size of the combined database in bytes, or None if it failed
+        """
+        import sqlite3
+
+        temp_file = self.combined_sqlite_path.with_name(
+            self.combined_sqlite_path.name + ".tmp"
+        )
+        try:
+            connection = self._connect_sqlite_output(temp_file)
+            try:
+                for folder_key in folder_keys:
+                    folder_database = self._sqlite_path(folder_key)
+                    if not folder_database.is_file():
+                        logger.warning("No SQLite database for %s", folder_key)
+                        continue
+                    connection.execute(
+                        "ATTACH DATABASE ? AS folder", (str(folder_database),)
+                    )
+                    for table in _SQLITE_TABLES:
+                        connection.execute(
+                            f"INSERT INTO main.{table} SELECT * FROM folder.{table}"
+                        )
+                    connection.commit()
+                    connection.execute("DETACH DATABASE folder")
+                bytes_written = self._finish_sqlite_output(
+                    connection, temp_file, self.combined_sqlite_path
+                )
+            except BaseException:
+                connection.close()
+                raise
+        except (OSError, sqlite3.Error) as e:
+            logger.error("Error building %s: %s", self.combined_sqlite_path, e)
+            temp_file.unlink(missing_ok=True)
+            return None
+
+        logger.info("Saved combined SQLite database: %s", self.combined_sqlite_path)
+        return bytes_written
+
+    def scan_source_folders(self) -> Dict[Path, List[SourceFile]]:
+        """
+        Discover country/region folders and their JSON files in a single
+        os.scandir walk, with enhanced support for nested subfolder
+        structures (e.g., data/uk/army/, data/uk/navy/).
+
+        A top-level folder holding JSON files is a country folder; otherwise
+        every folder below it that holds JSON files is. File sizes and mtimes
+        come from the same walk, so later stages (incremental checks, the
+        streaming threshold, metadata, dry runs) never stat or glob again.
+
+        Returns:
+            Dict mapping each country folder, in path order, to its JSON
+            files sorted by path
+        """
+        country_folders: Dict[Path, List[SourceFile]] = {}
+
+        if not self.data_path.exists():
+            logger.error("Data path does not exist: %s", self.data_path)
+            return country_folders
+
+        _, top_folders = self._scan_folder(self.data_path, follow_symlinks=True)
+        for item in top_folders:
+            # Check if folder contains JSON files directly
+            json_files, subfolders = self._scan_folder(item)
+            if json_files:
+                country_folders[item] = json_files
+                logger.debug(
+                    "Found country folder: %s (%d JSON files)",
+                    item.name,
+                    len(json_files),
+                )
+            else:
+                # Check for nested subfolders with JSON files
+                nested_folders = self._walk_nested_folders(subfolders)
+                if nested_folders:
+                    country_folders.update(nested_folders)
+                    logger.debug(
+                        "Found %d nested folders in %s", len(nested_folders), item.name
+                    )
+
+        return country_folders
+
+    def _scan_folder(
+        self, folder: Path, follow_symlinks: bool = False
+    ) -> Tuple[List[SourceFile], List[Path]]:
+        """
+        List the JSON files and subfolders of one folder with os.scandir.
+
+        Args:
+            folder: Folder to scan
+            follow_symlinks: Whether symlinked directories count as subfolders
+
+        Returns:
+            Tuple of JSON files and subfolders, each sorted by path
+        """
+        json_files = []
+        subfolders = []
+
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        subfolders.append(Path(entry.path))
+                    elif (
+                        os.path.normcase(entry.name).endswith(".json")
+                        and entry.is_file()
+                    ):
+                        stat = entry.stat()
+                        json_files.append(
+                            SourceFile(Path(entry.path), stat.st_size, stat.st_mtime_ns)
+                        )
+        except OSError as e:
+            logger.error("Error scanning folder %s: %s", folder, e)
+
+        json_files.sort()
+        subfolders.sort()
+        return json_files, subfolders
+
+    def _walk_nested_folders(
+        self, subfolders: List[Path]
+    ) -> Dict[Path, List[SourceFile]]:
+        """
+        Walk folder trees and collect every folder holding JSON files.
+
+        Args:
+            subfolders: Root folders of the walk
+
+        Returns:
+            Dict mapping folders with JSON files to their files, in path order
+        """
+        nested_folders: Dict[Path, List[SourceFile]] = {}
+        seen = set()
+        pending = list(reversed(subfolders))
+
+        while pending:
+            folder = pending.pop()
+            if folder in seen:
+                continue
+            seen.add(folder)
+
+            json_files, children = self._scan_folder(folder)
+            if json_files:
+                nested_folders[folder] = json_files
+                logger.debug(
+                    "Found nested folder: %s (%d JSON files)",
+                    folder.relative_to(self.data_path),
+                    len(json_files),
+                )
+            pending.extend(reversed(children))
 
-class IES4Consolidator:
-    """
-    Main class for consolidating IES4-compliant JSON files by country/region.
-    """
+        return nested_folders
+
+    def _discover_country_folders(self) -> List[Path]:
+        """
+        Discover country/region folders in the data directory.
+
+        Returns:
+            List of Path objects for country folders
+        """
+        return list(self.scan_source_folders())
 
-    def __init__(self, base_path: str = "C:\\ies4-military-database-analysis"):
+    def _discover_nested_folders(self, parent_folder: Path) -> List[Path]:
         """
-        Initialize the consolidator with base path.
+        Recursively discover nested folders containing JSON files.
 
         Args:
-            base_path (str): Base directory path for the analysis
+            parent_folder: Parent directory to scan
+
+        Returns:
+            List of nested folders containing JSON files
         """
-        self.base_path = Path(base_path)
-        self.data_path = self.base_path / "data"
-        self.schema_path = self.base_path / "ies4_json_schema.json"
-        self.output_path = self.base_path / "output" / "consolidated"
+        _, subfolders = self._scan_folder(parent_folder)
+        return list(self._walk_nested_folders(subfolders))
 
-        # Ensure output directory exists
-        self.output_path.mkdir(parents=True, exist_ok=True)
+    def consolidate_by_country(
+        self, folders: Optional[Iterable[str]] = None
+    ) -> Dict[str, bool]:
+        """
+        Enhanced method to consolidate JSON files by country/region with support
+        for nested folder structures and improved error handling.
 
-        # Load IES4 schema for validation
-        self.schema = self._load_schema()
+        Folders are processed serially, or spread over a process pool when the
+        consolidator was created with more than one worker. Results and log
+        output are identical in both modes. In incremental mode, folders whose
+        sources and configuration match the manifest of the previous run are
+        skipped and keep their existing consolidated file.
 
-        # IES4 r4.3.0 entity types that can be consolidated
-        self.entity_types = [
-            "countries",
-            "areas",
-            "vehicles",
-            "vehicleTypes",
-            "peopleTypes",
-            "people",
-            "representations",
-            "organizations",  # Added for r4.3.0
-            "events",  # Added for r4.3.0
-            "activities",  # Added for r4.3.0
-            "facilities",  # Added for r4.3.0
-            "items",  # Added for r4.3.0
-            "locations",  # Enhanced for r4.3.0
-            "relationships",  # Added for r4.3.0
+        Args:
+            folders: Keys of the folders to consolidate (see _folder_key);
+                the others keep their existing outputs and are reported as
+                skipped (None = every folder)
+
+        Returns:
+            Dict mapping folder paths to consolidation success status
+        """
+        logger.info("Starting IES4 r4.3.0 JSON file consolidation process")
+
+        run_start = time.perf_counter()
+        source_folders = self.scan_source_folders()
+        self._newest_source_mtime_ns = max(
+            (source.mtime_ns for files in source_folders.values() for source in files),
+            default=0,
+        )
+        country_folders = list(source_folders)
+        results = {}
+        # Only files sharing their size with another can be byte-identical
+        sizes = Counter(
+            source.size for files in source_folders.values() for source in files
+        )
+        self._duplicate_sizes = {size for size, count in sizes.items() if count > 1}
+        self.folder_status = {}
+        self.folder_details = {}
+        self.folder_indexes = {}
+        self.duplicate_report = None
+
+        run_timer = _PhaseTimer()
+        run_timer.add("discovery", time.perf_counter() - run_start)
+        self.run_performance = run_timer.to_dict()
+
+        if not country_folders:
+            logger.warning("No country folders with JSON files found")
+            return results
+
+        self._ensure_output_path()
+        manifest = self._load_manifest()
+        config_hash = self._config_fingerprint()
+        previous_folders = (
+            manifest.get("folders", {})
+            if self.incremental and manifest.get("configHash") == config_hash
+            else {}
+        )
+
+        snapshots: Dict[str, List[Dict[str, Any]]] = {}
+        skipped = set()
+        start = time.perf_counter()
+        if self.incremental:
+            for country_folder in country_folders:
+                folder_key = self._folder_key(country_folder)
+                previous = previous_folders.get(folder_key)
+                snapshots[folder_key] = self._snapshot_sources(
+                    source_folders[country_folder],
+                    previous["files"] if previous else [],
+                )
+                if previous and self._is_folder_unchanged(
+                    folder_key, previous, snapshots[folder_key]
+                ):
+                    skipped.add(folder_key)
+            run_timer.add("changeDetection", time.perf_counter() - start)
+
+        # Folders left out by the caller are skipped whatever their state,
+        # and keep their manifest entries
+        held = set()
+        if folders is not None:
+            requested = set(folders)
+            held = {
+                self._folder_key(folder)
+                for folder in country_folders
+                if self._folder_key(folder) not in requested
+            }
+            skipped |= held
+
+        to_build = [
+            folder
+            for folder in country_folders
+            if self._folder_key(folder) not in skipped
         ]
+        outcomes = None
+        if self.workers > 1 and len(to_build) > 1:
+            if self.schema:
+                # Workers started with the fork method inherit the compiled
+                # validator. Spawn and forkserver workers (Windows, macOS,
+                # Linux from Python 3.14) compile their own on first use
+                try:
+                    self._get_schema_validator()
+                except _jsonschema().SchemaError:
+                    pass
+            outcomes = self._run_parallel(to_build, source_folders)
 
-        # IES4 r4.3.0 required metadata fields
-        self.required_ies4_fields = ["id", "type", "timestamp", "version"]
+        for country_folder in country_folders:
+            folder_key = self._folder_key(country_folder)
 
-        # Configuration for IES4 version support
-        self.ies4_version = "4.3.0"
-        self.ies4_spec_date = "2024-12-16"
+            if folder_key in skipped:
+                logger.info("Skipping unchanged folder: %s", folder_key)
+                results[folder_key] = True
+                self.folder_status[folder_key] = "skipped"
+                if self.cross_folder_index:
+                    self.folder_indexes[folder_key] = self._load_entity_index(
+                        folder_key
+                    )
+                # Held folders were not looked at, so their delta is kept
+                if self.delta_output and folder_key not in held:
+                    self._write_unchanged_delta(folder_key)
+                continue
 
-    def _load_schema(self) -> Optional[Dict[str, Any]]:
+            if outcomes is None:
+                folder_key, success = self._consolidate_folder(
+                    country_folder, source_folders[country_folder]
+                )
+            else:
+                success = self._replay_outcome(
+                    country_folder, outcomes.get(country_folder)
+                )
+
+            results[folder_key] = success
+            self.folder_status[folder_key] = "rebuilt" if success else "failed"
+
+        self._update_manifest(
+            manifest,
+            config_hash,
+            snapshots,
+            {k: success for k, success in results.items() if k not in held},
+            set(results),
+        )
+
+        if self.cross_folder_index:
+            start = time.perf_counter()
+            self.duplicate_report = self._reduce_entity_indexes(
+                {
+                    folder_key: self.folder_indexes[folder_key]
+                    for folder_key, success in results.items()
+                    if success and folder_key in self.folder_indexes
+                }
+            )
+            self._save_duplicate_report(self.duplicate_report)
+            run_timer.add("crossFolderIndex", time.perf_counter() - start)
+
+        self.combined_sqlite_bytes = None
+        if self.sqlite_output == "combined":
+            start = time.perf_counter()
+            self.combined_sqlite_bytes = self._build_combined_sqlite(
+                [folder_key for folder_key, success in results.items() if success]
+            )
+            run_timer.add(
+                "sqliteCombine",
+                time.perf_counter() - start,
+                byte_count=self.combined_sqlite_bytes or 0,
+            )
+
+        if self.parse_cache:
+            self._prune_parse_cache()
+
+        run_timer.add("total", time.perf_counter() - run_start)
+        self.run_performance = run_timer.to_dict()
+        peaks = [_peak_rss_bytes(), _peak_rss_bytes(children=True)]
+        self.peak_rss_bytes = max((peak for peak in peaks if peak), default=None)
+        # Timings differ from run to run, so deterministic runs keep none
+        if not self.deterministic:
+            self._record_throughput(source_folders, results)
+        return results
+
+    def watch(
+        self,
+        interval: float = 2.0,
+        debounce: float = 5.0,
+        max_cycles: Optional[int] = None,
+    ) -> None:
         """
-        Load the IES4 JSON schema for validation.
+        Consolidate every folder, then keep polling the data tree and
+        re-consolidate only the folders whose source files change.
+
+        Every interval seconds the tree is snapshotted with
+        scan_source_folders (paths, sizes and mtimes from os.scandir; no
+        file is read), so no OS-specific notification API is needed. Folders
+        touched by a change are consolidated once the tree has been quiet
+        for debounce seconds, so a burst of writes triggers a single run. A
+        change to the schema file re-consolidates every folder.
+
+        The consolidator stays alive between runs, so the compiled schema
+        validator and the parse cache stay warm. Both are bounded: the
+        parse cache by its LRU size, the validators by dropping those of a
+        replaced schema.
+
+        Args:
+            interval: Seconds between polls
+            debounce: Seconds without further changes before consolidating
+            max_cycles: Stop after this many re-consolidations (None = run
+                until interrupted)
+        """
+        snapshot = self._watch_snapshot()
+        consolidated = snapshot
+        self.generate_summary_report(self.consolidate_by_country())
+        logger.info(
+            "Watching %s every %.1fs (debounce %.1fs)",
+            self.data_path,
+            interval,
+            debounce,
+        )
+
+        pending: set = set()
+        last_change = time.monotonic()
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            time.sleep(interval)
+            current = self._watch_snapshot()
+            if current != snapshot:
+                pending |= self._changed_folders(snapshot, current)
+                snapshot = current
+                last_change = time.monotonic()
+                continue
+            if not pending or time.monotonic() - last_change < debounce:
+                continue
+
+            if current[0] != consolidated[0]:
+                logger.info("Schema changed, reloading %s", self.schema_path)
+                _SCHEMA_VALIDATORS.clear()
+                self._schema_loaded = False
+                self._schema_key = None
+            logger.info(
+                "Re-consolidating %d changed folders: %s",
+                len(pending),
+                ", ".join(sorted(pending)),
+            )
+            try:
+                self.generate_summary_report(
+                    self.consolidate_by_country(folders=pending)
+                )
+            except Exception as e:
+                logger.error("Watch run failed: %s", e)
+            consolidated = current
+            pending = set()
+            cycles += 1
+
+    def _watch_snapshot(
+        self,
+    ) -> Tuple[Optional[Tuple[int, int]], Dict[str, Tuple[SourceFile, ...]]]:
+        """
+        Snapshot the schema file and the source files of every folder.
 
         Returns:
-            Dict containing the schema or None if loading fails
+            Tuple of the schema file's (size, mtime_ns), None if missing,
+            and each folder key's source files
         """
         try:
-            if self.schema_path.exists():
-                with open(self.schema_path, "r", encoding="utf-8") as f:
-                    schema = json.load(f)
-                logger.info(f"Loaded IES4 schema from {self.schema_path}")
-                return schema
-            else:
-                logger.warning(f"Schema file not found at {self.schema_path}")
-                return None
-        except Exception as e:
-            logger.error(f"Error loading schema: {e}")
-            return None
+            stat = os.stat(self.schema_path)
+            schema_state = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            schema_state = None
+        return schema_state, {
+            self._folder_key(folder): tuple(files)
+            for folder, files in self.scan_source_folders().items()
+        }
 
-    def _validate_json_structure(self, data: Dict[str, Any]) -> bool:
+    def _changed_folders(
+        self,
+        previous: Tuple[Optional[Tuple[int, int]], Dict[str, Tuple[SourceFile, ...]]],
+        current: Tuple[Optional[Tuple[int, int]], Dict[str, Tuple[SourceFile, ...]]],
+    ) -> set:
         """
-        Enhanced validation of JSON data against IES4 r4.3.0 schema with
-        comprehensive compliance checking.
+        Folders to re-consolidate between two watch snapshots.
 
         Args:
-            data (Dict): JSON data to validate
+            previous: Earlier snapshot from _watch_snapshot
+            current: Later snapshot from _watch_snapshot
 
         Returns:
-            bool: True if valid, False otherwise
+            Keys of the current folders whose source files were added,
+            changed or removed; every current folder if the schema changed
         """
-        validation_errors = []
-
-        # Basic schema validation if available
-        if self.schema:
-            try:
-                jsonschema.validate(data, self.schema)
-            except jsonschema.ValidationError as e:
-                validation_errors.append(f"Schema validation: {e.message}")
-            except Exception as e:
-                validation_errors.append(f"Schema error: {e}")
-        else:
-            logger.warning("No schema available for validation")
+        previous_schema, previous_folders = previous
+        current_schema, current_folders = current
+        if previous_schema != current_schema:
+            return set(current_folders)
 
-        # IES4 r4.3.0 specific validation
-        ies4_errors = self._validate_ies4_compliance(data)
-        validation_errors.extend(ies4_errors)
+        for folder_key in previous_folders.keys() - current_folders.keys():
+            logger.info(
+                "Folder %s no longer has source files; keeping its outputs",
+                folder_key,
+            )
+        return {
+            folder_key
+            for folder_key, files in current_folders.items()
+            if previous_folders.get(folder_key) != files
+        }
 
-        if validation_errors:
-            for error in validation_errors:
-                logger.error(f"Validation error: {error}")
-            return False
+    def _deterministic_timestamp(self, mtime_ns: int) -> str:
+        """
+        Timestamp written by a deterministic run for a source mtime.
 
-        return True
+        Args:
+            mtime_ns: Source file mtime in nanoseconds
 
-    def _validate_ies4_compliance(self, data: Dict[str, Any]) -> List[str]:
+        Returns:
+            ISO 8601 UTC time of run_epoch when pinned, otherwise of mtime_ns
         """
-        Validate IES4 r4.3.0 specific compliance requirements.
+        seconds = self.run_epoch if self.run_epoch is not None else mtime_ns / 1e9
+        return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
 
-        Args:
-            data: JSON data to validate
+    def _record_timestamp(self) -> str:
+        """
+        Timestamp of run-level records (manifest, reports, plans).
 
         Returns:
-            List of validation error messages
+            The current time, or in a deterministic run the timestamp of the
+            newest source file scanned by the run
         """
-        errors = []
+        if self.deterministic:
+            return self._deterministic_timestamp(self._newest_source_mtime_ns)
+        return datetime.now().isoformat()
 
-        # Check for required IES4 metadata
-        if "ies4Version" not in data:
-            data["ies4Version"] = self.ies4_version
+    def _folder_key(self, country_folder: Path) -> str:
+        """
+        Create the unique output identifier for a (possibly nested) folder.
 
-        if "specificationDate" not in data:
-            data["specificationDate"] = self.ies4_spec_date
+        Args:
+            country_folder: Folder being consolidated
 
-        # Validate entity structures
-        for entity_type in self.entity_types:
-            if entity_type in data and isinstance(data[entity_type], list):
-                for i, entity in enumerate(data[entity_type]):
-                    if not isinstance(entity, dict):
-                        errors.append(f"{entity_type}[{i}]: Entity must be an object")
-                        continue
+        Returns:
+            Folder key such as "iran" or "uk_army"
+        """
+        return (
+            str(country_folder.relative_to(self.data_path))
+            .replace("/", "_")
+            .replace("\\", "_")
+        )
 
-                    # Check required fields
-                    for field in self.required_ies4_fields:
-                        if field not in entity:
-                            errors.append(
-                                f"{entity_type}[{i}]: Missing required field '{field}'"
-                            )
-
-                    # Validate ID format
-                    if "id" in entity:
-                        if (
-                            not isinstance(entity["id"], str)
-                            or not entity["id"].strip()
-                        ):
-                            errors.append(f"{entity_type}[{i}]: Invalid ID format")
-
-                    # Validate timestamp format
-                    if "timestamp" in entity:
-                        if not self._validate_timestamp(entity["timestamp"]):
-                            errors.append(
-                                f"{entity_type}[{i}]: Invalid timestamp format"
-                            )
+    def _output_file(self, folder_key: str) -> Path:
+        """
+        Path of the consolidated file for a folder in the selected format.
 
-        return errors
+        Args:
+            folder_key: Folder key from _folder_key
 
-    def _validate_timestamp(self, timestamp: Any) -> bool:
+        Returns:
+            Output path, e.g. ies4_uk_army_consolidated.json.gz for gzip
         """
-        Validate timestamp format according to IES4 r4.3.0 specification.
+        suffix = OUTPUT_FORMATS[self.output_format][0]
+        return self.output_path / f"ies4_{folder_key}_consolidated{suffix}"
+
+    def _consolidate_folder(
+        self, country_folder: Path, source_files: Optional[List[SourceFile]] = None
+    ) -> Tuple[str, bool]:
+        """
+        Consolidate the JSON files of a single country/region folder.
 
         Args:
-            timestamp: Timestamp value to validate
+            country_folder: Folder to consolidate
+            source_files: The folder's JSON files from scan_source_folders;
+                scanned here when not given
 
         Returns:
-            bool: True if valid timestamp format
+            Tuple of folder key and consolidation success status
         """
-        if not isinstance(timestamp, str):
-            return False
+        # Create unique identifier for nested folders
+        folder_key = self._folder_key(country_folder)
+        logger.info("Processing folder: %s (%s)", folder_key, country_folder)
+        self._phase_timer = _PhaseTimer()
+        self._parse_cache_stats = self._new_parse_cache_stats()
+        self._unchanged_outputs = []
+
+        # Find all JSON files in the folder
+        if source_files is None:
+            source_files, _ = self._scan_folder(country_folder)
+        json_files = source_files
+
+        if len(json_files) == 0:
+            logger.warning("No JSON files found in %s", country_folder)
+            return folder_key, False
+
+        output_file = self._output_file(folder_key)
+        consolidated_data: Dict[str, Any] = {}
 
         try:
-            # Try parsing ISO 8601 format
-            datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
-            return True
-        except (ValueError, AttributeError):
-            return False
+            if len(json_files) == 1:
+                logger.info(
+                    "Single JSON file in %s, enhancing with metadata", country_folder
+                )
+                # Process single file with enhanced metadata
+                source_file = json_files[0].path
+                streamed = self._should_stream(json_files[0].size)
+                start = time.perf_counter()
+                validation_start = self._phase_timer.seconds("validation")
+                if streamed:
+                    # Entities are validated while they are streamed
+                    entity_errors = []
+                    try:
+                        data = self._stream_single_file(source_file, entity_errors)
+                    except (OSError, ValueError) as e:
+                        logger.error("Error streaming %s: %s", source_file, e)
+                        return folder_key, False
+                else:
+                    data = self._load_json_file(source_file)
+                    error_memo, self._entity_error_memo = (
+                        self._entity_error_memo,
+                        None,
+                    )
+                    if not data:
+                        return folder_key, False
+                self._phase_timer.add(
+                    "load",
+                    time.perf_counter()
+                    - start
+                    - (self._phase_timer.seconds("validation") - validation_start),
+                    self._count_entities(data),
+                    json_files[0].size,
+                )
 
-    def _load_json_file(self, file_path: Path) -> Optional[Dict[str, Any]]:
+                # Validate source entities once, then add consolidation
+                # metadata even for single files
+                if not streamed:
+                    entity_errors = self._validate_document_entities(
+                        data, str(source_file.relative_to(self.data_path)), error_memo
+                    )
+                start = time.perf_counter()
+                consolidated_data = self._enhance_single_file_metadata(
+                    data, json_files[0]
+                )
+                self._phase_timer.add(
+                    "merge", time.perf_counter() - start, self._count_entities(data)
+                )
+            else:
+                logger.info("Merging %d JSON files for %s", len(json_files), folder_key)
+
+                # Merge multiple files with enhanced processing
+                entity_errors = []
+                consolidated_data = self._merge_json_files(json_files, entity_errors)
+
+            if self.performance_metadata:
+                # Phases up to here; the write is only known once complete
+                consolidated_data["consolidationMetadata"][
+                    "performance"
+                ] = self._phase_timer.to_dict()
+
+            # Save consolidated file, or only validate it when the delta is
+            # published instead
+            bytes_written = {}
+            if self.delta_output == "only":
+                if not self._validate_consolidated(
+                    consolidated_data, self._delta_path(folder_key), entity_errors
+                ):
+                    return folder_key, False
+            else:
+                if not self._save_consolidated_file(
+                    consolidated_data, output_file, entity_errors
+                ):
+                    return folder_key, False
+                bytes_written[self.output_format] = output_file.stat().st_size
+
+            delta_totals = None
+            if self.delta_output:
+                start = time.perf_counter()
+                bytes_written["delta"], delta_totals = self._write_delta(
+                    folder_key, consolidated_data
+                )
+                self._phase_timer.add(
+                    "delta",
+                    time.perf_counter() - start,
+                    self._count_entities(consolidated_data),
+                    bytes_written["delta"],
+                )
+            if self.cross_folder_index:
+                self.folder_indexes[folder_key] = self._save_entity_index(
+                    folder_key, consolidated_data
+                )
+            if self.ndjson_export:
+                start = time.perf_counter()
+                bytes_written["ndjson"] = self._export_ndjson(
+                    folder_key, consolidated_data
+                )
+                self._phase_timer.add(
+                    "ndjsonExport",
+                    time.perf_counter() - start,
+                    self._count_entities(consolidated_data),
+                    bytes_written["ndjson"],
+                )
+            if self.sqlite_output:
+                start = time.perf_counter()
+                bytes_written["sqlite"] = self._export_sqlite(
+                    folder_key,
+                    consolidated_data,
+                    None if self.delta_output == "only" else output_file.name,
+                )
+                self._phase_timer.add(
+                    "sqliteExport",
+                    time.perf_counter() - start,
+                    self._count_entities(consolidated_data),
+                    bytes_written["sqlite"],
+                )
+
+            self.folder_details[folder_key] = {
+                "outputFile": self._primary_output(folder_key).name,
+                "bytesWritten": bytes_written,
+                "performance": self._phase_timer.to_dict(),
+                "peakRssBytes": _peak_rss_bytes(),
+            }
+            if delta_totals is not None:
+                self.folder_details[folder_key]["delta"] = delta_totals
+            if self.deterministic:
+                self.folder_details[folder_key]["unchangedOutputs"] = list(
+                    self._unchanged_outputs
+                )
+            if self.parse_cache:
+                self.folder_details[folder_key]["parseCache"] = dict(
+                    self._parse_cache_stats
+                )
+            spill_store = self._spill_store(consolidated_data)
+            if spill_store is not None:
+                self.folder_details[folder_key]["spilledEntities"] = spill_store.spilled
+            return folder_key, True
+
+        except Exception as e:
+            logger.error("Error processing %s: %s", folder_key, e)
+            return folder_key, False
+
+        finally:
+            spill_store = self._spill_store(consolidated_data)
+            if spill_store is not None:
+                spill_store.close()
+            self._save_parse_cache()
+
+    def _spill_store(self, data: Dict[str, Any]) -> Optional[_EntitySpillStore]:
         """
-        Load and parse a JSON file.
+        Return the spill store backing a merged document's entity arrays.
 
         Args:
-            file_path (Path): Path to the JSON file
+            data: Consolidated document
 
         Returns:
-            Dict containing the parsed JSON or None if loading fails
+            The spill store, or None for in-memory documents
         """
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            logger.debug(f"Loaded JSON file: {file_path}")
-            return data
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error in {file_path}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error loading {file_path}: {e}")
-            return None
+        for entity_type in self.entity_types:
+            entities = data.get(entity_type)
+            if isinstance(entities, _SpillableEntityList):
+                return entities.store
+        return None
 
-    def _merge_json_files(self, json_files: List[Path]) -> Dict[str, Any]:
+    def _run_parallel(
+        self,
+        country_folders: List[Path],
+        source_folders: Dict[Path, List[SourceFile]],
+    ) -> Dict[Path, Any]:
         """
-        Enhanced merge of multiple JSON files into a single IES4 r4.3.0 compliant
-        structure with comprehensive metadata preservation and audit trail.
+        Consolidate folders over a process pool.
+
+        A worker process that dies only fails its own folder: folders caught
+        up in a broken pool are retried one at a time in isolated pools.
 
         Args:
-            json_files (List[Path]): List of JSON file paths to merge
+            country_folders: Folders to consolidate
+            source_folders: Discovered JSON files per folder
 
         Returns:
-            Dict containing the merged data with enhanced metadata
+            Dict mapping folders to their worker outcome (see _run_folder_pool)
         """
-        timestamp = datetime.now().isoformat()
+        outcomes = self._run_folder_pool(country_folders, source_folders, self.workers)
 
-        merged_data = {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "title": "Consolidated IES4 Military Database",
-            "description": f"Consolidated database created on {timestamp}",
-            "ies4Version": self.ies4_version,
-            "specificationDate": self.ies4_spec_date,
-            "consolidationMetadata": {
-                "timestamp": timestamp,
-                "consolidatedFiles": [],
-                "sourceFileCount": len(json_files),
-                "consolidationTool": "IES4Consolidator",
-                "toolVersion": "2.0",
-            },
-        }
+        broken = [folder for folder in country_folders if folder not in outcomes]
+        for country_folder in broken:
+            outcomes.update(self._run_folder_pool([country_folder], source_folders, 1))
 
-        # Initialize all entity type arrays
-        for entity_type in self.entity_types:
-            merged_data[entity_type] = []
+        return outcomes
 
-        # Track unique entities by ID with enhanced metadata
-        entity_tracker = defaultdict(set)
-        entity_versions = defaultdict(dict)  # Track entity versions
-        source_tracking = defaultdict(list)  # Track source files per entity
+    def _replay_outcome(self, country_folder: Path, outcome: Any) -> bool:
+        """
+        Replay a worker's captured log records and return its result.
 
-        for file_path in json_files:
-            logger.info(f"Processing file: {file_path}")
-            data = self._load_json_file(file_path)
+        Records are replayed in discovery order by the caller so the log
+        reads exactly as for a serial run.
 
-            if not data:
-                continue
+        Args:
+            country_folder: Folder the worker consolidated
+            outcome: Worker outcome tuple or the exception it raised
 
-            # Add to source file tracking
-            relative_path = str(file_path.relative_to(self.data_path))
-            merged_data["consolidationMetadata"]["consolidatedFiles"].append(
-                {
-                    "path": relative_path,
-                    "size": file_path.stat().st_size,
-                    "processedAt": timestamp,
-                }
-            )
+        Returns:
+            bool: Consolidation success status for the folder
+        """
+        if not isinstance(outcome, tuple):
+            folder_key = self._folder_key(country_folder)
+            logger.info("Processing folder: %s (%s)", folder_key, country_folder)
+            logger.error("Worker failed while processing %s: %s", folder_key, outcome)
+            return False
 
-            # Preserve metadata from source files
-            self._preserve_source_metadata(merged_data, data, relative_path)
+        folder_key, success, records, details, entity_index = outcome
+        for record in records:
+            logger.handle(record)
+        if details:
+            self.folder_details[folder_key] = details
+        if entity_index is not None:
+            self.folder_indexes[folder_key] = entity_index
+        return success
+
+    def _run_folder_pool(
+        self,
+        country_folders: List[Path],
+        source_folders: Dict[Path, List[SourceFile]],
+        workers: int,
+    ) -> Dict[Path, Any]:
+        """
+        Submit folders to a process pool and collect their outcomes.
+
+        Args:
+            country_folders: Folders to consolidate
+            source_folders: Discovered JSON files per folder
+            workers: Maximum number of worker processes
+
+        Returns:
+            Dict mapping folders to a (folder_key, success, log records,
+            details, entity index) tuple or the exception raised by the
+            worker. Folders lost to a broken pool are left out so the caller
+            can retry them.
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from concurrent.futures.process import BrokenProcessPool
 
-            # Merge each entity type with enhanced tracking
-            for entity_type in self.entity_types:
-                if entity_type in data and isinstance(data[entity_type], list):
-                    for entity in data[entity_type]:
-                        if isinstance(entity, dict) and "id" in entity:
-                            entity_id = entity["id"]
-
-                            # Enhanced duplicate handling with versioning
-                            if entity_id not in entity_tracker[entity_type]:
-                                # Add source tracking to entity
-                                entity_with_metadata = entity.copy()
-                                entity_with_metadata["_sourceFiles"] = [relative_path]
-                                entity_with_metadata["_consolidatedAt"] = timestamp
-
-                                # Ensure required IES4 fields
-                                if "timestamp" not in entity_with_metadata:
-                                    entity_with_metadata["timestamp"] = timestamp
-                                if "version" not in entity_with_metadata:
-                                    entity_with_metadata["version"] = "1.0"
-
-                                merged_data[entity_type].append(entity_with_metadata)
-                                entity_tracker[entity_type].add(entity_id)
-                                entity_versions[entity_type][entity_id] = entity.get(
-                                    "version", "1.0"
-                                )
-                                source_tracking[entity_type].append(relative_path)
-
-                                logger.debug(f"Added {entity_type}: {entity_id}")
-                            else:
-                                # Handle version conflicts
-                                existing_version = entity_versions[entity_type][
-                                    entity_id
-                                ]
-                                new_version = entity.get("version", "1.0")
-
-                                if (
-                                    self._compare_versions(
-                                        new_version, existing_version
-                                    )
-                                    > 0
-                                ):
-                                    # Update with newer version
-                                    for i, existing_entity in enumerate(
-                                        merged_data[entity_type]
-                                    ):
-                                        if existing_entity["id"] == entity_id:
-                                            entity_with_metadata = entity.copy()
-                                            entity_with_metadata["_sourceFiles"] = [
-                                                relative_path
-                                            ]
-                                            entity_with_metadata["_consolidatedAt"] = (
-                                                timestamp
-                                            )
-                                            entity_with_metadata["_replacedVersion"] = (
-                                                existing_version
-                                            )
-
-                                            merged_data[entity_type][
-                                                i
-                                            ] = entity_with_metadata
-                                            entity_versions[entity_type][
-                                                entity_id
-                                            ] = new_version
-                                            logger.info(
-                                                f"Updated {entity_type}: {entity_id} "
-                                                f"from v{existing_version} to v{new_version}"
-                                            )
-                                            break
-                                else:
-                                    logger.debug(
-                                        f"Skipped {entity_type}: {entity_id} "
-                                        f"(older/same version: {new_version} <= {existing_version})"
-                                    )
+        outcomes: Dict[Path, Any] = {}
+        max_workers = min(workers, len(country_folders))
 
-        # Add consolidation summary
-        merged_data["consolidationMetadata"]["entityCounts"] = {}
-        for entity_type in self.entity_types:
-            count = len(merged_data[entity_type])
-            if count > 0:
-                merged_data["consolidationMetadata"]["entityCounts"][
-                    entity_type
-                ] = count
-                logger.info(f"Consolidated {count} {entity_type}")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    _consolidate_folder_worker,
+                    self,
+                    folder,
+                    source_folders[folder],
+                    logger.getEffectiveLevel(),
+                ): folder
+                for folder in country_folders
+            }
+            for future in as_completed(futures):
+                folder = futures[future]
+                try:
+                    outcomes[folder] = future.result()
+                except BrokenProcessPool as e:
+                    if len(country_folders) == 1:
+                        outcomes[folder] = e
+                except Exception as e:
+                    outcomes[folder] = e
 
-        return merged_data
+        return outcomes
 
-    def _preserve_source_metadata(
-        self, merged_data: Dict[str, Any], source_data: Dict[str, Any], source_path: str
-    ) -> None:
+    def _config_fingerprint(self) -> str:
         """
-        Preserve important metadata from source files.
+        Fingerprint the configuration that affects consolidated output.
 
-        Args:
-            merged_data: Target merged data structure
-            source_data: Source file data
-            source_path: Relative path of source file
+        Returns:
+            Hex digest covering tool/IES4 versions, entity types, required
+            fields and the schema file contents
         """
-        # Copy metadata from first file if not already set
-        if (
-            "title" not in merged_data
-            or merged_data["title"] == "Consolidated IES4 Military Database"
-        ):
-            if "title" in source_data:
-                merged_data["title"] = (
-                    f"Consolidated {source_data.get('title', 'IES4 Database')}"
-                )
-            if "description" in source_data:
-                merged_data["description"] = source_data["description"]
+        schema_hash = None
+        if self.schema_path.exists():
+            schema_hash = self._hash_file(self.schema_path)
 
-        # Preserve source IES4 metadata
-        if (
-            "ies4Version" in source_data
-            and source_data["ies4Version"] != self.ies4_version
-        ):
-            if "sourceVersions" not in merged_data["consolidationMetadata"]:
-                merged_data["consolidationMetadata"]["sourceVersions"] = {}
-            merged_data["consolidationMetadata"]["sourceVersions"][source_path] = (
-                source_data["ies4Version"]
-            )
+        config = {
+            "toolVersion": self.tool_version,
+            "ies4Version": self.ies4_version,
+            "specificationDate": self.ies4_spec_date,
+            "entityTypes": self.entity_types,
+            "requiredFields": self.required_ies4_fields,
+            "schemaHash": schema_hash,
+            "outputFormat": self.output_format,
+            "ndjsonExport": self.ndjson_export,
+            "performanceMetadata": self.performance_metadata,
+            "sqliteOutput": self.sqlite_output,
+            "deltaOutput": self.delta_output,
+            "deterministic": self.deterministic,
+            "runEpoch": self.run_epoch,
+        }
+        return hashlib.sha256(
+            json.dumps(config, sort_keys=True).encode("utf-8")
+        ).hexdigest()
 
-    def _compare_versions(self, version1: str, version2: str) -> int:
+    def _hash_file(self, file_path: Path) -> str:
         """
-        Compare two version strings.
+        Compute the SHA-256 content hash of a file.
 
         Args:
-            version1: First version string
-            version2: Second version string
+            file_path: File to hash
 
         Returns:
-            int: 1 if version1 > version2, -1 if version1 < version2, 0 if equal
+            Hex digest of the file contents
         """
-        try:
-            v1_parts = [int(x) for x in version1.split(".")]
-            v2_parts = [int(x) for x in version2.split(".")]
-
-            # Pad with zeros to make equal length
-            max_len = max(len(v1_parts), len(v2_parts))
-            v1_parts.extend([0] * (max_len - len(v1_parts)))
-            v2_parts.extend([0] * (max_len - len(v2_parts)))
-
-            for v1, v2 in zip(v1_parts, v2_parts):
-                if v1 > v2:
-                    return 1
-                elif v1 < v2:
-                    return -1
-            return 0
-        except (ValueError, AttributeError):
-            # Fallback to string comparison
-            return 1 if version1 > version2 else (-1 if version1 < version2 else 0)
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
 
-    def _save_consolidated_file(self, data: Dict[str, Any], output_file: Path) -> bool:
+    def _snapshot_sources(
+        self, json_files: List[SourceFile], previous_files: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
         """
-        Save consolidated data to output file.
+        Record path, size, mtime and content hash of a folder's source files.
+
+        Hashes from the previous manifest are reused when size and mtime are
+        unchanged, so unchanged files are not re-read.
 
         Args:
-            data (Dict): Data to save
-            output_file (Path): Output file path
+            json_files: Source files of the folder, as discovered
+            previous_files: File records from the previous manifest entry
 
         Returns:
-            bool: True if successful, False otherwise
+            List of file records
         """
-        try:
-            # Validate before saving
-            if not self._validate_json_structure(data):
-                logger.error(f"Data validation failed for {output_file}")
-                return False
+        previous = {record["path"]: record for record in previous_files}
+        snapshot = []
 
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+        for file_path, size, mtime_ns in json_files:
+            relative_path = file_path.relative_to(self.data_path).as_posix()
+            record = previous.get(relative_path)
 
-            logger.info(f"Saved consolidated file: {output_file}")
-            return True
+            if record is None or record["size"] != size or record["mtime"] != mtime_ns:
+                record = {
+                    "path": relative_path,
+                    "size": size,
+                    "mtime": mtime_ns,
+                    "sha256": self._hash_file(file_path),
+                }
+            snapshot.append(record)
 
-        except Exception as e:
-            logger.error(f"Error saving {output_file}: {e}")
-            return False
+        return snapshot
 
-    def _discover_country_folders(self) -> List[Path]:
+    def _is_folder_unchanged(
+        self,
+        folder_key: str,
+        previous: Dict[str, Any],
+        snapshot: List[Dict[str, Any]],
+    ) -> bool:
         """
-        Discover country/region folders in the data directory with enhanced
-        support for nested subfolder structures (e.g., data/uk/army/, data/uk/navy/).
+        Check whether a folder can keep its existing consolidated file.
+
+        Args:
+            folder_key: Folder key from _folder_key
+            previous: Manifest entry from the previous run
+            snapshot: Current file records of the folder
 
         Returns:
-            List of Path objects for country folders
+            bool: True if sources are unchanged and the outputs still exist
         """
-        country_folders = []
-
-        if not self.data_path.exists():
-            logger.error(f"Data path does not exist: {self.data_path}")
-            return country_folders
+        if not (self.output_path / previous.get("output", "")).is_file():
+            return False
+        if (
+            self.ndjson_export
+            and not (
+                self._ndjson_path(folder_key) / self.NDJSON_METADATA_FILE
+            ).is_file()
+        ):
+            return False
+        if self.sqlite_output and not self._sqlite_path(folder_key).is_file():
+            return False
+        if (
+            self.cross_folder_index
+            and not self._entity_index_path(folder_key).is_file()
+        ):
+            return False
+        if self.delta_output and not self._fingerprints_path(folder_key).is_file():
+            return False
 
-        # First pass: direct country folders with JSON files
-        for item in self.data_path.iterdir():
-            if item.is_dir():
-                # Check if folder contains JSON files directly
-                json_files = list(item.glob("*.json"))
-                if json_files:
-                    country_folders.append(item)
-                    logger.debug(
-                        f"Found country folder: {item.name} "
-                        f"({len(json_files)} JSON files)"
-                    )
-                else:
-                    # Check for nested subfolders with JSON files
-                    nested_folders = self._discover_nested_folders(item)
-                    if nested_folders:
-                        country_folders.extend(nested_folders)
-                        logger.debug(
-                            f"Found {len(nested_folders)} nested folders in {item.name}"
-                        )
+        def content(records):
+            return [(r["path"], r["size"], r["sha256"]) for r in records]
 
-        return country_folders
+        return content(previous["files"]) == content(snapshot)
 
-    def _discover_nested_folders(self, parent_folder: Path) -> List[Path]:
+    def _load_throughput_history(self) -> List[Dict[str, Any]]:
         """
-        Recursively discover nested folders containing JSON files.
-
-        Args:
-            parent_folder: Parent directory to scan
+        Load the throughput figures recorded by previous runs.
 
         Returns:
-            List of nested folders containing JSON files
+            History entries, oldest first; empty if missing or unreadable
         """
-        nested_folders = []
+        if not self.throughput_history_path.exists():
+            return []
 
         try:
-            for item in parent_folder.rglob("*.json"):
-                folder = item.parent
-                if folder != parent_folder and folder not in nested_folders:
-                    json_count = len(list(folder.glob("*.json")))
-                    if json_count > 0:
-                        nested_folders.append(folder)
-                        logger.debug(
-                            f"Found nested folder: {folder.relative_to(self.data_path)} "
-                            f"({json_count} JSON files)"
-                        )
+            with open(self.throughput_history_path, "r", encoding="utf-8") as f:
+                return json.load(f)["runs"]
         except Exception as e:
-            logger.error(f"Error scanning nested folders in {parent_folder}: {e}")
-
-        return nested_folders
+            logger.warning(
+                "Ignoring unreadable throughput history %s: %s",
+                self.throughput_history_path,
+                e,
+            )
+            return []
 
-    def consolidate_by_country(self) -> Dict[str, bool]:
+    def _record_throughput(
+        self, source_folders: Dict[Path, List[SourceFile]], results: Dict[str, bool]
+    ) -> None:
         """
-        Enhanced method to consolidate JSON files by country/region with support
-        for nested folder structures and improved error handling.
+        Append the throughput of this run's rebuilt folders to the history.
 
-        Returns:
-            Dict mapping folder paths to consolidation success status
-        """
-        logger.info("Starting IES4 r4.3.0 JSON file consolidation process")
+        Throughput is measured against the time spent consolidating each
+        folder rather than the wall time, so it is comparable across worker
+        counts; plan_consolidation spreads it over the workers again.
 
-        country_folders = self._discover_country_folders()
-        results = {}
+        Args:
+            source_folders: Source files per folder, from scan_source_folders
+            results: Consolidation results of this run
+        """
+        source_bytes = entities = 0
+        seconds = 0.0
+        for country_folder, json_files in source_folders.items():
+            folder_key = self._folder_key(country_folder)
+            details = self.folder_details.get(folder_key)
+            if not results.get(folder_key) or details is None:
+                continue
+            source_bytes += sum(source.size for source in json_files)
+            entities += details["performance"].get("load", {}).get("entities", 0)
+            seconds += sum(
+                phase["seconds"] for phase in details["performance"].values()
+            )
+        if not source_bytes or seconds <= 0:
+            return
 
-        if not country_folders:
-            logger.warning("No country folders with JSON files found")
-            return results
+        runs = self._load_throughput_history()
+        runs.append(
+            {
+                "recordedAt": datetime.now().isoformat(),
+                "toolVersion": self.tool_version,
+                "outputFormat": self.output_format,
+                "jsonBackend": self.codec.name,
+                "workers": self.workers,
+                "sourceBytes": source_bytes,
+                "entities": entities,
+                "folderSeconds": round(seconds, 6),
+                "bytesPerSecond": round(source_bytes / seconds, 1),
+                "peakRssBytes": self.peak_rss_bytes,
+            }
+        )
+        runs = runs[-self.THROUGHPUT_HISTORY_LIMIT :]
 
-        for country_folder in country_folders:
-            # Create unique identifier for nested folders
-            folder_key = (
-                str(country_folder.relative_to(self.data_path))
-                .replace("/", "_")
-                .replace("\\", "_")
+        temp_path = self.throughput_history_path.with_name(
+            self.throughput_history_path.name + ".tmp"
+        )
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"runs": runs}, f, indent=2)
+            os.replace(temp_path, self.throughput_history_path)
+        except Exception as e:
+            logger.error(
+                "Error saving throughput history %s: %s",
+                self.throughput_history_path,
+                e,
             )
-            logger.info(f"Processing folder: {folder_key} ({country_folder})")
 
-            # Find all JSON files in the folder
-            json_files = list(country_folder.glob("*.json"))
+    def _load_manifest(self) -> Dict[str, Any]:
+        """
+        Load the source manifest written by the previous run.
 
-            if len(json_files) == 0:
-                logger.warning(f"No JSON files found in {country_folder}")
-                results[folder_key] = False
-                continue
+        Returns:
+            Manifest dict, empty if missing or unreadable
+        """
+        if not self.manifest_path.exists():
+            return {}
 
-            try:
-                if len(json_files) == 1:
-                    logger.info(
-                        f"Single JSON file in {country_folder}, enhancing with metadata"
-                    )
-                    # Process single file with enhanced metadata
-                    source_file = json_files[0]
-                    data = self._load_json_file(source_file)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning("Ignoring unreadable manifest %s: %s", self.manifest_path, e)
+            return {}
 
-                    if data:
-                        # Add consolidation metadata even for single files
-                        enhanced_data = self._enhance_single_file_metadata(
-                            data, source_file
-                        )
-                        output_file = (
-                            self.output_path / f"ies4_{folder_key}_consolidated.json"
-                        )
-                        results[folder_key] = self._save_consolidated_file(
-                            enhanced_data, output_file
-                        )
-                    else:
-                        results[folder_key] = False
-                else:
-                    logger.info(
-                        f"Merging {len(json_files)} JSON files for {folder_key}"
-                    )
+    def _update_manifest(
+        self,
+        manifest: Dict[str, Any],
+        config_hash: str,
+        snapshots: Dict[str, List[Dict[str, Any]]],
+        results: Dict[str, bool],
+        scanned: Iterable[str],
+    ) -> None:
+        """
+        Update and save the source manifest after a run.
 
-                    # Merge multiple files with enhanced processing
-                    merged_data = self._merge_json_files(json_files)
+        Incremental runs record the sources of every successful folder. Full
+        runs cannot vouch for the recorded hashes, so they drop the entries of
+        the folders they rebuilt, forcing the next incremental run to rebuild
+        them. Entries of folders no longer found in the data directory are
+        dropped by every run.
 
-                    # Save consolidated file
-                    output_file = (
-                        self.output_path / f"ies4_{folder_key}_consolidated.json"
-                    )
-                    results[folder_key] = self._save_consolidated_file(
-                        merged_data, output_file
-                    )
+        Args:
+            manifest: Manifest loaded at the start of the run
+            config_hash: Configuration fingerprint of this run
+            snapshots: Current file records per folder (incremental runs only)
+            results: Consolidation results of this run
+            scanned: Keys of every folder found by this run's scan
+        """
+        if not self.incremental and not manifest:
+            return
 
-            except Exception as e:
-                logger.error(f"Error processing {folder_key}: {e}")
-                results[folder_key] = False
+        scanned = set(scanned)
+        folders = {
+            folder_key: entry
+            for folder_key, entry in manifest.get("folders", {}).items()
+            if folder_key in scanned
+        }
+        if self.incremental and manifest.get("configHash") != config_hash:
+            folders = {}
 
-        return results
+        for folder_key, success in results.items():
+            if self.incremental and success:
+                folders[folder_key] = {
+                    "output": self._primary_output(folder_key)
+                    .relative_to(self.output_path)
+                    .as_posix(),
+                    "files": snapshots[folder_key],
+                }
+            else:
+                folders.pop(folder_key, None)
+
+        manifest = {
+            "toolVersion": self.tool_version,
+            "ies4Version": self.ies4_version,
+            "configHash": (
+                config_hash if self.incremental else manifest.get("configHash")
+            ),
+            "updatedAt": self._record_timestamp(),
+            "folders": folders,
+        }
+
+        temp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            if self.deterministic and _same_file_content(temp_path, self.manifest_path):
+                temp_path.unlink()
+            else:
+                os.replace(temp_path, self.manifest_path)
+        except Exception as e:
+            logger.error("Error saving manifest %s: %s", self.manifest_path, e)
 
     def _enhance_single_file_metadata(
-        self, data: Dict[str, Any], source_file: Path
+        self, data: Dict[str, Any], source_file: Union[Path, SourceFile]
     ) -> Dict[str, Any]:
         """
         Enhance single file with consolidation metadata for consistency.
@@ -614,8 +4535,12 @@ class IES4Consolidator:
         Returns:
             Enhanced data with consolidation metadata
         """
-        timestamp = datetime.now().isoformat()
-        relative_path = str(source_file.relative_to(self.data_path))
+        source_path, source_size, source_mtime = _as_source_file(source_file)
+        if self.deterministic:
+            timestamp = self._deterministic_timestamp(source_mtime)
+        else:
+            timestamp = datetime.now().isoformat()
+        relative_path = str(source_path.relative_to(self.data_path))
 
         enhanced_data = data.copy()
 
@@ -629,20 +4554,20 @@ class IES4Consolidator:
             "consolidatedFiles": [
                 {
                     "path": relative_path,
-                    "size": source_file.stat().st_size,
+                    "size": source_size,
                     "processedAt": timestamp,
                 }
             ],
             "sourceFileCount": 1,
             "consolidationTool": "IES4Consolidator",
-            "toolVersion": "2.0",
+            "toolVersion": self.tool_version,
             "entityCounts": {},
         }
 
         # Count entities
         for entity_type in self.entity_types:
             if entity_type in enhanced_data and isinstance(
-                enhanced_data[entity_type], list
+                enhanced_data[entity_type], _ENTITY_ARRAY_TYPES
             ):
                 count = len(enhanced_data[entity_type])
                 if count > 0:
@@ -652,6 +4577,227 @@ class IES4Consolidator:
 
         return enhanced_data
 
+    def _sample_source_file(
+        self, file_path: Path, sample_chars: int
+    ) -> Tuple[int, int, int]:
+        """
+        Decode the start of a source file to measure its entity density.
+
+        Entity arrays are streamed until about sample_chars characters have
+        been read, so sampling costs the same for any size of file. Only
+        entities the merge would take (objects with an id) are counted.
+
+        Args:
+            file_path: Path to the JSON file
+            sample_chars: Characters to decode before stopping
+
+        Returns:
+            Tuple of entities decoded, characters read and the estimated
+            in-memory size of the decoded entities in bytes
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the sampled part is not a valid JSON object
+        """
+        entities = memory = 0
+        with open(file_path, "r", encoding="utf-8") as f:
+            reader = _StreamingJSONReader(f, min(sample_chars, 1024 * 1024))
+            reader.expect("{")
+            stream_keys = set(self.entity_types)
+            while reader.peek() not in ("}", "") and reader.position < sample_chars:
+                key = reader.decode_value()
+                if not isinstance(key, str):
+                    raise reader.error("Expecting property name")
+                reader.expect(":")
+                if key in stream_keys and reader.peek() == "[":
+                    for entity in reader.iter_array():
+                        if isinstance(entity, dict) and "id" in entity:
+                            entities += 1
+                            memory += _estimate_size(entity)
+                        if reader.position >= sample_chars:
+                            break
+                else:
+                    reader.decode_value()
+                if reader.peek() == ",":
+                    reader.expect(",")
+            return entities, reader.position, memory
+
+    def plan_consolidation(self, largest_files: int = 5) -> Dict[str, Any]:
+        """
+        Estimate the cost of consolidating every folder without writing.
+
+        Up to three of the largest files of each folder are sampled with the
+        streaming parser (PLAN_SAMPLE_CHARS characters per folder in total)
+        to estimate entity counts and merge memory, which are scaled up to
+        the folder's size. Merge memory is capped by memory_budget and
+        assumes no duplicates, so it is an upper bound; files below the
+        stream threshold add their size while their text is decoded.
+        Runtimes use the median throughput of the last five runs recorded
+        in the throughput history (runs with the same output format and
+        JSON backend when there are any). Folders are assigned to the
+        workers longest first. Runtimes are None when there is no history
+        yet.
+
+        Args:
+            largest_files: Number of largest files listed per folder
+
+        Returns:
+            Plan dict with the configuration, per-folder estimates and totals
+        """
+        source_folders = self.scan_source_folders()
+        self._newest_source_mtime_ns = max(
+            (source.mtime_ns for files in source_folders.values() for source in files),
+            default=0,
+        )
+        history = self._load_throughput_history()
+        matching = [
+            run
+            for run in history
+            if run.get("outputFormat") == self.output_format
+            and run.get("jsonBackend", "json") == self.codec.name
+        ] or history
+        rates = sorted(run["bytesPerSecond"] for run in matching[-5:])
+        bytes_per_second = rates[len(rates) // 2] if rates else None
+
+        folders = []
+        for country_folder, json_files in source_folders.items():
+            folder_bytes = sum(source.size for source in json_files)
+            by_size = sorted(json_files, key=lambda source: source.size, reverse=True)
+            sampled = by_size[:3]
+
+            entities = chars = memory = 0
+            for source in sampled:
+                try:
+                    counts = self._sample_source_file(
+                        source.path, self.PLAN_SAMPLE_CHARS // len(sampled)
+                    )
+                except (OSError, ValueError) as e:
+                    logger.warning("Could not sample %s: %s", source.path, e)
+                    continue
+                entities += counts[0]
+                chars += counts[1]
+                memory += counts[2]
+
+            estimated_entities = round(folder_bytes * entities / chars) if chars else 0
+            merge_memory = round(folder_bytes * memory / chars) if chars else 0
+            if self.memory_budget is not None:
+                merge_memory = min(merge_memory, self.memory_budget)
+            load_memory = 0 if self._should_stream(by_size[0].size) else by_size[0].size
+
+            folders.append(
+                {
+                    "folder": self._folder_key(country_folder),
+                    "path": str(country_folder.relative_to(self.data_path)),
+                    "files": len(json_files),
+                    "bytes": folder_bytes,
+                    "largestFiles": [
+                        {
+                            "path": str(source.path.relative_to(self.data_path)),
+                            "bytes": source.size,
+                        }
+                        for source in by_size[:largest_files]
+                    ],
+                    "sampledChars": chars,
+                    "estimatedEntities": estimated_entities,
+                    "estimatedPeakMemoryBytes": merge_memory + load_memory,
+                    "estimatedSeconds": (
+                        round(folder_bytes / bytes_per_second, 6)
+                        if bytes_per_second
+                        else None
+                    ),
+                }
+            )
+
+        workers = max(1, min(self.workers, len(folders)))
+        estimated_seconds = None
+        if bytes_per_second:
+            loads = [0.0] * workers
+            for seconds in sorted(
+                (folder["estimatedSeconds"] for folder in folders), reverse=True
+            ):
+                loads[loads.index(min(loads))] += seconds
+            estimated_seconds = round(max(loads), 6)
+        peaks = sorted(
+            (folder["estimatedPeakMemoryBytes"] for folder in folders), reverse=True
+        )
+
+        return {
+            "createdAt": self._record_timestamp(),
+            "toolVersion": self.tool_version,
+            "dataPath": str(self.data_path),
+            "outputFormat": self.output_format,
+            "jsonBackend": self.codec.name,
+            "workers": self.workers,
+            "memoryBudget": self.memory_budget,
+            "streamThreshold": self.stream_threshold,
+            "throughput": (
+                {"bytesPerSecond": bytes_per_second, "runs": len(matching)}
+                if bytes_per_second
+                else None
+            ),
+            "folders": folders,
+            "totals": {
+                "folders": len(folders),
+                "files": sum(folder["files"] for folder in folders),
+                "bytes": sum(folder["bytes"] for folder in folders),
+                "estimatedEntities": sum(
+                    folder["estimatedEntities"] for folder in folders
+                ),
+                # Worst case: the largest folders are merged at the same time
+                "estimatedPeakMemoryBytes": sum(peaks[:workers]),
+                "estimatedSeconds": estimated_seconds,
+            },
+        }
+
+    def format_plan(self, plan: Dict[str, Any]) -> str:
+        """
+        Format a plan from plan_consolidation as text.
+
+        Args:
+            plan (Dict): Plan to format
+
+        Returns:
+            Multi-line text summary
+        """
+
+        def format_mib(byte_count: int) -> str:
+            return f"{byte_count / 1024 / 1024:.1f} MiB"
+
+        def format_seconds(seconds: Optional[float]) -> str:
+            return "unknown" if seconds is None else f"~{seconds:.1f}s"
+
+        totals = plan["totals"]
+        text = (
+            f"Found {totals['folders']} country folders "
+            f"({totals['files']} JSON files, {totals['bytes']:,} bytes):\n"
+        )
+        for folder in plan["folders"]:
+            text += (
+                f"  {folder['folder']}: {folder['files']} JSON files "
+                f"({folder['bytes']:,} bytes), "
+                f"~{folder['estimatedEntities']:,} entities, "
+                f"peak ~{format_mib(folder['estimatedPeakMemoryBytes'])}, "
+                f"runtime {format_seconds(folder['estimatedSeconds'])}\n"
+            )
+            for source in folder["largestFiles"]:
+                text += f"    {source['path']} ({source['bytes']:,} bytes)\n"
+
+        text += (
+            f"\nEstimated with {plan['workers']} worker(s): "
+            f"~{totals['estimatedEntities']:,} entities, "
+            f"peak memory ~{format_mib(totals['estimatedPeakMemoryBytes'])}, "
+            f"runtime {format_seconds(totals['estimatedSeconds'])}\n"
+        )
+        throughput = plan["throughput"]
+        if throughput:
+            text += (
+                f"Runtime based on {throughput['bytesPerSecond'] / 1024 / 1024:.1f} "
+                f"MiB/s from {throughput['runs']} recorded run(s)\n"
+            )
+        else:
+            text += "Runtime unknown: no throughput history from previous runs\n"
+        return text
+
     def generate_summary_report(self, results: Dict[str, bool]) -> None:
         """
         Generate a summary report of the consolidation process.
@@ -661,43 +4807,268 @@ class IES4Consolidator:
         """
         successful = sum(1 for success in results.values() if success)
         total = len(results)
+        statuses = [self.folder_status.get(country) for country in results]
+        skipped = statuses.count("skipped")
+        rebuilt = successful - skipped
 
         report = f"""
 IES4 JSON Consolidation Summary Report
 =====================================
-Generated: {datetime.now().isoformat()}
+Generated: {self._record_timestamp()}
 
 Total Countries/Regions Processed: {total}
 Successful Consolidations: {successful}
 Failed Consolidations: {total - successful}
+Rebuilt: {rebuilt}
+Skipped (unchanged): {skipped}
 
 Details:
 """
 
         for country, success in results.items():
             status = "✓ SUCCESS" if success else "✗ FAILED"
+            folder_status = self.folder_status.get(country)
+            if folder_status:
+                status += f" ({folder_status})"
             report += f"  {country.upper()}: {status}\n"
 
+        bytes_by_format: Dict[str, int] = {}
+        for details in self.folder_details.values():
+            for output_format, written in details["bytesWritten"].items():
+                bytes_by_format[output_format] = (
+                    bytes_by_format.get(output_format, 0) + written
+                )
+
+        report += f"\nOutput Format: {self.output_format}\n"
+        report += f"JSON Backend: {self.codec.name}\n"
+        if self.parse_cache:
+            report += self._format_parse_cache(results)
+        if self.delta_output:
+            totals = Counter()
+            for details in self.folder_details.values():
+                totals.update(details.get("delta", {}))
+            report += (
+                f"Delta ({self.delta_output}): {totals['added']:,} added, "
+                f"{totals['updated']:,} updated, {totals['removed']:,} removed\n"
+            )
+        if self.deterministic:
+            unchanged = sum(
+                len(details.get("unchangedOutputs", []))
+                for details in self.folder_details.values()
+            )
+            report += (
+                f"Deterministic Output: {unchanged:,} unchanged files not rewritten\n"
+            )
+        report += "Bytes Written:\n"
+        for output_format, written in sorted(bytes_by_format.items()):
+            report += f"  {output_format}: {written:,} bytes\n"
+        if self.combined_sqlite_bytes is not None:
+            report += (
+                f"  sqlite (combined): {self.combined_sqlite_bytes:,} bytes "
+                f"({self.combined_sqlite_path.name})\n"
+            )
+
+        if self.duplicate_report is not None:
+            report += self._format_duplicates(self.duplicate_report)
+
+        report += self._format_performance(results)
+
         report += f"\nOutput Directory: {self.output_path}\n"
         report += "Log File: ies4_consolidator.log\n"
 
         # Save report
         report_file = self.output_path / "consolidation_report.txt"
         try:
+            self._ensure_output_path()
             with open(report_file, "w", encoding="utf-8") as f:
                 f.write(report)
-            logger.info(f"Summary report saved: {report_file}")
+            logger.info("Summary report saved: %s", report_file)
         except Exception as e:
-            logger.error(f"Error saving report: {e}")
+            logger.error("Error saving report: %s", e)
 
         # Print to console
         print(report)
 
+    def _format_duplicates(
+        self, duplicate_report: Dict[str, Any], limit: int = 20
+    ) -> str:
+        """
+        Format the cross-folder duplicate report for the summary report.
+
+        Args:
+            duplicate_report: Report from _reduce_entity_indexes
+            limit: Maximum number of duplicate IDs listed
+
+        Returns:
+            Report section
+        """
+        section = (
+            f"\nCross-Folder Duplicates: {duplicate_report['duplicateCount']} "
+            f"entity IDs in more than one folder "
+            f"({duplicate_report['conflictCount']} with conflicting versions)\n"
+        )
+        entries = [
+            (entity_type, entry)
+            for entity_type, found in duplicate_report["duplicates"].items()
+            for entry in found
+        ]
+        for entity_type, entry in entries[:limit]:
+            folders = ", ".join(
+                f"{occurrence['folder']} v{occurrence['version']}"
+                for occurrence in entry["folders"]
+            )
+            conflict = " (conflict)" if entry["conflict"] else ""
+            section += f"  {entity_type}/{entry['id']}: {folders}{conflict}\n"
+        if len(entries) > limit:
+            section += (
+                f"  ... {len(entries) - limit} more in "
+                f"{self.duplicate_report_path.name}\n"
+            )
+        return section
+
+    def _format_parse_cache(self, results: Dict[str, bool]) -> str:
+        """
+        Format the parse cache hit rate for the summary report.
+
+        Args:
+            results (Dict): Results from consolidation process
+
+        Returns:
+            Report line
+        """
+        totals = self._new_parse_cache_stats()
+        for country in results:
+            stats = self.folder_details.get(country, {}).get("parseCache", {})
+            for key, value in stats.items():
+                totals[key] += value
+
+        if not totals["lookups"]:
+            return "Parse Cache: no source files loaded\n"
+        return (
+            f"Parse Cache: {totals['hits']} of {totals['lookups']} lookups hit "
+            f"({totals['hits'] / totals['lookups']:.1%}), "
+            f"{totals['bytesAvoided']:,} bytes of parsing and "
+            f"{totals['validationsReused']:,} entity validations avoided\n"
+        )
+
+    def _format_performance(self, results: Dict[str, bool]) -> str:
+        """
+        Format run and per-folder phase timings for the summary report.
+
+        Args:
+            results (Dict): Results from consolidation process
+
+        Returns:
+            Report section, empty when nothing was timed
+        """
+        if not self.run_performance:
+            return ""
+
+        def format_phase(phase: str, entry: Dict[str, float], indent: str) -> str:
+            line = f"{indent}{phase:<16}{entry['seconds']:>10.3f}s"
+            if "entitiesPerSecond" in entry:
+                line += f"  {entry['entitiesPerSecond']:>12,.0f} entities/s"
+            if "bytesPerSecond" in entry:
+                line += f"  {entry['bytesPerSecond'] / 1024 / 1024:>9.1f} MiB/s"
+            return line + "\n"
+
+        def format_mib(byte_count: Optional[int]) -> str:
+            if byte_count is None:
+                return "unavailable"
+            return f"{byte_count / 1024 / 1024:.1f} MiB"
+
+        section = "\nPerformance:\n"
+        for phase, entry in self.run_performance.items():
+            section += format_phase(phase, entry, "  ")
+        section += f"  {'peak RSS':<16}{format_mib(self.peak_rss_bytes):>11}\n"
+
+        for country in results:
+            details = self.folder_details.get(country, {})
+            performance = details.get("performance")
+            if performance:
+                section += f"  {country.upper()}:\n"
+                for phase, entry in performance.items():
+                    section += format_phase(phase, entry, "    ")
+                section += (
+                    f"    {'peak RSS':<16}"
+                    f"{format_mib(details.get('peakRssBytes')):>11}\n"
+                )
+                if "spilledEntities" in details:
+                    section += (
+                        f"    {'spilled':<16}"
+                        f"{details['spilledEntities']:>11,} entities\n"
+                    )
+
+        return section
+
+
+class _LogRecordCollector(logging.Handler):
+    """
+    Logging handler that keeps records so a worker process can return them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Render the message now so the record pickles cleanly
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+
+def _consolidate_folder_worker(
+    consolidator: IES4Consolidator,
+    country_folder: Path,
+    source_files: List[SourceFile],
+    log_level: int = logging.INFO,
+) -> Tuple[
+    str, bool, List[logging.LogRecord], Dict[str, Any], Optional[FolderEntityIndex]
+]:
+    """
+    Process pool entry point consolidating a single folder.
+
+    Log records are captured instead of emitted so the parent process can
+    replay them in the same order as a serial run.
+
+    Args:
+        consolidator: Consolidator instance (pickled into the worker)
+        country_folder: Folder to consolidate
+        source_files: The folder's discovered JSON files
+        log_level: Effective level of the parent's logger, applied here as
+            worker processes may not inherit the parent's logging setup
+
+    Returns:
+        Tuple of folder key, success status, captured log records, the
+        folder's entry in folder_details and its partial entity index
+    """
+    collector = _LogRecordCollector()
+    propagate = logger.propagate
+    level = logger.level
+    logger.addHandler(collector)
+    logger.propagate = False
+    logger.setLevel(log_level)
+    try:
+        folder_key, success = consolidator._consolidate_folder(
+            country_folder, source_files
+        )
+    finally:
+        logger.removeHandler(collector)
+        logger.propagate = propagate
+        logger.setLevel(level)
+
+    details = consolidator.folder_details.get(folder_key, {})
+    entity_index = consolidator.folder_indexes.get(folder_key)
+    return folder_key, success, collector.records, details, entity_index
+
 
 def main():
     """
     Main execution function.
     """
+    configure_logging()
     try:
         # Initialize consolidator
         consolidator = IES4Consolidator()
@@ -711,9 +5082,12 @@ def main():
         logger.info("IES4 JSON consolidation process completed")
 
     except Exception as e:
-        logger.error(f"Fatal error in main execution: {e}")
+        logger.error("Fatal error in main execution: %s", e)
         raise
 
+    finally:
+        shutdown_logging()
+
 
 if __name__ == "__main__":
     main()
@@ -6,15 +6,27 @@ This script provides an easy way to run the consolidation process
 with different options and configurations.
 """
 
+import os
 import sys
 import argparse
+import json
+import logging
+import cProfile
+import pstats
 from pathlib import Path
 
 # Add the current directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
 try:
-    from ies4_consolidator import IES4Consolidator
+    from ies4_consolidator import (
+        DELTA_OUTPUT_MODES,
+        IES4Consolidator,
+        JSON_BACKENDS,
+        OUTPUT_FORMATS,
+        SQLITE_OUTPUT_MODES,
+        configure_logging,
+    )
 except ImportError as e:
     print(f"Error importing consolidator: {e}")
     print("Make sure ies4_consolidator.py is in the same directory.")
@@ -43,10 +55,230 @@ def main():
     )
 
     parser.add_argument(
-        "--dry-run", action="store_true", help="Perform a dry run without saving files"
+        "--dry-run",
+        action="store_true",
+        help=(
+            "Print a plan with per-folder sizes and estimated entities, peak "
+            "memory and runtime instead of consolidating"
+        ),
+    )
+
+    parser.add_argument(
+        "--plan-json",
+        metavar="FILE",
+        help="Also write the dry-run plan as JSON to FILE (implies --dry-run)",
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Keep running: poll the data folder and re-consolidate the folders "
+            "whose source files change"
+        ),
+    )
+
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help="Seconds between polls of the data folder in watch mode (default: 2)",
+    )
+
+    parser.add_argument(
+        "--watch-debounce",
+        type=float,
+        default=5.0,
+        metavar="SECONDS",
+        help=(
+            "Seconds the data folder must stay unchanged before changed folders "
+            "are re-consolidated in watch mode (default: 5)"
+        ),
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "Number of worker processes used to consolidate folders in parallel "
+            "(default: 1, 0 = one per CPU)"
+        ),
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip folders whose source files and configuration are unchanged",
+    )
+
+    parser.add_argument(
+        "--output-format",
+        choices=list(OUTPUT_FORMATS),
+        default="pretty",
+        help=(
+            "Consolidated file format: indented JSON, minified JSON or "
+            "compressed minified JSON (default: pretty)"
+        ),
+    )
+
+    parser.add_argument(
+        "--json-backend",
+        choices=list(JSON_BACKENDS),
+        default="auto",
+        help=(
+            "Library used to parse and serialise JSON: orjson when installed "
+            "and the standard library otherwise ('auto', default), or force one"
+        ),
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=(
+            "Parse and validate every source file instead of using the parse "
+            "cache, which pickles every newly parsed file (a cold run with "
+            "no duplicate files is faster without it)"
+        ),
+    )
+
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Empty the parse cache before consolidating (not with --dry-run)",
+    )
+
+    parser.add_argument(
+        "--parse-cache-dir",
+        metavar="DIR",
+        help=(
+            "Directory of the parse cache (default: output/consolidated/"
+            "parse_cache; use a trusted directory, entries are pickles)"
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=1024,
+        metavar="MB",
+        help=(
+            "Evict least recently used parse cache entries beyond this size "
+            "(default: 1024; 0 keeps nothing on disk and only shares "
+            "byte-identical files within the run)"
+        ),
+    )
+
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help=(
+            "Also export one JSON Lines file per entity type for each folder "
+            "under output/consolidated/ndjson/"
+        ),
+    )
+
+    parser.add_argument(
+        "--sqlite",
+        choices=list(SQLITE_OUTPUT_MODES),
+        help=(
+            "Also write each folder to an indexed SQLite database under "
+            "output/consolidated/sqlite/ ('folder'), and merge them into "
+            "ies4_consolidated.sqlite ('combined')"
+        ),
+    )
+
+    parser.add_argument(
+        "--delta",
+        choices=list(DELTA_OUTPUT_MODES),
+        help=(
+            "Also write the entities added, updated and removed since the "
+            "previous run to output/consolidated/delta/ ('alongside'), or write "
+            "that delta with the changed entities instead of the full file "
+            "('only')"
+        ),
+    )
+
+    parser.add_argument(
+        "--no-cross-folder-index",
+        action="store_true",
+        help="Do not index entity IDs across folders or report cross-folder duplicates",
+    )
+
+    parser.add_argument(
+        "--stream-threshold-mb",
+        type=int,
+        default=64,
+        metavar="MB",
+        help=(
+            "Parse source files larger than this incrementally instead of "
+            "loading them whole (default: 64)"
+        ),
+    )
+
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=int,
+        metavar="MB",
+        help=(
+            "Spill merged entities to a temporary on-disk store once a folder's "
+            "merge holds more than this much in memory (default: no limit)"
+        ),
+    )
+
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help=(
+            "Write byte-identical outputs for unchanged sources: timestamps come "
+            "from source file mtimes, keys are sorted, and files whose content "
+            "would not change are not rewritten"
+        ),
+    )
+
+    parser.add_argument(
+        "--run-epoch",
+        type=float,
+        metavar="SECONDS",
+        help=(
+            "Use this Unix time for every timestamp in deterministic outputs "
+            "(implies --deterministic; defaults to SOURCE_DATE_EPOCH when set)"
+        ),
+    )
+
+    parser.add_argument(
+        "--performance-metadata",
+        action="store_true",
+        help=(
+            "Record per-phase timings in consolidationMetadata.performance of "
+            "each consolidated file"
+        ),
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="consolidation.prof",
+        metavar="FILE",
+        help=(
+            "Profile the run with cProfile, save the stats to FILE "
+            "(default: consolidation.prof) and print the top functions. "
+            "With --workers > 1 only the parent process is profiled"
+        ),
     )
 
     args = parser.parse_args()
+    if args.deterministic and args.run_epoch is None:
+        source_date_epoch = os.environ.get("SOURCE_DATE_EPOCH")
+        if source_date_epoch:
+            args.run_epoch = float(source_date_epoch)
+    if args.plan_json:
+        args.dry_run = True
+    if args.clear_cache and args.dry_run:
+        print("Error: --clear-cache cannot be combined with --dry-run or --plan-json")
+        sys.exit(1)
 
     # Validate base path exists
     base_path = Path(args.base_path)
@@ -64,26 +296,74 @@ def main():
         print("DRY RUN MODE - No files will be saved")
         print("-" * 50)
 
+    configure_logging(level=logging.DEBUG if args.verbose else logging.INFO)
+
     try:
         # Initialize consolidator
-        consolidator = IES4Consolidator(str(base_path))
+        consolidator = IES4Consolidator(
+            str(base_path),
+            workers=args.workers,
+            incremental=args.incremental,
+            stream_threshold=args.stream_threshold_mb * 1024 * 1024,
+            output_format=args.output_format,
+            ndjson_export=args.ndjson,
+            sqlite_output=args.sqlite,
+            delta_output=args.delta,
+            cross_folder_index=not args.no_cross_folder_index,
+            performance_metadata=args.performance_metadata,
+            deterministic=args.deterministic,
+            run_epoch=args.run_epoch,
+            json_backend=args.json_backend,
+            parse_cache=not args.no_cache,
+            parse_cache_dir=args.parse_cache_dir,
+            parse_cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+            memory_budget=(
+                args.memory_budget_mb * 1024 * 1024
+                if args.memory_budget_mb is not None
+                else None
+            ),
+        )
+
+        if args.clear_cache:
+            removed = consolidator.clear_parse_cache()
+            print(f"Cleared {removed} parse cache entries")
 
         if args.dry_run:
-            # For dry run, just discover and report
-            country_folders = consolidator._discover_country_folders()
-            print(f"Found {len(country_folders)} country folders:")
-            for folder in country_folders:
-                json_files = list(folder.glob("*.json"))
-                print(f"  {folder.name}: {len(json_files)} JSON files")
+            # For dry run, estimate the cost of the run without writing
+            plan = consolidator.plan_consolidation()
+            print(consolidator.format_plan(plan))
+            if args.plan_json:
+                with open(args.plan_json, "w", encoding="utf-8") as f:
+                    json.dump(plan, f, indent=2)
+                print(f"Plan written to {args.plan_json}")
+            return
+
+        if args.watch:
+            print("Watching for changes (press Ctrl+C to stop)...")
+            consolidator.watch(
+                interval=args.watch_interval, debounce=args.watch_debounce
+            )
             return
 
         # Run actual consolidation
         print("Starting consolidation process...")
-        results = consolidator.consolidate_by_country()
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        try:
+            results = consolidator.consolidate_by_country()
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
 
         # Generate and display summary
         consolidator.generate_summary_report(results)
 
+        if profiler:
+            print(f"\nProfile saved: {args.profile}")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
         # Return appropriate exit code
         failed_count = sum(1 for success in results.values() if not success)
         if failed_count > 0:
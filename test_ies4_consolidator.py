@@ -7,18 +7,37 @@ version management, and error handling.
 """
 
 import unittest
+import gzip
 import tempfile
 import json
+import math
+import logging
 import shutil
+import sqlite3
+import time
+import unittest.mock
 from pathlib import Path
 from datetime import datetime
 import sys
 import os
+import pickle
+import subprocess
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from ies4_consolidator import IES4Consolidator
+import benchmark_ies4_consolidator
+import ies4_consolidator
+from ies4_consolidator import IES4Consolidator, OUTPUT_FORMATS
+
+
+class CrashingConsolidator(IES4Consolidator):
+    """Consolidator whose worker process dies while handling the iran folder."""
+
+    def _consolidate_folder(self, country_folder, source_files=None):
+        if country_folder.name == "iran":
+            os._exit(1)
+        return super()._consolidate_folder(country_folder, source_files)
 
 
 class TestIES4Consolidator(unittest.TestCase):
@@ -194,6 +213,29 @@ class TestIES4Consolidator(unittest.TestCase):
         self.assertIn("army", folder_names)
         self.assertIn("navy", folder_names)
 
+    def test_scan_source_folders_single_pass(self):
+        """Test discovery lists sorted files with sizes without re-globbing."""
+        patch = unittest.mock.patch.object
+        with patch(Path, "glob") as glob, patch(Path, "rglob") as rglob, patch(
+            Path, "iterdir"
+        ) as iterdir:
+            source_folders = self.consolidator.scan_source_folders()
+            results = self.consolidator.consolidate_by_country()
+
+        glob.assert_not_called()
+        rglob.assert_not_called()
+        iterdir.assert_not_called()
+        self.assertTrue(all(results.values()))
+
+        iran_files = source_folders[self.data_path / "iran"]
+        self.assertEqual(
+            [source.path.name for source in iran_files],
+            ["invalid.json", "iran_v1.json", "iran_v2.json"],
+        )
+        for source in iran_files:
+            self.assertEqual(source.size, source.path.stat().st_size)
+            self.assertEqual(source.mtime_ns, source.path.stat().st_mtime_ns)
+
     def test_ies4_compliance_validation(self):
         """Test IES4 r4.3.0 compliance validation."""
         # Valid data
@@ -225,6 +267,133 @@ class TestIES4Consolidator(unittest.TestCase):
         self.assertGreater(len(errors), 0)
         self.assertTrue(any("Missing required field" in error for error in errors))
 
+    def test_array_constraints_checked_after_entity_validation(self):
+        """Test array-level schema keywords apply to pre-validated documents."""
+        schema = {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "properties": {
+                "vehicles": {
+                    "type": "array",
+                    "maxItems": 2,
+                    "uniqueItems": True,
+                    "items": {"type": "object"},
+                }
+            },
+        }
+        with open(self.test_path / "ies4_json_schema.json", "w") as f:
+            json.dump(schema, f)
+        consolidator = IES4Consolidator(str(self.test_path))
+
+        self.assertTrue(
+            consolidator._validate_json_structure(
+                {"vehicles": [{"id": "a"}, {"id": "b"}]}, entity_errors=[]
+            )
+        )
+        for data, validator in (
+            ({"vehicles": [{"id": "a"}, {"id": "b"}, {"id": "c"}]}, "maxItems"),
+            ({"vehicles": [{"id": "a"}, {"id": "a"}]}, "uniqueItems"),
+            ({"vehicles": {"id": "a"}}, "type"),
+        ):
+            self.assertFalse(
+                consolidator._validate_json_structure(data, entity_errors=[])
+            )
+            self.assertEqual(
+                [error["validator"] for error in consolidator.last_schema_errors],
+                [validator],
+            )
+            self.assertEqual(consolidator.last_schema_errors[0]["path"], "/vehicles")
+
+    def test_schema_validator_is_compiled_once_and_reports_all_errors(self):
+        """Test cached draft-specific validator and bounded structured errors."""
+        schema = {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "properties": {
+                "vehicles": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"name": {"type": "string"}},
+                    },
+                }
+            },
+        }
+        with open(self.test_path / "ies4_json_schema.json", "w") as f:
+            json.dump(schema, f)
+
+        first = IES4Consolidator(str(self.test_path))
+        second = IES4Consolidator(str(self.test_path))
+        validator = first._get_schema_validator()
+
+        self.assertEqual(type(validator).__name__, "Draft7Validator")
+        self.assertIs(second._get_schema_validator(), validator)
+        self.assertIn(validator, ies4_consolidator._SCHEMA_VALIDATORS.values())
+
+        data = {"vehicles": [{"name": 1}, {"name": "ok"}, {"name": 3}]}
+        errors = first._collect_schema_errors(data)
+        self.assertEqual(
+            sorted(error["path"] for error in errors),
+            ["/vehicles/0/name", "/vehicles/2/name"],
+        )
+        self.assertEqual(errors[0]["validator"], "type")
+        self.assertFalse(first._validate_json_structure(data))
+
+        first.max_schema_errors = 1
+        self.assertEqual(len(first._collect_schema_errors(data)), 1)
+
+        # Per-entity validation reuses the cached validator for the items
+        entity_errors = first._validate_entity("vehicles", {"name": 1})
+        self.assertIn(
+            "Schema validation at /name: 1 is not of type 'string'", entity_errors
+        )
+        self.assertIs(
+            second._get_entity_validator("vehicles"),
+            first._get_entity_validator("vehicles"),
+        )
+        self.assertIsNone(first._get_entity_validator("people"))
+
+    def test_entities_validated_once_at_ingestion(self):
+        """Test ingestion-time validation naming source file and entity index."""
+        with open(self.data_path / "iran" / "iran_v1.json", "r") as f:
+            iran_v1 = json.load(f)
+        iran_v1["vehicles"].append(
+            {"id": "iran-bad-001", "type": "Drone", "timestamp": "yesterday"}
+        )
+        # Invalid older version of iran-drone-002, replaced by iran_v2.json
+        iran_v1["vehicles"].append(
+            {"id": "iran-drone-002", "version": "0.1", "timestamp": "bad"}
+        )
+        with open(self.data_path / "iran" / "iran_v1.json", "w") as f:
+            json.dump(iran_v1, f)
+
+        iran_files = sorted((self.data_path / "iran").glob("iran_v*.json"))
+        entity_errors = []
+        with unittest.mock.patch.object(
+            self.consolidator,
+            "_validate_entity",
+            wraps=self.consolidator._validate_entity,
+        ) as validate_entity:
+            merged = self.consolidator._merge_json_files(iran_files, entity_errors)
+
+        # Each stored source entity is validated once; the replaced
+        # iran-drone-002 v0.1 errors are dropped and the defaulted version of
+        # iran-bad-001 is not reported missing
+        self.assertEqual(validate_entity.call_count, 6)
+        self.assertEqual(
+            entity_errors,
+            ["iran/iran_v1.json vehicles[1]: Invalid timestamp format"],
+        )
+
+        with unittest.mock.patch.object(
+            self.consolidator, "_check_entity_fields"
+        ) as check_entity_fields:
+            self.assertFalse(
+                self.consolidator._validate_json_structure(merged, entity_errors)
+            )
+            self.assertTrue(self.consolidator._validate_json_structure(merged, []))
+        check_entity_fields.assert_not_called()
+
     def test_timestamp_validation(self):
         """Test timestamp validation functionality."""
         # Valid timestamps
@@ -257,6 +426,13 @@ class TestIES4Consolidator(unittest.TestCase):
         self.assertEqual(self.consolidator._compare_versions("1.0", "1.0"), 0)
         self.assertEqual(self.consolidator._compare_versions("1.2.3", "1.2.1"), 1)
 
+        # Zero padding and fallback to string comparison
+        self.assertEqual(self.consolidator._compare_versions("1.0", "1"), 0)
+        self.assertEqual(self.consolidator._compare_versions("1.0.1", "1"), 1)
+        self.assertEqual(self.consolidator._compare_versions("1.-1", "1"), -1)
+        self.assertEqual(self.consolidator._compare_versions("1.a", "1.0"), 1)
+        self.assertEqual(self.consolidator._compare_versions("beta", "alpha"), 1)
+
     def test_consolidation_with_version_management(self):
         """Test consolidation with entity version management."""
         results = self.consolidator.consolidate_by_country()
@@ -281,6 +457,613 @@ class TestIES4Consolidator(unittest.TestCase):
         self.assertEqual(drone_001["version"], "2.0")
         self.assertEqual(drone_001["name"], "Shahed-136 Enhanced")
 
+    def test_merge_scales_linearly_with_entity_count(self):
+        """Test that version replacement during merge is not quadratic."""
+        scale_path = self.data_path / "scale"
+        scale_path.mkdir()
+
+        def merge_time(count):
+            files = []
+            for revision in (1, 2):
+                data = {
+                    "vehicles": [
+                        {
+                            "id": f"veh-{count}-{i}",
+                            "type": "Tank",
+                            "timestamp": "2024-12-01T10:00:00Z",
+                            "version": f"{revision}.0",
+                        }
+                        for i in range(count)
+                    ]
+                }
+                file_path = scale_path / f"scale_{count}_v{revision}.json"
+                with open(file_path, "w") as f:
+                    json.dump(data, f)
+                files.append(file_path)
+
+            start = time.perf_counter()
+            merged = self.consolidator._merge_json_files(files)
+            elapsed = time.perf_counter() - start
+
+            self.assertEqual(len(merged["vehicles"]), count)
+            self.assertTrue(all(v["version"] == "2.0" for v in merged["vehicles"]))
+            return elapsed
+
+        module_logger = logging.getLogger("ies4_consolidator")
+        previous_level = module_logger.level
+        module_logger.setLevel(logging.WARNING)
+        try:
+            small = min(merge_time(2000) for _ in range(3))
+            large = min(merge_time(8000) for _ in range(3))
+        finally:
+            module_logger.setLevel(previous_level)
+
+        # 4x the entities: linear ~4x, quadratic ~16x
+        self.assertLess(large / small, 8)
+
+    def test_streaming_merge_matches_loaded_merge(self):
+        """Test that streamed oversized files merge exactly like loaded ones."""
+        iran_files = sorted((self.data_path / "iran").glob("iran_v*.json"))
+        # Awkward formatting and values split across small read chunks
+        with open(iran_files[1], "r") as f:
+            iran_v2 = json.load(f)
+        iran_v2["vehicles"].append(
+            {
+                "id": "iran-drone-003",
+                "type": "Drone",
+                "timestamp": "2024-12-01T12:00:00Z",
+                "version": "1.0",
+                "range": 12345678901234567890,
+                "name": "Ababil-3 \u00e9 [,]{:}",
+            }
+        )
+        with open(iran_files[1], "w") as f:
+            f.write(json.dumps(iran_v2, indent=None, separators=(" , ", " : ")))
+
+        loaded = self.consolidator._merge_json_files(iran_files)
+
+        streaming = IES4Consolidator(str(self.test_path), stream_threshold=0)
+        metadata = {}
+        entities = list(
+            streaming._stream_json_entities(iran_files[1], metadata, chunk_size=7)
+        )
+        streamed = streaming._merge_json_files(iran_files)
+
+        self.assertEqual(metadata["title"], "Iran Database v2")
+        self.assertEqual(metadata["ies4Version"], "4.3.0")
+        self.assertEqual(entities, list(streaming._iter_document_entities(iran_v2)))
+
+        for merged in (loaded, streamed):
+            merged.pop("description")
+            merged["consolidationMetadata"].pop("timestamp")
+            for entity_type in streaming.entity_types:
+                for entity in merged[entity_type]:
+                    entity.pop("_consolidatedAt")
+            for file_info in merged["consolidationMetadata"]["consolidatedFiles"]:
+                file_info.pop("processedAt")
+        self.assertEqual(streamed, loaded)
+
+    def test_streamed_single_file_matches_loaded(self):
+        """Test a single-file folder's output does not depend on streaming."""
+        army_source = self.data_path / "uk" / "army" / "army_data.json"
+        with open(army_source) as f:
+            army = json.load(f)
+        army["vehicles"].append({"id": "uk-tank-009", "type": "MainBattleTank"})
+        army["empty"] = []
+        with open(army_source, "w") as f:
+            json.dump(army, f)
+
+        outputs = []
+        with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+            clock.now.return_value.isoformat.return_value = "2025-01-01T00:00:00"
+            for options in (
+                {},
+                {"stream_threshold": 0},
+                {"stream_threshold": 0, "memory_budget": 0},
+            ):
+                consolidator = IES4Consolidator(str(self.test_path), **options)
+                with self.assertLogs("ies4_consolidator", "ERROR") as logs:
+                    results = consolidator.consolidate_by_country(["uk_army"])
+                self.assertFalse(results["uk_army"])
+                outputs.append(
+                    sorted(
+                        message.split(":", 2)[2]
+                        for message in logs.output
+                        if "Validation error" in message
+                    )
+                )
+        self.assertEqual(outputs[1], outputs[0])
+        self.assertEqual(outputs[2], outputs[0])
+        self.assertTrue(any("'timestamp'" in error for error in outputs[0]))
+
+        # A valid file is written the same way whether it was streamed or not
+        del army["vehicles"][-1]
+        with open(army_source, "w") as f:
+            json.dump(army, f)
+        outputs = []
+        with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+            clock.now.return_value.isoformat.return_value = "2025-01-01T00:00:00"
+            for options in ({}, {"stream_threshold": 0, "memory_budget": 0}):
+                consolidator = IES4Consolidator(str(self.test_path), **options)
+                self.assertTrue(
+                    consolidator.consolidate_by_country(["uk_army"])["uk_army"]
+                )
+                outputs.append(consolidator._output_file("uk_army").read_bytes())
+        self.assertEqual(outputs[1], outputs[0])
+
+    def test_streaming_rejects_invalid_json(self):
+        """Test that the streaming parser reports malformed documents."""
+        streaming = IES4Consolidator(str(self.test_path), stream_threshold=0)
+        for content in ('{"vehicles": [{"id": 1}', '{"a": 1} extra', "[1, 2]"):
+            bad_file = self.data_path / "iran" / "invalid.json"
+            bad_file.write_text(content)
+            with self.assertRaises(ValueError):
+                list(streaming._stream_json_entities(bad_file, {}))
+
+    def test_streaming_writer_matches_json_dump(self):
+        """Test that the streamed output is byte-identical to json.dump."""
+        merged = self.consolidator._merge_json_files(
+            sorted((self.data_path / "iran").glob("iran_v*.json"))
+        )
+        merged["vehicles"][0]["name"] = 'Shahed-136 \u00e9\u4e2d "quoted"\nline'
+        merged["consolidationMetadata"]["empty"] = {}
+
+        output_file = self.consolidator.output_path / "streamed.json"
+        self.assertTrue(self.consolidator._save_consolidated_file(merged, output_file))
+
+        expected = json.dumps(merged, indent=2, ensure_ascii=False)
+        self.assertEqual(output_file.read_text(encoding="utf-8"), expected)
+        self.assertFalse(output_file.with_name("streamed.json.tmp").exists())
+
+    def test_streaming_writer_failure_keeps_previous_output(self):
+        """Test that a failed write leaves the existing output untouched."""
+        output_file = self.consolidator.output_path / "ies4_iran_consolidated.json"
+        output_file.parent.mkdir(parents=True)
+        output_file.write_text("previous")
+
+        data = {"ies4Version": "4.3.0", "vehicles": [], "bad": object()}
+        self.assertFalse(self.consolidator._save_consolidated_file(data, output_file))
+
+        self.assertEqual(output_file.read_text(), "previous")
+        self.assertEqual(list(self.consolidator.output_path.glob("*.tmp")), [])
+
+    def test_output_formats_round_trip(self):
+        """Test compact and compressed outputs parse to the same document."""
+        merged = self.consolidator._merge_json_files(
+            sorted((self.data_path / "iran").glob("iran_v*.json"))
+        )
+        merged["vehicles"][0]["name"] = "Shahed-136 \u00e9"
+
+        for output_format, (suffix, _, opener) in OUTPUT_FORMATS.items():
+            consolidator = IES4Consolidator(
+                str(self.test_path), output_format=output_format
+            )
+            output_file = consolidator._output_file("iran")
+            self.assertTrue(output_file.name.endswith(suffix))
+            self.assertTrue(consolidator._save_consolidated_file(merged, output_file))
+
+            with opener(output_file, "rt", encoding="utf-8") as f:
+                text = f.read()
+            self.assertEqual(json.loads(text), merged)
+            if output_format != "pretty":
+                self.assertEqual(
+                    text,
+                    json.dumps(merged, separators=(",", ":"), ensure_ascii=False),
+                )
+
+        with self.assertRaises(ValueError):
+            IES4Consolidator(str(self.test_path), output_format="xml")
+
+    def test_parse_cache_shares_identical_sources(self):
+        """Test byte-identical files are parsed and validated once."""
+        catalogue = {
+            "vehicleTypes": [
+                {
+                    "id": "type-drone",
+                    "type": "VehicleType",
+                    "timestamp": "2024-12-01T09:00:00Z",
+                    "version": "1.0",
+                    "name": "Drone",
+                },
+                {
+                    "id": "type-ship",
+                    "type": "VehicleType",
+                    "timestamp": "2024-12-01T09:00:00Z",
+                    "name": "Ship",
+                },
+            ]
+        }
+        for folder in ("iran", "uk/army", "uk/navy"):
+            with open(self.data_path / folder / "catalogue.json", "w") as f:
+                json.dump(catalogue, f)
+
+        outputs = {}
+        for parse_cache in (False, True):
+            ies4_consolidator._PARSE_CACHE.clear()
+            consolidator = IES4Consolidator(
+                str(self.test_path), parse_cache=parse_cache
+            )
+            with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+                clock.now.return_value.isoformat.return_value = "2025-01-01T00:00:00"
+                with unittest.mock.patch.object(
+                    consolidator,
+                    "_validate_entity",
+                    wraps=consolidator._validate_entity,
+                ) as validate:
+                    results = consolidator.consolidate_by_country()
+            outputs[parse_cache] = (
+                {k: consolidator._output_file(k).read_bytes() for k in results},
+                validate.call_count,
+            )
+
+        self.assertEqual(outputs[True][0], outputs[False][0])
+        self.assertEqual(outputs[False][1] - outputs[True][1], 4)
+        consolidator.generate_summary_report(results)
+        report = (consolidator.output_path / "consolidation_report.txt").read_text()
+        self.assertIn("Parse Cache: 2 of 8 lookups hit (25.0%)", report)
+        self.assertIn("4 entity validations avoided", report)
+
+        # Each load is a private copy; the cached document stays intact
+        source = self.data_path / "iran" / "catalogue.json"
+        consolidator._load_json_file(source)["vehicleTypes"][0]["name"] = "Changed"
+        self.assertEqual(
+            consolidator._load_json_file(source)["vehicleTypes"][0]["name"], "Drone"
+        )
+
+        # A persisted cache serves a fresh process
+        cache_dir = self.test_path / "parse_cache"
+        ies4_consolidator._PARSE_CACHE.clear()
+        IES4Consolidator(
+            str(self.test_path), parse_cache_dir=str(cache_dir)
+        ).consolidate_by_country()
+        ies4_consolidator._PARSE_CACHE.clear()
+        persisted = IES4Consolidator(
+            str(self.test_path), parse_cache_dir=str(cache_dir)
+        )
+        persisted._load_json_file(source)
+        self.assertEqual(persisted._parse_cache_stats["hits"], 1)
+
+    def test_persisted_parse_cache_skips_unchanged_sources(self):
+        """Test the persisted parse cache serves unchanged files across runs."""
+        first = IES4Consolidator(str(self.test_path))
+        with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+            clock.now.return_value.isoformat.return_value = "2025-01-01T00:00:00"
+            results = first.consolidate_by_country()
+        expected = {k: first._output_file(k).read_bytes() for k in results}
+        cache_files = list(first.parse_cache_path.glob("*.pickle"))
+        self.assertEqual(len(cache_files), 4)
+
+        # A fresh process reads no unchanged source; a touched file and a
+        # corrupt entry are parsed again
+        ies4_consolidator._PARSE_CACHE.clear()
+        army = self.data_path / "uk" / "army" / "army_data.json"
+        first._parse_cache_file(first._source_cache_key(army, army.stat())).write_bytes(
+            b"not a pickle"
+        )
+        os.utime(self.data_path / "iran" / "iran_v1.json", ns=(0, 0))
+        second = IES4Consolidator(str(self.test_path))
+        with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+            clock.now.return_value.isoformat.return_value = "2025-01-01T00:00:00"
+            with unittest.mock.patch.object(
+                second.codec, "loads", wraps=second.codec.loads
+            ) as loads:
+                results = second.consolidate_by_country()
+        self.assertEqual(
+            {k: second._output_file(k).read_bytes() for k in results}, expected
+        )
+        self.assertEqual(loads.call_count, 3)  # touched, corrupt, invalid.json
+
+        # Least recently used entries beyond the size limit are evicted
+        small = IES4Consolidator(
+            str(self.test_path),
+            parse_cache_max_bytes=cache_files[0].stat().st_size * 2,
+        )
+        self.assertGreater(small._prune_parse_cache(), 0)
+        self.assertLessEqual(
+            sum(f.stat().st_size for f in small.parse_cache_path.glob("*.pickle")),
+            small.parse_cache_max_bytes,
+        )
+        self.assertGreater(small.clear_parse_cache(), 0)
+        self.assertEqual(list(small.parse_cache_path.glob("*.pickle")), [])
+
+        # Without persistence, only sources sharing a size are pickled
+        ies4_consolidator._PARSE_CACHE.clear()
+        shutil.copy(army, self.data_path / "uk" / "navy" / "army_copy.json")
+        memory_only = IES4Consolidator(str(self.test_path), parse_cache_max_bytes=0)
+        with unittest.mock.patch("pickle.dumps", wraps=pickle.dumps) as dumps:
+            results = memory_only.consolidate_by_country()
+        self.assertTrue(results["uk_navy"])
+        self.assertEqual(dumps.call_count, 1)
+        self.assertEqual(memory_only.folder_details["uk_navy"]["parseCache"]["hits"], 1)
+        self.assertEqual(list(memory_only.parse_cache_path.glob("*.pickle")), [])
+
+    def test_delta_output_lists_changed_entities(self):
+        """Test delta files list entities changed since the previous run."""
+
+        def run(mode):
+            consolidator = IES4Consolidator(str(self.test_path), delta_output=mode)
+            results = consolidator.consolidate_by_country()
+            self.assertTrue(results["iran"])
+            with open(consolidator._delta_path("iran"), encoding="utf-8") as f:
+                return consolidator, json.load(f)
+
+        consolidator, delta = run("alongside")
+        self.assertIsNone(delta["since"])
+        self.assertEqual(
+            delta["changes"]["vehicles"]["added"], ["iran-drone-001", "iran-drone-002"]
+        )
+        self.assertEqual(delta["totals"], {"added": 3, "updated": 0, "removed": 0})
+
+        # A rebuild with new _consolidatedAt stamps changes nothing
+        consolidator, delta = run("alongside")
+        full_output = consolidator._output_file("iran").read_bytes()
+        self.assertEqual(delta["changes"], {})
+        self.assertIsNotNone(delta["since"])
+
+        with open(self.data_path / "iran" / "iran_v2.json") as f:
+            iran_v2 = json.load(f)
+        iran_v2["vehicles"][1].update(version="1.1", name="Mohajer-10 Block 2")
+        iran_v2["vehicles"].append(
+            dict(iran_v2["vehicles"][1], id="iran-drone-003", version="1.0")
+        )
+        del iran_v2["organizations"]
+        with open(self.data_path / "iran" / "iran_v2.json", "w") as f:
+            json.dump(iran_v2, f)
+
+        consolidator, delta = run("only")
+        self.assertEqual(
+            delta["changes"],
+            {
+                "vehicles": {
+                    "added": ["iran-drone-003"],
+                    "updated": [
+                        {
+                            "id": "iran-drone-002",
+                            "oldVersion": "1.0",
+                            "newVersion": "1.1",
+                        }
+                    ],
+                    "removed": [],
+                },
+                "organizations": {
+                    "added": [],
+                    "updated": [],
+                    "removed": ["iran-org-001"],
+                },
+            },
+        )
+        # The delta carries the changed entities instead of the full file
+        self.assertEqual(
+            [entity["id"] for entity in delta["vehicles"]],
+            ["iran-drone-002", "iran-drone-003"],
+        )
+        self.assertEqual(consolidator._output_file("iran").read_bytes(), full_output)
+        consolidator.generate_summary_report({"iran": True})
+        report = (consolidator.output_path / "consolidation_report.txt").read_text()
+        self.assertIn("Delta (only): 1 added, 1 updated, 1 removed", report)
+
+    def test_delta_ignores_defaulted_timestamps(self):
+        """Test entities without a source timestamp are not updated each run."""
+        with open(self.data_path / "iran" / "iran_v2.json") as f:
+            iran_v2 = json.load(f)
+        del iran_v2["vehicles"][1]["timestamp"]
+        with open(self.data_path / "iran" / "iran_v2.json", "w") as f:
+            json.dump(iran_v2, f)
+
+        deltas = []
+        for now in ("2025-01-01T00:00:00", "2025-01-02T00:00:00"):
+            with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+                clock.now.return_value.isoformat.return_value = now
+                consolidator = IES4Consolidator(
+                    str(self.test_path), delta_output="alongside"
+                )
+                self.assertTrue(consolidator.consolidate_by_country(["iran"])["iran"])
+            with open(consolidator._delta_path("iran"), encoding="utf-8") as f:
+                deltas.append(json.load(f))
+
+        self.assertEqual(deltas[0]["totals"]["added"], 3)
+        self.assertEqual(deltas[1]["changes"], {})
+        # Folders left out of the run get no delta
+        self.assertFalse(consolidator._delta_path("uk_army").exists())
+        with open(consolidator._output_file("iran"), encoding="utf-8") as f:
+            entity = json.load(f)["vehicles"][1]
+        self.assertEqual(entity["timestamp"], "2025-01-02T00:00:00")
+
+    def test_watch_reconsolidates_changed_folders(self):
+        """Test watch mode rebuilds only the folders a burst of writes touched."""
+        consolidator = IES4Consolidator(str(self.test_path))
+        writes = [
+            self.data_path / "iran" / "iran_v1.json",
+            self.data_path / "uk" / "army" / "army_data.json",
+        ]
+
+        def poll(seconds):
+            # Each of the first polls sees one more write of the burst
+            if writes:
+                source = writes.pop(0)
+                os.utime(source, ns=(0, source.stat().st_mtime_ns + 10**9))
+
+        with unittest.mock.patch.object(
+            ies4_consolidator.time, "sleep", side_effect=poll
+        ) as sleep, unittest.mock.patch.object(
+            consolidator, "_consolidate_folder", wraps=consolidator._consolidate_folder
+        ) as consolidate:
+            consolidator.watch(interval=1.0, debounce=0.0, max_cycles=1)
+
+        # Initial run of every folder, then one run for the burst
+        self.assertEqual(consolidate.call_count, 5)
+        self.assertEqual(sleep.call_count, 3)
+        self.assertEqual(
+            consolidator.folder_status,
+            {"iran": "rebuilt", "uk_army": "rebuilt", "uk_navy": "skipped"},
+        )
+
+    def test_deterministic_output_skips_unchanged_writes(self):
+        """Test deterministic runs reproduce outputs without rewriting them."""
+        for offset, source in enumerate(sorted((self.data_path / "iran").iterdir())):
+            os.utime(source, ns=(0, (1_700_000_000 + 60 * offset) * 10**9))
+
+        def run(**options):
+            consolidator = IES4Consolidator(
+                str(self.test_path), deterministic=True, **options
+            )
+            results = consolidator.consolidate_by_country()
+            return consolidator, {
+                k: consolidator._output_file(k).read_bytes() for k in results
+            }
+
+        for output_format in ("pretty", "gzip"):
+            consolidator, first = run(output_format=output_format)
+            output_file = consolidator._output_file("iran")
+            os.utime(output_file, ns=(0, 0))
+            consolidator, second = run(output_format=output_format)
+            self.assertEqual(second, first)
+            # Unchanged outputs are left alone, mtime included
+            self.assertEqual(output_file.stat().st_mtime_ns, 0)
+            self.assertIn(
+                output_file.name,
+                consolidator.folder_details["iran"]["unchangedOutputs"],
+            )
+
+        data = json.loads(gzip.decompress(output_file.read_bytes()))
+        self.assertEqual(list(data), sorted(data))
+        self.assertEqual(
+            data["consolidationMetadata"]["consolidatedFiles"][0]["processedAt"],
+            "2023-11-14T22:14:20+00:00",
+        )
+        self.assertEqual(
+            data["consolidationMetadata"]["timestamp"],
+            "2023-11-14T22:15:20+00:00",
+        )
+
+        # A pinned epoch replaces source mtimes everywhere
+        consolidator, pinned = run(run_epoch=0)
+        self.assertIn(b'"_consolidatedAt": "1970-01-01T00:00:00+00:00"', pinned["iran"])
+        self.assertNotEqual(pinned, first)
+        consolidator.generate_summary_report({"iran": True})
+        report = (consolidator.output_path / "consolidation_report.txt").read_text()
+        self.assertIn("Deterministic Output:", report)
+        self.assertIn("Generated: 1970-01-01T00:00:00+00:00", report)
+        with open(consolidator.output_path / "cross_folder_duplicates.json") as f:
+            self.assertEqual(json.load(f)["generatedAt"], "1970-01-01T00:00:00+00:00")
+        self.assertEqual(
+            consolidator.plan_consolidation()["createdAt"], "1970-01-01T00:00:00+00:00"
+        )
+        # Run timings are not recorded, so nothing else changes between runs
+        self.assertFalse(consolidator.throughput_history_path.exists())
+
+        with self.assertRaises(ValueError):
+            IES4Consolidator(
+                str(self.test_path), deterministic=True, performance_metadata=True
+            )
+
+    def test_json_backends_agree(self):
+        """Test every installed JSON backend parses and writes the same data."""
+        source = self.data_path / "iran" / "iran_big_numbers.json"
+        source.write_text(
+            '{"ies4Version": "4.3.0", "vehicles": [{"id": "big", "type": "Drone", '
+            '"timestamp": "2024-12-02T10:00:00Z", "version": "1.0", "serial": '
+            + str(2**70)
+            + "}]}",
+            encoding="utf-8",
+        )
+        outputs = {}
+        for backend in ("orjson", "json"):
+            try:
+                consolidator = IES4Consolidator(
+                    str(self.test_path), json_backend=backend
+                )
+            except ValueError:
+                continue
+            data = consolidator._load_json_file(source)
+            self.assertEqual(data["vehicles"][0]["serial"], 2**70)
+
+            with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+                clock.now.return_value.isoformat.return_value = "2025-01-01T00:00:00"
+                results = consolidator.consolidate_by_country()
+            self.assertTrue(results["iran"])
+            with open(consolidator._output_file("iran"), encoding="utf-8") as f:
+                outputs[backend] = json.load(f)
+            consolidator.generate_summary_report(results)
+            report = consolidator.output_path / "consolidation_report.txt"
+            self.assertIn(f"JSON Backend: {backend}", report.read_text())
+
+        if len(outputs) == 2:
+            self.assertEqual(outputs["orjson"], outputs["json"])
+        with self.assertRaises(ValueError):
+            IES4Consolidator(str(self.test_path), json_backend="simplejson")
+
+    def test_json_backends_keep_non_finite_floats(self):
+        """Test NaN and Infinity round-trip with every installed backend."""
+        content = b'{"range": NaN, "limits": [Infinity, -Infinity], "ok": null}'
+        fingerprints = set()
+        for backend in ("orjson", "json"):
+            try:
+                codec = ies4_consolidator._json_codec(backend)
+            except ImportError:
+                continue
+            data = codec.loads(content)
+            for indent in (False, True):
+                text = codec.dumps(data, indent=indent, sort_keys=True)
+                self.assertIn("NaN", text)
+                restored = codec.loads(text.encode("utf-8"))
+                self.assertTrue(math.isnan(restored["range"]))
+                self.assertEqual(restored["limits"], [math.inf, -math.inf])
+                self.assertIsNone(restored["ok"])
+            fingerprints.add(codec.fingerprint(data))
+        self.assertEqual(len(fingerprints), 1)
+
+    def test_compressed_output_reports_bytes_written(self):
+        """Test compressed output naming and per-format byte totals."""
+        consolidator = IES4Consolidator(str(self.test_path), output_format="gzip")
+        results = consolidator.consolidate_by_country()
+        consolidator.generate_summary_report(results)
+
+        output_files = sorted(consolidator.output_path.glob("*.json.gz"))
+        self.assertEqual(len(output_files), 3)
+        total = sum(f.stat().st_size for f in output_files)
+
+        with open(consolidator.output_path / "consolidation_report.txt") as f:
+            report_content = f.read()
+        self.assertIn("Output Format: gzip", report_content)
+        self.assertIn(f"gzip: {total:,} bytes", report_content)
+
+    def test_ndjson_export(self):
+        """Test JSON Lines export per entity type with a metadata sidecar."""
+        consolidator = IES4Consolidator(str(self.test_path), ndjson_export=True)
+        stale_file = consolidator._ndjson_path("iran") / "people.jsonl"
+        stale_file.parent.mkdir(parents=True)
+        stale_file.write_text("{}\n")
+
+        results = consolidator.consolidate_by_country()
+        self.assertTrue(all(results.values()))
+
+        iran_path = consolidator._ndjson_path("iran")
+        self.assertEqual(
+            sorted(f.name for f in iran_path.glob("*.jsonl")),
+            ["organizations.jsonl", "vehicles.jsonl"],
+        )
+        with open(iran_path / "vehicles.jsonl", encoding="utf-8") as f:
+            vehicles = [json.loads(line) for line in f]
+        self.assertEqual(
+            sorted(v["id"] for v in vehicles), ["iran-drone-001", "iran-drone-002"]
+        )
+        self.assertTrue(all("_consolidatedAt" in v for v in vehicles))
+        self.assertEqual(vehicles[0]["_sourceFiles"], ["iran/iran_v2.json"])
+
+        with open(iran_path / IES4Consolidator.NDJSON_METADATA_FILE) as f:
+            sidecar = json.load(f)
+        self.assertEqual(sidecar["consolidationMetadata"]["sourceFileCount"], 3)
+        self.assertNotIn("vehicles", sidecar)
+
+        # Single-file folders gain provenance in the export
+        with open(consolidator._ndjson_path("uk_army") / "vehicles.jsonl") as f:
+            tank = json.loads(f.readline())
+        self.assertEqual(tank["_sourceFiles"], ["uk/army/army_data.json"])
+        self.assertIn("_consolidatedAt", tank)
+
+        self.assertIn("ndjson", consolidator.folder_details["iran"]["bytesWritten"])
+
     def test_enhanced_metadata_preservation(self):
         """Test comprehensive metadata preservation."""
         results = self.consolidator.consolidate_by_country()
@@ -344,6 +1127,103 @@ class TestIES4Consolidator(unittest.TestCase):
             file_path = self.consolidator.output_path / filename
             self.assertTrue(file_path.exists(), f"Expected file {filename} not found")
 
+    def test_parallel_consolidation_matches_serial(self):
+        """Test that a process pool run produces the same results as serial."""
+        serial_results = self.consolidator.consolidate_by_country()
+        with open(
+            self.consolidator.output_path / "ies4_iran_consolidated.json", "r"
+        ) as f:
+            serial_iran = json.load(f)
+
+        parallel = IES4Consolidator(str(self.test_path), workers=3)
+        with self.assertLogs("ies4_consolidator", level="INFO") as logs:
+            parallel_results = parallel.consolidate_by_country()
+
+        self.assertEqual(parallel_results, serial_results)
+        self.assertEqual(list(parallel_results), list(serial_results))
+
+        with open(parallel.output_path / "ies4_iran_consolidated.json", "r") as f:
+            parallel_iran = json.load(f)
+        self.assertEqual(
+            [(v["id"], v["version"]) for v in parallel_iran["vehicles"]],
+            [(v["id"], v["version"]) for v in serial_iran["vehicles"]],
+        )
+
+        # Worker log records are replayed in folder order
+        processing = [m for m in logs.output if "Processing folder:" in m]
+        self.assertEqual(len(processing), 3)
+        for message, folder_key in zip(processing, serial_results):
+            self.assertIn(f"Processing folder: {folder_key} ", message)
+
+    def test_parallel_worker_crash_fails_only_its_folder(self):
+        """Test that a crashed worker process only fails its own folder."""
+        consolidator = CrashingConsolidator(str(self.test_path), workers=2)
+        with self.assertLogs("ies4_consolidator", level="INFO"):
+            results = consolidator.consolidate_by_country()
+
+        self.assertFalse(results["iran"])
+        self.assertTrue(results["uk_army"])
+        self.assertTrue(results["uk_navy"])
+
+    def test_incremental_consolidation_skips_unchanged_folders(self):
+        """Test that incremental runs only rebuild folders with changed sources."""
+        consolidator = IES4Consolidator(str(self.test_path), incremental=True)
+        consolidator.consolidate_by_country()
+        self.assertTrue(consolidator.manifest_path.exists())
+        self.assertEqual(set(consolidator.folder_status.values()), {"rebuilt"})
+
+        # Change one source file; content hash differs
+        army_source = self.data_path / "uk" / "army" / "army_data.json"
+        with open(army_source, "r") as f:
+            army_data = json.load(f)
+        army_data["vehicles"][0]["name"] = "Challenger 3"
+        with open(army_source, "w") as f:
+            json.dump(army_data, f, indent=2)
+
+        # Touch another without changing content; mtime differs, hash does not
+        navy_source = self.data_path / "uk" / "navy" / "navy_data.json"
+        os.utime(navy_source, ns=(0, 0))
+
+        consolidator = IES4Consolidator(str(self.test_path), incremental=True)
+        results = consolidator.consolidate_by_country()
+
+        self.assertTrue(all(results.values()))
+        self.assertEqual(consolidator.folder_status["uk_army"], "rebuilt")
+        self.assertEqual(consolidator.folder_status["uk_navy"], "skipped")
+        self.assertEqual(consolidator.folder_status["iran"], "skipped")
+
+        with open(consolidator.manifest_path, "r") as f:
+            manifest = json.load(f)
+        army_files = manifest["folders"]["uk_army"]["files"]
+        self.assertEqual(army_files[0]["path"], "uk/army/army_data.json")
+        self.assertEqual(army_files[0]["size"], army_source.stat().st_size)
+        self.assertIn("sha256", army_files[0])
+        self.assertEqual(manifest["folders"]["uk_navy"]["files"][0]["mtime"], 0)
+
+        consolidator.generate_summary_report(results)
+        with open(consolidator.output_path / "consolidation_report.txt") as f:
+            report_content = f.read()
+        self.assertIn("Rebuilt: 1", report_content)
+        self.assertIn("Skipped (unchanged): 2", report_content)
+        self.assertIn("UK_NAVY: ✓ SUCCESS (skipped)", report_content)
+
+        # Folders removed from data/ drop out of the manifest
+        shutil.rmtree(self.data_path / "uk" / "navy")
+        IES4Consolidator(str(self.test_path), incremental=True).consolidate_by_country()
+        with open(consolidator.manifest_path, "r") as f:
+            self.assertEqual(sorted(json.load(f)["folders"]), ["iran", "uk_army"])
+
+    def test_incremental_rebuilds_when_output_missing(self):
+        """Test that a missing consolidated file forces a rebuild."""
+        IES4Consolidator(str(self.test_path), incremental=True).consolidate_by_country()
+        (self.consolidator.output_path / "ies4_iran_consolidated.json").unlink()
+
+        consolidator = IES4Consolidator(str(self.test_path), incremental=True)
+        consolidator.consolidate_by_country()
+
+        self.assertEqual(consolidator.folder_status["iran"], "rebuilt")
+        self.assertEqual(consolidator.folder_status["uk_army"], "skipped")
+
     def test_summary_report_generation(self):
         """Test generation of comprehensive summary report."""
         results = self.consolidator.consolidate_by_country()
@@ -360,6 +1240,421 @@ class TestIES4Consolidator(unittest.TestCase):
         self.assertIn("IRAN: ✓ SUCCESS", report_content)
         self.assertIn("UK_ARMY: ✓ SUCCESS", report_content)
 
+    def test_performance_metadata_and_report(self):
+        """Test per-phase timings in folder details, metadata and report."""
+        consolidator = IES4Consolidator(str(self.test_path), performance_metadata=True)
+        results = consolidator.consolidate_by_country()
+
+        performance = consolidator.folder_details["iran"]["performance"]
+        self.assertEqual(set(performance), {"load", "validation", "merge", "write"})
+        self.assertEqual(performance["merge"]["entities"], 4)
+        self.assertEqual(performance["validation"]["entities"], 4)
+        self.assertGreater(performance["write"]["bytes"], 0)
+        self.assertIn("bytesPerSecond", performance["load"])
+        self.assertIn("discovery", consolidator.run_performance)
+        self.assertIn("total", consolidator.run_performance)
+
+        with open(consolidator.output_path / "ies4_iran_consolidated.json") as f:
+            metadata = json.load(f)["consolidationMetadata"]
+        self.assertEqual(set(metadata["performance"]), {"load", "validation", "merge"})
+
+        consolidator.generate_summary_report(results)
+        report = (consolidator.output_path / "consolidation_report.txt").read_text(
+            encoding="utf-8"
+        )
+        self.assertIn("Performance:", report)
+        self.assertIn("entities/s", report)
+
+        # Timings stay out of the output unless requested
+        self.consolidator.consolidate_by_country()
+        with open(consolidator.output_path / "ies4_iran_consolidated.json") as f:
+            self.assertNotIn("performance", json.load(f)["consolidationMetadata"])
+
+    def test_memory_budget_spill_matches_in_memory(self):
+        """Test spilled merges write the same output as in-memory merges."""
+        outputs = {}
+        with unittest.mock.patch.object(ies4_consolidator, "datetime") as clock:
+            clock.now.return_value.isoformat.return_value = "2025-01-01T00:00:00"
+            for budget in (None, 1):
+                consolidator = IES4Consolidator(
+                    str(self.test_path), memory_budget=budget, ndjson_export=True
+                )
+                consolidator.consolidate_by_country()
+                outputs[budget] = (
+                    consolidator._output_file("iran").read_bytes(),
+                    (consolidator._ndjson_path("iran") / "vehicles.jsonl").read_bytes(),
+                )
+
+        self.assertEqual(outputs[None], outputs[1])
+        # Every entity spilled; the newer drone replaced its spilled version
+        self.assertEqual(consolidator.folder_details["iran"]["spilledEntities"], 3)
+        self.assertIn(b'"_replacedVersion": "1.0"', outputs[1][0])
+        self.assertNotIn("spilledEntities", consolidator.folder_details["uk_army"])
+
+    def test_truncated_streamed_file_is_skipped_entirely(self):
+        """Test a streamed file that fails part way through merges nothing."""
+        newer = {
+            "id": "iran-drone-001",
+            "type": "Drone",
+            "timestamp": "2024-12-05T10:00:00Z",
+            "version": "3.0",
+        }
+        added = dict(newer, id="iran-drone-009", version="1.0")
+        truncated = self.data_path / "iran" / "iran_v3.json"
+        truncated.write_text(
+            '{"vehicles": [%s, %s, {"id": "iran-'
+            % (json.dumps(newer), json.dumps(added))
+        )
+
+        outputs = []
+        for budget in (None, 1):
+            consolidator = IES4Consolidator(
+                str(self.test_path), stream_threshold=1, memory_budget=budget
+            )
+            self.assertTrue(consolidator.consolidate_by_country(["iran"])["iran"])
+            with open(consolidator._output_file("iran"), encoding="utf-8") as f:
+                outputs.append(json.load(f))
+
+        for output in outputs:
+            self.assertEqual(
+                [(e["id"], e["version"]) for e in output["vehicles"]],
+                [("iran-drone-001", "2.0"), ("iran-drone-002", "1.0")],
+            )
+            self.assertEqual(
+                [
+                    f["path"]
+                    for f in output["consolidationMetadata"]["consolidatedFiles"]
+                ],
+                ["iran/iran_v1.json", "iran/iran_v2.json"],
+            )
+
+    def test_spill_with_schema_without_items(self):
+        """Test spilled arrays validate like lists when the schema has no items."""
+        schema = {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "properties": {"vehicles": {"type": "array", "maxItems": 2}},
+        }
+        with open(self.test_path / "ies4_json_schema.json", "w") as f:
+            json.dump(schema, f)
+
+        for budget in (None, 0):
+            consolidator = IES4Consolidator(str(self.test_path), memory_budget=budget)
+            results = consolidator.consolidate_by_country()
+            self.assertTrue(results["iran"])
+            self.assertTrue(results["uk_army"])
+        self.assertGreater(consolidator.folder_details["iran"]["spilledEntities"], 0)
+
+    def test_spill_triggered_by_replacement(self):
+        """Test a newer version that pushes the budget over spills cleanly."""
+        old = {"id": "drone", "version": "1.0"}
+        new = {"id": "drone", "version": "2.0", "name": "x" * 1000}
+        store = ies4_consolidator._EntitySpillStore(
+            ies4_consolidator._estimate_size(old) + 100, self.test_path
+        )
+        try:
+            entities = store.entity_list("vehicles")
+            entities.append(old)
+            self.assertEqual(store.spilled, 0)
+            entities[0] = new
+            self.assertEqual(store.spilled, 1)
+            self.assertEqual(list(entities), [new])
+            entities.append(old)
+            self.assertEqual(entities[1], old)
+        finally:
+            store.close()
+
+    def test_sqlite_output(self):
+        """Test per-folder and combined SQLite databases with indexes."""
+        consolidator = IES4Consolidator(str(self.test_path), sqlite_output="combined")
+        results = consolidator.consolidate_by_country()
+        self.assertTrue(all(results.values()))
+        self.assertIn("sqlite", consolidator.folder_details["iran"]["bytesWritten"])
+
+        connection = sqlite3.connect(consolidator._sqlite_path("iran"))
+        body, version, source_file = connection.execute(
+            "SELECT body, version, source_file FROM entities WHERE id = ?",
+            ("iran-drone-001",),
+        ).fetchone()
+        connection.close()
+        self.assertEqual(version, "2.0")
+        self.assertEqual(source_file, "iran/iran_v2.json")
+        self.assertEqual(json.loads(body)["name"], "Shahed-136 Enhanced")
+
+        connection = sqlite3.connect(consolidator.combined_sqlite_path)
+        counts = dict(
+            connection.execute(
+                "SELECT folder, COUNT(*) FROM entities GROUP BY folder"
+            ).fetchall()
+        )
+        self.assertEqual(counts, {"iran": 3, "uk_army": 2, "uk_navy": 2})
+        self.assertEqual(
+            connection.execute(
+                "SELECT source_file FROM entities WHERE id = 'uk-tank-001'"
+            ).fetchone()[0],
+            str(Path("uk/army/army_data.json")),
+        )
+        indexes = {
+            row[0]
+            for row in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        }
+        self.assertTrue(
+            {"entities_id", "entities_type", "entities_version", "entities_source_file"}
+            <= indexes
+        )
+        output_file, metadata = connection.execute(
+            "SELECT output_file, metadata FROM consolidation_metadata "
+            "WHERE folder = 'iran'"
+        ).fetchone()
+        self.assertEqual(output_file, "ies4_iran_consolidated.json")
+        self.assertEqual(json.loads(metadata)["sourceFileCount"], 3)
+        self.assertEqual(
+            connection.execute(
+                "SELECT COUNT(*) FROM consolidated_files WHERE folder = 'iran'"
+            ).fetchone()[0],
+            2,
+        )
+        connection.close()
+
+        # No file is named when only the delta is written
+        consolidator = IES4Consolidator(
+            str(self.test_path), sqlite_output="folder", delta_output="only"
+        )
+        consolidator.consolidate_by_country()
+        connection = sqlite3.connect(consolidator._sqlite_path("iran"))
+        self.assertIsNone(
+            connection.execute(
+                "SELECT output_file FROM consolidation_metadata"
+            ).fetchone()[0]
+        )
+        connection.close()
+
+    def test_cross_folder_duplicate_report(self):
+        """Test IDs shared between folders are reported in every mode."""
+        navy_refit = {
+            "vehicles": [
+                {
+                    "id": "uk-tank-001",
+                    "type": "MainBattleTank",
+                    "timestamp": "2024-12-02T10:00:00Z",
+                    "version": "1.1",
+                },
+                {
+                    "id": "type-001",
+                    "type": "VehicleType",
+                    "timestamp": "2024-12-01T09:00:00Z",
+                    "version": "1.0",
+                },
+            ]
+        }
+        with open(self.data_path / "uk" / "navy" / "navy_refit.json", "w") as f:
+            json.dump(navy_refit, f)
+
+        reports = []
+        incremental = {"incremental": True}
+        for options in ({}, {"workers": 2}, incremental, incremental):
+            consolidator = IES4Consolidator(str(self.test_path), **options)
+            results = consolidator.consolidate_by_country()
+            self.assertTrue(all(results.values()))
+            reports.append(consolidator.duplicate_report)
+
+        # The second incremental run skipped every folder, reusing saved indexes
+        self.assertEqual(set(consolidator.folder_status.values()), {"skipped"})
+        for report in reports:
+            self.assertEqual(report["duplicates"], reports[0]["duplicates"])
+
+        report = reports[0]
+        self.assertEqual(report["duplicateCount"], 1)
+        self.assertEqual(report["conflictCount"], 1)
+        self.assertEqual(
+            report["duplicates"]["vehicles"],
+            [
+                {
+                    "id": "uk-tank-001",
+                    "conflict": True,
+                    "folders": [
+                        {"folder": "uk_army", "version": "1.0"},
+                        {"folder": "uk_navy", "version": "1.1"},
+                    ],
+                }
+            ],
+        )
+        # Same ID under another entity type is not a duplicate
+        self.assertNotIn("vehicleTypes", report["duplicates"])
+
+        with open(consolidator.duplicate_report_path) as f:
+            self.assertEqual(json.load(f)["duplicateCount"], 1)
+
+    def test_update_messages_aggregated(self):
+        """Test repetitive version update messages are capped and summarised."""
+        self.consolidator.max_update_messages = 0
+        with self.assertLogs("ies4_consolidator", level="DEBUG") as logs:
+            self.consolidator.consolidate_by_country()
+
+        updates = [m for m in logs.output if "Updated vehicles: iran-drone-001" in m]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].startswith("DEBUG:"))
+        self.assertIn(
+            "INFO:ies4_consolidator:Updated 1 vehicles to newer versions "
+            "(1 not logged individually)",
+            logs.output,
+        )
+
+    def test_configure_logging_queue_pipeline(self):
+        """Test log records reach the log file through the queue listener."""
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        level = root.level
+        log_file = self.test_path / "consolidator.log"
+        try:
+            ies4_consolidator.configure_logging(str(log_file))
+            self.assertEqual(len(root.handlers), len(handlers) + 1)
+            ies4_consolidator.logger.info("Merged %d files for %s", 3, "iran")
+        finally:
+            ies4_consolidator.shutdown_logging()
+            root.setLevel(level)
+
+        self.assertEqual(root.handlers, handlers)
+        self.assertIn(
+            "INFO - Merged 3 files for iran", log_file.read_text(encoding="utf-8")
+        )
+
+    def test_plan_consolidation_estimates(self):
+        """Test the dry-run plan sizes folders and learns throughput."""
+        plan = self.consolidator.plan_consolidation(largest_files=1)
+        iran = next(f for f in plan["folders"] if f["folder"] == "iran")
+        iran_files = sorted((self.data_path / "iran").glob("*.json"))
+        self.assertEqual(iran["files"], len(iran_files))
+        self.assertEqual(iran["bytes"], sum(f.stat().st_size for f in iran_files))
+        self.assertEqual(len(iran["largestFiles"]), 1)
+        self.assertGreater(iran["estimatedEntities"], 0)
+        self.assertGreater(iran["estimatedPeakMemoryBytes"], 0)
+        self.assertIsNone(plan["totals"]["estimatedSeconds"])
+        self.assertFalse(self.consolidator.output_path.exists())
+
+        self.consolidator.consolidate_by_country()
+        plan = self.consolidator.plan_consolidation()
+        self.assertEqual(plan["throughput"]["runs"], 1)
+        self.assertGreater(plan["totals"]["estimatedSeconds"], 0)
+        self.assertIn("Runtime based on", self.consolidator.format_plan(plan))
+        json.dumps(plan)
+
+    def test_plan_sampling_tolerates_malformed_sources(self):
+        """Test malformed samples are warned about instead of failing the plan."""
+        (self.data_path / "odd").mkdir()
+        (self.data_path / "odd" / "keys.json").write_text('{["vehicles"]: []}')
+        (self.data_path / "odd" / "entities.json").write_text(
+            '{"vehicles": [1, "drone", [], {"id": "odd-001"}, {"name": "no id"}]}'
+        )
+        with self.assertLogs("ies4_consolidator", "WARNING") as logs:
+            plan = self.consolidator.plan_consolidation()
+        self.assertTrue(any("keys.json" in message for message in logs.output))
+
+        odd = next(f for f in plan["folders"] if f["folder"] == "odd")
+        self.assertEqual(
+            self.consolidator._sample_source_file(
+                self.data_path / "odd" / "entities.json", 10_000
+            )[0],
+            1,
+        )
+        self.assertGreater(odd["estimatedEntities"], 0)
+
+    def test_cheap_import_and_construction(self):
+        """Test import and construction defer jsonschema, logging and I/O."""
+        startup = benchmark_ies4_consolidator.bench_startup(repeat=1)
+        self.assertFalse(startup["jsonschemaImported"])
+        self.assertEqual(startup["rootHandlers"], 0)
+
+        consolidator = IES4Consolidator(str(self.test_path / "fresh"))
+        self.assertFalse(consolidator.output_path.exists())
+        with unittest.mock.patch.object(
+            consolidator, "_load_schema", return_value={"type": "object"}
+        ) as load_schema:
+            self.assertEqual(consolidator.schema, {"type": "object"})
+            self.assertEqual(consolidator.schema, {"type": "object"})
+        load_schema.assert_called_once_with()
+
+        self.consolidator.consolidate_by_country()
+        self.assertTrue(self.consolidator.output_path.is_dir())
+
+    def test_dry_run_refuses_clear_cache(self):
+        """Test a dry run cannot empty the parse cache."""
+        self.consolidator.consolidate_by_country()
+        cache_files = list(self.consolidator.parse_cache_path.glob("*.pickle"))
+        self.assertTrue(cache_files)
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "run_consolidation.py",
+                "--base-path",
+                str(self.test_path),
+                "--dry-run",
+                "--clear-cache",
+            ],
+            cwd=Path(ies4_consolidator.__file__).parent,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(completed.returncode, 1)
+        self.assertIn("--clear-cache", completed.stdout)
+        self.assertTrue(all(path.exists() for path in cache_files))
+
+    def test_import_defers_storage_modules(self):
+        """Test importing the module does not load spill or output modules."""
+        probe = (
+            "import sys, ies4_consolidator; "
+            "print(sorted({'bz2', 'lzma', 'sqlite3', 'tempfile'} & set(sys.modules)))"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=Path(ies4_consolidator.__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(completed.stdout.strip(), "[]")
+
+    def test_benchmark_dataset_and_regression_check(self):
+        """Test the synthetic benchmark data is deterministic and merges."""
+        params = {
+            "folders": 2,
+            "files_per_folder": 3,
+            "entities_per_file": 20,
+            "duplicate_ratio": 0.5,
+            "nesting_depth": 2,
+        }
+        first = self.test_path / "bench_a"
+        second = self.test_path / "bench_b"
+        totals = benchmark_ies4_consolidator.generate_dataset(first, **params)
+        benchmark_ies4_consolidator.generate_dataset(second, **params)
+
+        source = first / "country_001" / "level_1" / "level_2" / "source_002.json"
+        self.assertEqual(
+            source.read_bytes(), (second / source.relative_to(first)).read_bytes()
+        )
+        self.assertEqual(totals["files"], 6)
+
+        shutil.rmtree(self.data_path)
+        first.rename(self.data_path)
+        results = self.consolidator.consolidate_by_country()
+        self.assertEqual(
+            list(results),
+            ["country_000_level_1_level_2", "country_001_level_1_level_2"],
+        )
+        self.assertTrue(all(results.values()))
+
+        baseline = {"parameters": params, "pipeline": {"phases": {"merge": 1.0}}}
+        slower = {"parameters": params, "pipeline": {"phases": {"merge": 1.5}}}
+        self.assertEqual(
+            len(benchmark_ies4_consolidator.check_regressions(slower, baseline, 0.2)),
+            1,
+        )
+        self.assertEqual(
+            benchmark_ies4_consolidator.check_regressions(slower, baseline, 0.6), []
+        )
+
 
 if __name__ == "__main__":
     unittest.main()